@@ -1,16 +1,72 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from jose import jwt, JWTError
 from passlib.context import CryptContext
-from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, BCRYPT_ROUNDS, PASSWORD_WORKERS, PASSWORD_QUEUE_MAX
+
+# Hashes with another cost factor still verify and are flagged by needs_update.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Every hashing worker is busy and the wait queue is full."""
+
+
+# bcrypt is CPU-bound: it runs in a small process pool so a burst of logins
+# cannot occupy the request threadpool. At most PASSWORD_WORKERS + PASSWORD_QUEUE_MAX
+# calls are in flight; the next one is refused instead of queued.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, PASSWORD_WORKERS) + max(0, PASSWORD_QUEUE_MAX))
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy("password hashing queue is full")
+    try:
+        if PASSWORD_WORKERS <= 0:
+            return fn(*args)
+        global _pool
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            pool = _pool
+        return pool.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def shutdown_password_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            # calls take well under a second; waiting lets the workers exit with the server
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, password_hash: str) -> bool:
-    return pwd_context.verify(plain_password, password_hash)
+    return verify_and_update_password(plain_password, password_hash)[0]
+
+
+def verify_and_update_password(plain_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """Check a password; the second item is a new hash when the stored one needs an update."""
+    return _run(_verify_and_update, plain_password, password_hash)
+
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _run(_hash, password)
 
 def create_access_token(data: Dict[str, Any], expires_minutes: Optional[int] = None) -> str:
     to_encode = data.copy()
@@ -23,4 +79,4 @@ def decode_token(token: str) -> Dict[str, Any]:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError as e:
-        raise ValueError("Invalid token") from e 
\ No newline at end of file
+        raise ValueError("Invalid token") from e
\ No newline at end of file
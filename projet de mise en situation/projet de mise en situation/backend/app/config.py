@@ -8,9 +8,28 @@ load_dotenv()
 SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-change-me")
 ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+# Authenticated request fast path: user rows cached this long (0 = no cache), decoded tokens until they expire
+AUTH_USER_TTL_SECONDS: float = float(os.getenv("AUTH_USER_TTL_SECONDS", "30"))
+AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# Password hashing: bcrypt cost, worker processes (0 = calling thread), extra calls allowed to wait before 429
+BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS: int = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_QUEUE_MAX: int = int(os.getenv("PASSWORD_QUEUE_MAX", "8"))
 
 # Database
 DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///docuhelp.db")
+# Connection pool (SQLite files and server databases)
+DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # PostgreSQL, 0 = none
+# SQLite pragmas applied to every connection
+SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_MB: int = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB: int = int(os.getenv("SQLITE_MMAP_MB", "256"))
 
 # CORS
 _raw = os.getenv("CORS_ORIGINS", "*")
@@ -27,6 +46,65 @@ INDEX_DIR.mkdir(parents=True, exist_ok=True)
 EMBEDDINGS_MODEL: str = os.getenv("EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 USE_SEMANTIC: str = os.getenv("USE_SEMANTIC", "auto")  # auto | on | off
 TOP_K: int = int(os.getenv("TOP_K", "5"))
+BM25_K1: float = float(os.getenv("BM25_K1", "1.2"))
+BM25_B: float = float(os.getenv("BM25_B", "0.75"))
+# LRU of per-version retrievers: only legacy semantic versions missing from the ANN index go through it
+RETRIEVER_CACHE_MB: int = int(os.getenv("RETRIEVER_CACHE_MB", "256"))
+# /search and /answers result cache: memory | shared (+ SQLite file for all workers) | off
+RESULT_CACHE: str = os.getenv("RESULT_CACHE", "memory")
+RESULT_CACHE_TTL_SECONDS: float = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2000"))
+# Shared embedding server (python -m app.services.embed_server): Unix socket path, empty = model loaded in each process;
+# requests within the window are encoded together, up to EMBED_BATCH_MAX texts
+EMBED_SERVER_SOCKET: str = os.getenv("EMBED_SERVER_SOCKET", "")
+EMBED_BATCH_WINDOW_MS: float = float(os.getenv("EMBED_BATCH_WINDOW_MS", "3"))
+EMBED_BATCH_MAX: int = int(os.getenv("EMBED_BATCH_MAX", "64"))
+EMBED_SERVER_TIMEOUT_SECONDS: float = float(os.getenv("EMBED_SERVER_TIMEOUT_SECONDS", "30"))
+# Persistent chunk embedding cache keyed by (model, text hash): on | off
+EMBED_CACHE: str = os.getenv("EMBED_CACHE", "on")
+# ANN (semantic mode): lists (0 = auto), lists probed per query, exact scan below N visible chunks
+ANN_NLIST: int = int(os.getenv("ANN_NLIST", "0"))
+ANN_NPROBE: int = int(os.getenv("ANN_NPROBE", "16"))
+ANN_EXACT_BELOW: int = int(os.getenv("ANN_EXACT_BELOW", "20000"))
+
+# Index shards searched in parallel (1 = unsharded); versions are placed by owner | version on the least loaded
+# shard, and moved when a shard holds more than SHARD_REBALANCE_RATIO x the mean; search threads (0 = one per CPU)
+INDEX_SHARDS: int = int(os.getenv("INDEX_SHARDS", "1"))
+SHARD_BY: str = os.getenv("SHARD_BY", "owner")
+SHARD_REBALANCE_RATIO: float = float(os.getenv("SHARD_REBALANCE_RATIO", "1.5"))
+SHARD_WORKERS: int = int(os.getenv("SHARD_WORKERS", "0"))
+
+# Ingestion jobs: worker processes (0 = run in the dispatcher thread), retries, crash lease
+INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS: int = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_LEASE_SECONDS: int = int(os.getenv("INGEST_LEASE_SECONDS", "120"))
+INGEST_POLL_SECONDS: float = float(os.getenv("INGEST_POLL_SECONDS", "1.0"))
+# PDF extraction: processes per document (0 = CPU count // INGEST_WORKERS), page count from which pages are split across them
+PDF_WORKERS: int = int(os.getenv("PDF_WORKERS", "0"))
+PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+
+# Uploads: size limit, read block size (the upload is streamed to disk block by block)
+UPLOAD_MAX_MB: int = int(os.getenv("UPLOAD_MAX_MB", "25"))
+UPLOAD_CHUNK_KB: int = int(os.getenv("UPLOAD_CHUNK_KB", "256"))
+
+# Audit log: events are buffered and written in batches by a background thread.
+# Queue size (0 = write synchronously), rows per insert, max delay, and what to do
+# when the queue is full: "block" (wait up to AUDIT_BLOCK_SECONDS, then drop) or "drop".
+AUDIT_QUEUE_SIZE: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_SECONDS: float = float(os.getenv("AUDIT_FLUSH_SECONDS", "1.0"))
+AUDIT_OVERFLOW: str = os.getenv("AUDIT_OVERFLOW", "block")
+AUDIT_BLOCK_SECONDS: float = float(os.getenv("AUDIT_BLOCK_SECONDS", "0.5"))
+
+# Load the model, run one encode and load the indexes in the background at startup (/ready waits for it): on | off
+WARMUP: str = os.getenv("WARMUP", "on")
+# Prometheus metrics at /metrics (unauthenticated, keep it off the public network): on | off
+METRICS: str = os.getenv("METRICS", "on")
+
+# On-demand profiling (admins, X-Profile: 1 or ?profile=1): where profiles go, sampling period, how many to keep
+PROFILE_DIR: Path = Path(os.getenv("PROFILE_DIR", str(BASE_DIR / "storage" / "profiles"))).resolve()
+PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", "200"))
 
 # Seed admin (dev only)
 ADMIN_EMAIL: str = os.getenv("ADMIN_EMAIL", "admin@example.com")
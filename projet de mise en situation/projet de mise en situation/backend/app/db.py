@@ -1,15 +1,75 @@
-from typing import Generator
+from typing import Any, Dict, Generator, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 from sqlmodel import SQLModel, Session, create_engine
-from .config import DATABASE_URL
-
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+from .config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT_MS,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_MB, SQLITE_MMAP_MB,
 )
 
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    return {
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -SQLITE_CACHE_MB * 1024,  # negative = KiB
+        "mmap_size": SQLITE_MMAP_MB * 1024 * 1024,
+    }
+
+
+def make_engine(url: str = DATABASE_URL, pragmas: Optional[Dict[str, Any]] = None) -> Engine:
+    """Engine tuned for the backend behind ``url``.
+
+    SQLite: every new connection gets ``pragmas`` (default: WAL, synchronous
+    NORMAL, busy timeout, page cache and mmap sizes from config), so readers
+    no longer block on the ingest writer. PostgreSQL: sized pool with
+    pre-ping and recycling, and a server-side statement timeout.
+    """
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        in_memory = make_url(url).database in (None, "", ":memory:")
+        kwargs: Dict[str, Any] = {"connect_args": {"check_same_thread": False}}
+        if not in_memory:
+            kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        engine = create_engine(url, **kwargs)
+        pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(dbapi_connection, connection_record) -> None:
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    if name == "journal_mode" and in_memory:
+                        continue
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+        return engine
+    connect_args: Dict[str, Any] = {}
+    if backend == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+engine = make_engine()
+
 def create_db_and_tables() -> None:
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist: add indexes introduced since
+    for table in SQLModel.metadata.tables.values():
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 def get_session() -> Generator[Session, None, None]:
     with Session(engine) as session:
-        yield session 
\ No newline at end of file
+        yield session
\ No newline at end of file
@@ -4,6 +4,7 @@ from sqlmodel import select
 from .auth import decode_token
 from .db import get_session
 from .models import User
+from .services.auth_cache import cached_claims, remember_claims, cached_user, remember_user
 
 def _extract_bearer_token(authorization: Optional[str]) -> str:
     if not authorization or not authorization.lower().startswith("bearer "):
@@ -15,16 +16,22 @@ def get_current_user(
     session = Depends(get_session)
 ) -> User:
     token = _extract_bearer_token(authorization)
-    try:
-        payload = decode_token(token)
-    except ValueError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    payload = cached_claims(token)
+    if payload is None:
+        try:
+            payload = decode_token(token)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        remember_claims(token, payload)
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-    user = session.exec(select(User).where(User.id == int(user_id))).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    user = cached_user(int(user_id))
+    if user is None:
+        user = session.exec(select(User).where(User.id == int(user_id))).first()
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        remember_user(user)
     return user
 
 def require_role(required: str):
@@ -1,16 +1,32 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlmodel import select
-from .db import create_db_and_tables, get_session
-from .config import CORS_ORIGINS, ADMIN_EMAIL, ADMIN_PASSWORD, ADMIN_ROLE
+from .db import create_db_and_tables, get_session, engine
+from .config import CORS_ORIGINS, ADMIN_EMAIL, ADMIN_PASSWORD, ADMIN_ROLE, METRICS, WARMUP
 from .models import User
-from .auth import hash_password
+from .auth import hash_password, shutdown_password_pool
+from .dependencies import require_role
+from .services.retriever_cache import retriever_cache
+from .services.shards import get_ann_shards, get_corpus_shards
+from .services.embedding import MODEL_NAME, embed_server_stats
+from .services.embedding_cache import get_embedding_cache
 from .routers import auth as auth_router
 from .routers import documents as documents_router
 from .routers import ingest as ingest_router
 from .routers import search as search_router
 from .routers import answers as answers_router
 from .routers import audits as audits_router
+from .routers import jobs as jobs_router
+from .routers import metrics as metrics_router
+from .routers import profiles as profiles_router
+from .services.ingestion import ingest_queue
+from .services.audit import audit_writer
+from .services.auth_cache import token_cache, user_cache
+from .services.result_cache import result_cache
+from .services.metrics import MetricsMiddleware
+from .services.profiler import ProfilingMiddleware, instrument_routes, instrument_engine
+from .services.readiness import readiness
 
 app = FastAPI(title="DocuHelp Backend", version="1.0.0")
 
@@ -21,6 +37,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if METRICS.lower() == "on":
+    app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware, authorize=profiles_router.admin_from_headers)
+app.add_middleware(documents_router.UploadSizeLimitMiddleware)
 
 
 @app.on_event("startup")
@@ -37,6 +57,16 @@ def on_startup() -> None:
             session.commit()
     finally:
         session.close()
+    audit_writer.start()
+    ingest_queue.start()
+    readiness.start(warm=WARMUP.lower() == "on")
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    ingest_queue.stop()
+    audit_writer.stop()  # writes the events still queued
+    shutdown_password_pool()
 
 # mount routers
 app.include_router(auth_router.router)
@@ -45,6 +75,10 @@ app.include_router(ingest_router.router)
 app.include_router(search_router.router)
 app.include_router(answers_router.router)
 app.include_router(audits_router.router)
+app.include_router(jobs_router.router)
+if METRICS.lower() == "on":
+    app.include_router(metrics_router.router)
+app.include_router(profiles_router.router)
 
 
 @app.get("/health")
@@ -52,6 +86,34 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    # 503 until the warm-up is done, so a load balancer only routes to warm workers
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/stats")
+def stats(current: User = Depends(require_role("admin"))):
+    return {
+        "retriever_cache": retriever_cache.stats(),
+        "ann_index": get_ann_shards().stats(),
+        "shards": get_corpus_shards().stats(),
+        "embedding_cache": get_embedding_cache(MODEL_NAME).stats(),
+        "embedding_server": embed_server_stats(),
+        "audit": audit_writer.stats(),
+        "auth_cache": {"tokens": token_cache.stats(), "users": user_cache.stats()},
+        "result_cache": result_cache.stats(),
+        "startup": readiness.status(),
+    }
+
+
 @app.get("/")
 def root():
-    return {"message": "DocuHelp backend API — ready. Swagger: /docs"} 
\ No newline at end of file
+    return {"message": "DocuHelp backend API — ready. Swagger: /docs"}
+
+
+# profiled requests sample the threads running these endpoints and dependencies, and time their SQL
+instrument_routes(app.routes)
+instrument_engine(engine)
+readiness.mark("imported")
\ No newline at end of file
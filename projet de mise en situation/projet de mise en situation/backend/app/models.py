@@ -1,7 +1,7 @@
 from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Optional
-from sqlmodel import SQLModel, Field, Column, String
+from sqlmodel import SQLModel, Field, Column, String, Index
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -33,7 +33,16 @@ class DocumentVersion(SQLModel, table=True):
     embedding_model: str = Field(default="")
     doc_sha256: str = Field(default="")
 
+class Blob(SQLModel, table=True):
+    sha256: str = Field(primary_key=True)
+    path: str
+    size: int
+    refcount: int = Field(default=0)  # documents whose path points at this blob
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
 class Chunk(SQLModel, table=True):
+    # search hits are (doc_version_id, chunk_index) pairs, hydrated in one query
+    __table_args__ = (Index("ix_chunk_version_chunk", "doc_version_id", "chunk_index"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     doc_version_id: int = Field(foreign_key="documentversion.id", index=True)
     chunk_index: int = Field(index=True)
@@ -43,6 +52,20 @@ class Chunk(SQLModel, table=True):
     end_char: Optional[int] = Field(default=None)
     vector_path: Optional[str] = Field(default=None)
 
+class IngestJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    document_id: int = Field(foreign_key="document.id", index=True)
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    status: str = Field(default="queued", index=True)  # "queued" | "running" | "done" | "failed"
+    attempts: int = Field(default=0)
+    pages_done: int = Field(default=0)
+    chunks_written: int = Field(default=0)
+    version_id: Optional[int] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+    result: Optional[str] = Field(default=None)  # JSON summary once done
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
 class Query(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
@@ -66,6 +89,12 @@ class AnswerCitation(SQLModel, table=True):
     snippet: str = Field(default="")
 
 class AuditLog(SQLModel, table=True):
+    # keyset pagination walks (created_at, id), optionally within one action or resource
+    __table_args__ = (
+        Index("ix_auditlog_created_id", "created_at", "id"),
+        Index("ix_auditlog_action_created_id", "action", "created_at", "id"),
+        Index("ix_auditlog_resource_created_id", "resource", "created_at", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
     action: str = Field(nullable=False)
@@ -4,10 +4,11 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from sqlmodel import select
 from ..db import get_session
-from ..models import Document, DocumentVersion, Chunk, Query as QueryModel, Answer as AnswerModel, AnswerCitation as AnswerCitationModel, User
+from ..models import Document, Query as QueryModel, Answer as AnswerModel, AnswerCitation as AnswerCitationModel, User
 from ..dependencies import get_current_user
-from ..services.indexing import search_versions
+from ..services.indexing import search_versions, hydrate_hits
 from ..services.audit import log as audit_log
+from ..services.result_cache import result_cache, corpus_generation
 from ..config import TOP_K
 
 router = APIRouter(prefix="/answers", tags=["answers"])
@@ -29,34 +30,38 @@ class AnswerResponse(BaseModel):
     text: str
     confidence: float
     citations: List[Citation]
+    cached: bool = False
 
 
 @router.post("", response_model=AnswerResponse)
 def answer(req: AnswerRequest, user: User = Depends(get_current_user), session = Depends(get_session)):
+    generation = corpus_generation()
+    vq = select(Document.current_version_id).where(Document.current_version_id.is_not(None))
+    if user.role not in ("admin", "support"):
+        vq = vq.where(Document.owner_id == user.id)
+    version_ids = list(session.exec(vq).all())
+    key = result_cache.key("answer", req.question, TOP_K, version_ids, generation)
+    cached = result_cache.get(key)
+    if cached is not None:
+        # réponse déjà calculée pour ce corpus: pas de nouvelles lignes Query/Answer
+        audit_log(user.id, "answer", "qa", cached["answer_id"], {"q": req.question, "confidence": cached["confidence"], "citations": len(cached["citations"]), "cached": True})
+        return AnswerResponse(text=cached["text"], confidence=cached["confidence"],
+                              citations=[Citation(**c) for c in cached["citations"]], cached=True)
+
     q = QueryModel(user_id=user.id, question=req.question)
     session.add(q)
     session.commit()
     session.refresh(q)
 
-    docs = session.exec(select(Document).where((Document.owner_id == user.id) | (user.role.in_(["admin", "support"])))).all()
-    version_ids = [d.current_version_id for d in docs if d.current_version_id]
-
     hits = search_versions(req.question, version_ids, k=TOP_K, session=session) if version_ids else []
     citations: List[Citation] = []
     texts: List[str] = []
     scores: List[float] = []
 
-    for vid, idx, score in hits[: max(2, min(2, len(hits)) )]:
-        ver = session.get(DocumentVersion, vid)
-        if not ver:
-            continue
-        doc = session.get(Document, ver.document_id)
-        ch = session.exec(select(Chunk).where((Chunk.doc_version_id == vid) & (Chunk.chunk_index == idx))).first()
-        if not ch or not doc:
-            continue
-        citations.append(Citation(doc_id=doc.id, title=doc.name, version=ver.version, page=(ch.page or 1), score=float(score)))
-        texts.append(ch.content)
-        scores.append(float(score))
+    for h in hydrate_hits(session, hits[: max(2, min(2, len(hits)) )]):
+        citations.append(Citation(doc_id=h.doc_id, title=h.title, version=h.version, page=h.page, score=h.score))
+        texts.append(h.content)
+        scores.append(h.score)
 
     # Synthèse extractive simple: concaténation des meilleurs passages
     summary = "\n\n".join(texts[:2]) if texts else "Aucun passage pertinent trouvé."
@@ -71,6 +76,7 @@ def answer(req: AnswerRequest, user: User = Depends(get_current_user), session =
         session.add(AnswerCitationModel(answer_id=ans.id, document_id=c.doc_id, version=c.version, page=c.page, score=c.score, snippet=""))
     session.commit()
 
+    result_cache.put(key, {"answer_id": ans.id, "text": summary, "confidence": confidence, "citations": [c.model_dump() for c in citations]})
     audit_log(user.id, "answer", "qa", ans.id, {"q": req.question, "confidence": confidence, "citations": len(citations)})
 
     return AnswerResponse(text=summary, confidence=confidence, citations=citations) 
\ No newline at end of file
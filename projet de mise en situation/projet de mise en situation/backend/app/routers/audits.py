@@ -1,7 +1,11 @@
 from __future__ import annotations
-from typing import List, Optional
+import base64
+import csv
+import io
+from typing import Iterator, List, Optional, Tuple
 from datetime import datetime
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlmodel import select
 from ..db import get_session
@@ -10,6 +14,9 @@ from ..dependencies import get_current_user, require_role
 
 router = APIRouter(prefix="/audits", tags=["audits"])
 
+MAX_PAGE = 1000
+EXPORT_BATCH = 1000
+
 
 class AuditRead(BaseModel):
     id: int
@@ -21,19 +28,118 @@ class AuditRead(BaseModel):
     created_at: datetime
 
 
+def _encode_cursor(row: AuditLog) -> str:
+    return base64.urlsafe_b64encode(f"{row.created_at.isoformat()}|{row.id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _filtered(user: Optional[int], doc: Optional[int], action: Optional[str], resource: Optional[str]):
+    q = select(AuditLog)
+    # simple filters
+    if user is not None:
+        q = q.where(AuditLog.user_id == user)
+    if doc is not None:
+        q = q.where(AuditLog.ref_id == doc)
+    if action is not None:
+        q = q.where(AuditLog.action == action)
+    if resource is not None:
+        q = q.where(AuditLog.resource == resource)
+    return q
+
+
+def _after(q, key: Optional[Tuple[datetime, int]], descending: bool):
+    """Rows strictly after ``key`` in (created_at, id) order."""
+    if key is not None:
+        created, row_id = key
+        if descending:
+            q = q.where((AuditLog.created_at < created) | ((AuditLog.created_at == created) & (AuditLog.id < row_id)))
+        else:
+            q = q.where((AuditLog.created_at > created) | ((AuditLog.created_at == created) & (AuditLog.id > row_id)))
+    if descending:
+        return q.order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+    return q.order_by(AuditLog.created_at.asc(), AuditLog.id.asc())
+
+
+def _read(r: AuditLog) -> AuditRead:
+    return AuditRead(id=r.id, user_id=r.user_id, action=r.action, resource=r.resource, ref_id=r.ref_id, meta=r.meta, created_at=r.created_at)
+
+
 @router.get("", response_model=List[AuditRead])
 def list_audits(
+    response: Response,
     user: Optional[int] = Query(default=None),
     doc: Optional[int] = Query(default=None),
+    action: Optional[str] = Query(default=None),
+    resource: Optional[str] = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=MAX_PAGE),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
     session = Depends(get_session),
     current: User = Depends(require_role("support")),
 ):
-    q = select(AuditLog)
-    # simple filters
-    if user is not None:
-        q = q.where(AuditLog.user_id == user)
-    if doc is not None:
-        q = q.where(AuditLog.ref_id == doc)
-    q = q.order_by(AuditLog.created_at.desc())
-    rows = session.exec(q).all()
-    return [AuditRead(id=r.id, user_id=r.user_id, action=r.action, resource=r.resource, ref_id=r.ref_id, meta=r.meta, created_at=r.created_at) for r in rows] 
\ No newline at end of file
+    """Newest first, one page at a time; the next page's cursor is in the X-Next-Cursor header."""
+    q = _after(_filtered(user, doc, action, resource), _decode_cursor(cursor) if cursor else None, descending=True)
+    rows = session.exec(q.limit(limit + 1)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+    return [_read(r) for r in rows]
+
+
+def _export_rows(user, doc, action, resource) -> Iterator[AuditLog]:
+    # own session: the response is streamed after the request's dependencies are done
+    session = next(get_session())
+    try:
+        key = None
+        while True:
+            rows = session.exec(_after(_filtered(user, doc, action, resource), key, descending=False).limit(EXPORT_BATCH)).all()
+            if not rows:
+                return
+            yield from rows
+            key = (rows[-1].created_at, rows[-1].id)
+            session.expunge_all()
+    finally:
+        session.close()
+
+
+def _ndjson(rows: Iterator[AuditLog]) -> Iterator[str]:
+    for r in rows:
+        yield _read(r).model_dump_json() + "\n"
+
+
+def _csv(rows: Iterator[AuditLog]) -> Iterator[str]:
+    fields = list(AuditRead.model_fields)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fields)
+    for r in rows:
+        writer.writerow([r.created_at.isoformat() if f == "created_at" else getattr(r, f) for f in fields])
+        if buf.tell() > 64 * 1024:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+@router.get("/export")
+def export_audits(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    user: Optional[int] = Query(default=None),
+    doc: Optional[int] = Query(default=None),
+    action: Optional[str] = Query(default=None),
+    resource: Optional[str] = Query(default=None),
+    current: User = Depends(require_role("support")),
+):
+    """Every matching row, oldest first, streamed in keyset batches (constant memory)."""
+    rows = _export_rows(user, doc, action, resource)
+    if format == "csv":
+        return StreamingResponse(_csv(rows), media_type="text/csv",
+                                 headers={"Content-Disposition": 'attachment; filename="audits.csv"'})
+    return StreamingResponse(_ndjson(rows), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="audits.ndjson"'})
\ No newline at end of file
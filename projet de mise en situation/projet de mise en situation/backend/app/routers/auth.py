@@ -5,13 +5,17 @@ from pydantic import EmailStr
 from sqlmodel import SQLModel, Field, select
 from ..db import get_session
 from ..models import User
-from ..auth import hash_password, verify_password, create_access_token
+from ..auth import hash_password, verify_and_update_password, create_access_token, PasswordHasherBusy
 from ..dependencies import get_current_user
 from ..services.audit import log as audit_log
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _busy() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many authentication requests, retry shortly", headers={"Retry-After": "1"})
+
+
 class UserCreate(SQLModel):
     email: EmailStr
     password: str
@@ -42,9 +46,13 @@ def register(payload: UserCreate, session = Depends(get_session)):
     exists = session.exec(select(User).where(User.email == str(payload.email).lower())).first()
     if exists:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
+    try:
+        password_hash = hash_password(payload.password)
+    except PasswordHasherBusy:
+        raise _busy()
     user = User(
         email=str(payload.email).lower(),
-        password_hash=hash_password(payload.password),
+        password_hash=password_hash,
         role=payload.role or "user",
         created_at=datetime.now(timezone.utc),
     )
@@ -58,8 +66,20 @@ def register(payload: UserCreate, session = Depends(get_session)):
 @router.post("/login", response_model=TokenResponse)
 def login(payload: LoginRequest, session = Depends(get_session)):
     user = session.exec(select(User).where(User.email == str(payload.email).lower())).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    try:
+        ok, new_hash = verify_and_update_password(payload.password, user.password_hash)
+    except PasswordHasherBusy:
+        raise _busy()
+    if not ok:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # stored with an older cost factor: upgrade it now that we have the plain password
+        user.password_hash = new_hash
+        session.add(user)
+        session.commit()
+        session.refresh(user)
     token = create_access_token({"sub": str(user.id), "role": user.role})
     audit_log(user.id, "login", "auth", user.id, {"email": user.email})
     return TokenResponse(access_token=token, role=user.role, expires_in=3600)
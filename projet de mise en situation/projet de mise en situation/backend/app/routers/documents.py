@@ -2,16 +2,26 @@ from __future__ import annotations
 import hashlib
 from uuid import uuid4
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from sqlmodel import select
-from ..config import STORAGE_DIR
+from ..config import STORAGE_DIR, UPLOAD_MAX_MB, UPLOAD_CHUNK_KB
 from ..db import get_session
 from ..models import Document, DocumentVersion, User
 from ..dependencies import get_current_user
 from ..services.audit import log as audit_log
+from ..services.indexing import index_paths_for_version, forget_versions
+from ..services.blobs import store_blob, release_blob, is_blob
+from ..services.result_cache import bump_generation
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
@@ -36,7 +46,8 @@ ALLOWED_MIME = {
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
 }
 ALLOWED_EXT = {".pdf", ".txt", ".docx"}
-MAX_SIZE_MB = 25
+MAX_SIZE_MB = UPLOAD_MAX_MB
+TMP_DIR = STORAGE_DIR / ".tmp"  # same filesystem as STORAGE_DIR, so the final rename is atomic
 
 
 def _safe_name(name: str) -> str:
@@ -44,10 +55,158 @@ def _safe_name(name: str) -> str:
     return keep.strip() or f"file_{uuid4().hex}"
 
 
-def _sha256_bytes(data: bytes) -> str:
-    h = hashlib.sha256()
-    h.update(data)
-    return h.hexdigest()
+# multipart framing and the other form fields, on top of the file itself
+_MULTIPART_SLACK = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware refusing ``POST /documents`` on its declared length, before the body is read.
+
+    Bodies without a Content-Length (chunked) are counted as they arrive by
+    ``_receive_upload``. Every other request is passed straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"].rstrip("/") == "/documents":
+            length = next((v for k, v in scope["headers"] if k == b"content-length"), b"")
+            if length.isdigit() and int(length) > MAX_SIZE_MB * 1024 * 1024 + _MULTIPART_SLACK:
+                response = JSONResponse(status_code=413, content={"detail": f"File too large (> {MAX_SIZE_MB} MB)"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _UploadReceiver:
+    """Callbacks of an incremental multipart parser: the ``file`` part goes to a temp file.
+
+    Its bytes are counted and hashed as they arrive and handed to ``flush`` in
+    blocks, which the caller runs off the event loop. Other parts are ignored.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.tmp = TMP_DIR / f"{uuid4().hex}.part"
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.filename: Optional[str] = None
+        self.content_type = ""
+        self.pending: List[bytes] = []
+        self.pending_bytes = 0
+        self._out = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+        self._in_file = False
+
+    @property
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._in_file = self.filename is None and params.get(b"name") == b"file" and b"filename" in params
+        if self._in_file:
+            self.filename = params[b"filename"].decode("utf-8", "replace")
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+            ext = Path(self.filename).suffix.lower()
+            if ext not in ALLOWED_EXT and _guess_type(self.content_type) not in ALLOWED_MIME:
+                raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type")
+        self._headers = {}
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._in_file:
+            return
+        block = data[start:end]
+        self.size += len(block)
+        if self.size > self.limit:
+            raise HTTPException(status_code=413, detail=f"File too large (> {MAX_SIZE_MB} MB)")
+        self.sha256.update(block)
+        self.pending.append(block)
+        self.pending_bytes += len(block)
+
+    def _on_part_end(self) -> None:
+        self._in_file = False
+
+    def flush(self) -> None:
+        if self._out is None:
+            TMP_DIR.mkdir(parents=True, exist_ok=True)
+            self._out = open(self.tmp, "wb")
+        self._out.write(b"".join(self.pending))
+        self.pending, self.pending_bytes = [], 0
+
+    def close(self) -> None:
+        if self._out is not None:
+            self._out.close()
+
+    def discard(self) -> None:
+        self.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+async def _receive_upload(request: Request) -> _UploadReceiver:
+    """Parse the multipart body as it arrives, writing the file to a temp file.
+
+    The body is read once, straight from the socket: nothing is spooled
+    beforehand, and the request is refused with 413 as soon as the file (or
+    the body) crosses the limit, declared length or not.
+    """
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if ctype != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=422, detail="Expected a multipart/form-data body with a 'file' field")
+    upload = _UploadReceiver(MAX_SIZE_MB * 1024 * 1024)
+    parser = MultipartParser(boundary, upload.callbacks)
+    block = UPLOAD_CHUNK_KB * 1024
+    received = 0
+    try:
+        async for data in request.stream():
+            received += len(data)
+            if received > upload.limit + _MULTIPART_SLACK:
+                raise HTTPException(status_code=413, detail=f"File too large (> {MAX_SIZE_MB} MB)")
+            parser.write(data)
+            if upload.pending_bytes >= block:
+                await run_in_threadpool(upload.flush)
+        parser.finalize()
+        if upload.filename is None:
+            raise HTTPException(status_code=422, detail="Missing 'file' field")
+        if upload.size == 0:
+            raise HTTPException(status_code=422, detail="Empty file")
+        await run_in_threadpool(upload.flush)
+        upload.close()
+    except BaseException:
+        await run_in_threadpool(upload.discard)
+        raise
+    return upload
+
+
+_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {
+            "schema": {"type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}}},
+        }},
+    },
+}
 
 
 # --- Nouveau: schéma pour le renommage ---
@@ -55,66 +214,67 @@ class RenameRequest(BaseModel):
     new_name: str
 
 
-def _guess_type(upload: UploadFile) -> str:
-    t = (upload.content_type or "").split(";")[0].strip()
+def _guess_type(content_type: Optional[str]) -> str:
+    t = (content_type or "").split(";")[0].strip()
     return t or "application/octet-stream"
 
 
-@router.post("", response_model=DocumentDetail, status_code=201)
-def upload_document(
-    file: UploadFile = File(...),
+@router.post("", response_model=DocumentDetail, status_code=201, openapi_extra=_UPLOAD_OPENAPI)
+async def upload_document(
+    request: Request,
     user: User = Depends(get_current_user),
     session = Depends(get_session),
 ):
-    ext = Path(file.filename).suffix.lower()
-    ctype = _guess_type(file)
-    if ext not in ALLOWED_EXT and ctype not in ALLOWED_MIME:
-        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type")
-    content = file.file.read()
-    size = len(content)
-    if size == 0:
-        raise HTTPException(status_code=422, detail="Empty file")
-    if size > MAX_SIZE_MB * 1024 * 1024:
-        raise HTTPException(status_code=413, detail=f"File too large (> {MAX_SIZE_MB} MB)")
-
-    digest = _sha256_bytes(content)
-    doc_dir = STORAGE_DIR / uuid4().hex
-    doc_dir.mkdir(parents=True, exist_ok=True)
-    safe = _safe_name(file.filename or "document")
-    dest = doc_dir / safe
-    with open(dest, "wb") as f:
-        f.write(content)
-
-    doc = Document(
-        owner_id=user.id,
-        name=safe,
-        filename=file.filename or safe,
-        path=str(dest),
-        mime=ctype,
-        size=size,
-        sha256=digest,
-        status="uploaded",
-    )
-    session.add(doc)
-    session.commit()
-    session.refresh(doc)
+    upload = await _receive_upload(request)
+    try:
+        return await run_in_threadpool(_create_document, session, user, upload)
+    finally:
+        upload.tmp.unlink(missing_ok=True)  # moved into the blob store unless something failed
 
-    ver = DocumentVersion(
-        document_id=doc.id,
-        version=1,
-        text_len=0,
-        chunk_count=0,
-        embedding_model="",
-        doc_sha256=digest,
-    )
-    session.add(ver)
-    session.commit()
-    session.refresh(ver)
 
-    doc.current_version_id = ver.id
-    session.add(doc)
-    session.commit()
+def _create_document(session, user: User, upload: _UploadReceiver) -> DocumentDetail:
+    ctype = _guess_type(upload.content_type)
+    size, digest = upload.size, upload.sha256.hexdigest()
+    # identical content is stored once, whoever uploads it
+    dest = store_blob(session, upload.tmp, digest, size)
+    safe = _safe_name(upload.filename or "document")
+
+    # the document and its first version are committed together; if that fails,
+    # the blob reference taken above is given back
+    try:
+        doc = Document(
+            owner_id=user.id,
+            name=safe,
+            filename=upload.filename or safe,
+            path=str(dest),
+            mime=ctype,
+            size=size,
+            sha256=digest,
+            status="uploaded",
+        )
+        session.add(doc)
+        session.flush()
+
+        ver = DocumentVersion(
+            document_id=doc.id,
+            version=1,
+            text_len=0,
+            chunk_count=0,
+            embedding_model="",
+            doc_sha256=digest,
+        )
+        session.add(ver)
+        session.flush()
+
+        doc.current_version_id = ver.id
+        session.add(doc)
+        session.commit()
+    except BaseException:
+        session.rollback()
+        release_blob(session, digest)
+        raise
     session.refresh(doc)
+    session.refresh(ver)
 
     audit_log(user.id, "upload", "document", doc.id, {"mime": ctype, "size": size})
 
@@ -198,9 +358,12 @@ def rename_document(
     current_path = Path(doc.path)
     parent_dir = current_path.parent
     candidate_path = parent_dir / candidate_name
+    if is_blob(doc.path):
+        # contenu partagé (dédupliqué par sha256): seul le nom d'affichage change
+        candidate_path = current_path
 
     # 4) éviter les collisions: suffixes _1.._100
-    if candidate_name != current_path.name and candidate_path.exists():
+    if candidate_path != current_path and candidate_path.exists():
         found = False
         for i in range(1, 101):
             trial_name = f"{base}_{i}{orig_ext}"
@@ -230,6 +393,7 @@ def rename_document(
     session.add(doc)
     session.commit()
     session.refresh(doc)
+    bump_generation()  # le titre affiché dans les résultats a changé
 
     audit_log(user.id, "rename", "document", doc.id, {"fs_renamed": fs_renamed, "new_name": candidate_name})
 
@@ -268,16 +432,18 @@ def delete_document(
     n_versions = len(versions)
 
     # Option: suppression d'artefacts d'index par version (best-effort, sans dépendance)
-    from ..config import INDEX_DIR
+    forget_versions([ver.id for ver in versions])
     index_removed = 0
     for ver in versions:
-        try:
-            idx_path = INDEX_DIR / f"{ver.id}.pkl"
-            if idx_path.exists():
-                idx_path.unlink(missing_ok=True)  # Py3.8+: on garde try/except de toute façon
-                index_removed += 1
-        except Exception:
-            pass
+        removed = False
+        for idx_path in map(Path, index_paths_for_version(ver.id)):
+            try:
+                if idx_path.exists():
+                    idx_path.unlink(missing_ok=True)  # Py3.8+: on garde try/except de toute façon
+                    removed = True
+            except Exception:
+                pass
+        index_removed += int(removed)
         session.delete(ver)
     session.commit()
 
@@ -286,7 +452,11 @@ def delete_document(
     fs_removed = False
     try:
         p = Path(doc.path)
-        if p.exists() and p.is_file():
+        if is_blob(doc.path):
+            # le blob n'est supprimé que si plus aucun document ne le référence
+            had_file = p.exists()
+            fs_removed = release_blob(session, doc.sha256)
+        elif p.exists() and p.is_file():
             had_file = True
             # Note étudiante: on tolère l'absence du fichier (il peut avoir été nettoyé manuellement).
             p.unlink(missing_ok=True)
@@ -297,6 +467,7 @@ def delete_document(
     # 4) supprimer le document
     session.delete(doc)
     session.commit()
+    bump_generation()
 
     # Note étudiante: on supprime aussi les versions/artefacts pour éviter des traces fantômes dans la recherche.
     try:
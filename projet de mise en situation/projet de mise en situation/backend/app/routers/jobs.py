@@ -0,0 +1,54 @@
+from __future__ import annotations
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from ..db import get_session
+from ..models import Document, IngestJob, User
+from ..dependencies import get_current_user
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+class JobRead(BaseModel):
+    id: int
+    document_id: int
+    status: str
+    attempts: int
+    pages_done: int
+    chunks_written: int
+    version_id: Optional[int]
+    error: Optional[str]
+    result: Optional[Dict[str, Any]]
+    created_at: datetime
+    updated_at: datetime
+
+
+def job_read(job: IngestJob) -> JobRead:
+    return JobRead(
+        id=job.id,
+        document_id=job.document_id,
+        status=job.status,
+        attempts=job.attempts,
+        pages_done=job.pages_done,
+        chunks_written=job.chunks_written,
+        version_id=job.version_id,
+        error=job.error,
+        result=(json.loads(job.result) if job.result else None),
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
+@router.get("/{job_id}", response_model=JobRead)
+def get_job(
+    job_id: int,
+    user: User = Depends(get_current_user),
+    session = Depends(get_session),
+):
+    job = session.get(IngestJob, job_id)
+    doc = session.get(Document, job.document_id) if job else None
+    if not job or (user.role not in ("admin", "support") and (not doc or doc.owner_id != user.id)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_read(job)
\ No newline at end of file
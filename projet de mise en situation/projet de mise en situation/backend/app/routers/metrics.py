@@ -0,0 +1,90 @@
+from __future__ import annotations
+import os
+from typing import List
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..services import embedding
+from ..services.metrics import Counter, Gauge, registry
+from ..services.retriever_cache import retriever_cache
+from ..services.shards import get_ann_shards, get_corpus_shards
+from ..services.embedding_cache import get_embedding_cache
+from ..services.result_cache import result_cache
+from ..services.auth_cache import token_cache, user_cache
+from ..services.audit import audit_writer
+from ..services.ingestion import ingest_queue
+
+router = APIRouter(tags=["metrics"])
+
+_model_bytes = None
+
+
+def _sentence_model_bytes() -> int:
+    # parameter memory of the loaded model; computed once, the model never changes
+    global _model_bytes
+    model = embedding._sentence_model
+    if model is None:
+        return 0
+    if _model_bytes is None:
+        try:
+            _model_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+        except Exception:
+            _model_bytes = 0
+    return _model_bytes
+
+
+def _runtime_metrics() -> List:
+    """Values the caches, indexes and queues already track, read at scrape time."""
+    hits = Counter("docuhelp_cache_hits_total", "Cache hits.", ["cache"])
+    misses = Counter("docuhelp_cache_misses_total", "Cache misses.", ["cache"])
+    memory = Gauge("docuhelp_memory_bytes", "Approximate memory held by models and indexes.", ["component"])
+    entries = Gauge("docuhelp_cache_entries", "Entries held by each cache.", ["cache"])
+    queue = Gauge("docuhelp_queue_depth", "Work waiting or running in background queues.", ["queue"])
+
+    rc = retriever_cache.stats()
+    hits.inc(rc["hits"], "retriever")
+    misses.inc(rc["misses"], "retriever")
+    entries.set(rc["entries"], "retriever")
+    memory.set(rc["bytes"], "retriever_cache")
+
+    ec = get_embedding_cache(embedding.MODEL_NAME).stats()
+    hits.inc(ec["hits"], "embedding")
+    misses.inc(ec["misses"], "embedding")
+    entries.set(ec["rows"], "embedding")
+
+    for name, cache in (("auth_token", token_cache), ("auth_user", user_cache)):
+        st = cache.stats()
+        hits.inc(st["hits"], name)
+        misses.inc(st["misses"], name)
+        entries.set(st["entries"], name)
+
+    res = result_cache.stats()
+    for tier in ("memory", "shared"):
+        if tier in res:
+            hits.inc(res[tier]["hits"], f"result_{tier}")
+            misses.inc(res[tier]["misses"], f"result_{tier}")
+            if res[tier]["entries"] is not None:
+                entries.set(res[tier]["entries"], f"result_{tier}")
+
+    ann = get_ann_shards().stats()
+    memory.set(ann["rows"] * ann["dim"] * 4, "ann_index")
+    corpus = get_corpus_shards()
+    corpus_bytes = 0
+    for i in corpus.shard_ids():
+        try:
+            corpus_bytes += os.path.getsize(corpus.shard(i).path)
+        except OSError:
+            pass
+    memory.set(corpus_bytes, "corpus_index")
+    memory.set(_sentence_model_bytes(), "sentence_model")
+
+    queue.set(audit_writer.stats()["queued"], "audit")
+    queue.set(ingest_queue.stats()["running"], "ingest_running")
+    return [hits, misses, entries, memory, queue]
+
+
+registry.add_collector(_runtime_metrics)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
\ No newline at end of file
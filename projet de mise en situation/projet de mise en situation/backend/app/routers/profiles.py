@@ -0,0 +1,35 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from ..db import get_session
+from ..models import User
+from ..dependencies import get_current_user, require_role
+from ..services.profiler import list_profiles, profile_path
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+
+def admin_from_headers(headers: Dict[str, str]) -> Optional[User]:
+    """ProfilingMiddleware check: the caller's user when require_role("admin") accepts it, else None."""
+    session = next(get_session())
+    try:
+        user = get_current_user(authorization=headers.get("authorization"), session=session)
+        return require_role("admin")(user=user)
+    except HTTPException:
+        return None
+    finally:
+        session.close()
+
+
+@router.get("", response_model=List[Dict[str, Any]])
+def get_profiles(current: User = Depends(require_role("admin"))):
+    return list_profiles()
+
+
+@router.get("/{profile_id}")
+def download_profile(profile_id: str, current: User = Depends(require_role("admin"))):
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=path.name)
\ No newline at end of file
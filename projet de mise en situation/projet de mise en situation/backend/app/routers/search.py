@@ -5,10 +5,11 @@ from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel
 from sqlmodel import select
 from ..db import get_session
-from ..models import Document, DocumentVersion, Chunk, User
+from ..models import Document, User
 from ..dependencies import get_current_user
-from ..services.indexing import search_versions
+from ..services.indexing import search_versions, hydrate_hits
 from ..services.audit import log as audit_log
+from ..services.result_cache import result_cache, corpus_generation
 from ..config import TOP_K
 
 router = APIRouter(tags=["search"])
@@ -27,25 +28,28 @@ class SearchEnvelope(BaseModel):
     results: List[SearchResult]
     total_results: int
     query_time: float
+    cached: bool = False
 
 
 @router.get("/search", response_model=SearchEnvelope)
 def search(q: str = Query(...), k: int = Query(TOP_K), user: User = Depends(get_current_user), session = Depends(get_session)):
-    t0 = time.time()
-    docs = session.exec(select(Document).where((Document.owner_id == user.id) | (user.role.in_(["admin", "support"])))).all()
-    version_ids = [d.current_version_id for d in docs if d.current_version_id]
-    hits = search_versions(q, version_ids, k=k, session=session) if version_ids else []
-    out: List[SearchResult] = []
-    for vid, idx, score in hits:
-        ver = session.get(DocumentVersion, vid)
-        if not ver:
-            continue
-        doc = session.get(Document, ver.document_id)
-        if not doc:
-            continue
-        ch = session.exec(select(Chunk).where((Chunk.doc_version_id == vid) & (Chunk.chunk_index == idx))).first()
-        snippet = ch.content[:240] if ch else ""
-        out.append(SearchResult(doc_id=doc.id, title=doc.name, version=ver.version, page=(ch.page if ch and ch.page else 1), snippet=snippet, score=float(score)))
-    elapsed = time.time() - t0
-    audit_log(user.id, "search", "document", None, {"q": q, "k": k, "t": elapsed, "hits": len(out)})
-    return SearchEnvelope(results=out, total_results=len(out), query_time=elapsed) 
\ No newline at end of file
+    t0 = time.perf_counter()
+    generation = corpus_generation()
+    vq = select(Document.current_version_id).where(Document.current_version_id.is_not(None))
+    if user.role not in ("admin", "support"):
+        vq = vq.where(Document.owner_id == user.id)
+    version_ids = list(session.exec(vq).all())
+    key = result_cache.key("search", q, k, version_ids, generation)
+    cached = result_cache.get(key)
+    if cached is not None:
+        out = [SearchResult(**r) for r in cached]
+    else:
+        hits = search_versions(q, version_ids, k=k, session=session) if version_ids else []
+        out = [
+            SearchResult(doc_id=h.doc_id, title=h.title, version=h.version, page=h.page, snippet=h.content[:240], score=h.score)
+            for h in hydrate_hits(session, hits)
+        ]
+        result_cache.put(key, [r.model_dump() for r in out])
+    elapsed = time.perf_counter() - t0
+    audit_log(user.id, "search", "document", None, {"q": q, "k": k, "t": elapsed, "hits": len(out), "cached": cached is not None})
+    return SearchEnvelope(results=out, total_results=len(out), query_time=elapsed, cached=cached is not None) 
\ No newline at end of file
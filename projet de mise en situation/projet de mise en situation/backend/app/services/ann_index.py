@@ -0,0 +1,359 @@
+from __future__ import annotations
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import INDEX_DIR, ANN_NLIST, ANN_NPROBE, ANN_EXACT_BELOW
+from .locks import file_lock
+
+# Compact once tombstoned rows exceed this share of the index.
+_COMPACT_RATIO = 0.25
+# Below this many rows every query is an exact scan, so no centroids are trained.
+_TRAIN_MIN_ROWS = 4096
+# Re-train (and reassign every row) once the index has grown this much since training.
+_RETRAIN_GROWTH = 4
+_KMEANS_ITERS = 10
+_KMEANS_MAX_SAMPLE = 131_072
+_BLOCK_ROWS = 65536
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), _BLOCK_ROWS):
+        block = np.asarray(x[start:start + _BLOCK_ROWS], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def kmeans(x: np.ndarray, n_clusters: int, iters: int = _KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on normalised rows; returns normalised centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=n_clusters, replace=False)].copy()
+    for _ in range(iters):
+        assign = _nearest(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_clusters)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        centroids[nonempty] = np.add.reduceat(x[order], starts, axis=0)
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            centroids[empty] = x[rng.choice(len(x), size=empty.size, replace=False)]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file (IVF-flat) index over the embeddings of every current chunk.
+
+    Rows are L2-normalised float32 vectors appended to ``vectors.f32`` in slot
+    order (a version's chunks occupy a contiguous run of slots). Once the index
+    is large enough, spherical k-means centroids split it into ``nlist`` lists;
+    a query scores the ``nprobe`` closest lists only. Visible sets smaller than
+    ``exact_below`` rows are scanned exactly instead. Writers from any process
+    serialise on a lock file; readers reload when ``meta.npz`` changes.
+    """
+
+    def __init__(self, root: Path, model: str, nlist: int = ANN_NLIST, nprobe: int = ANN_NPROBE, exact_below: int = ANN_EXACT_BELOW):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        self.nlist = nlist  # 0 = 4 * sqrt(rows) at training time
+        self.nprobe = nprobe
+        self.exact_below = exact_below
+        self._lock = threading.RLock()
+        self._meta_mtime: Optional[int] = None
+        self._reset(0)
+
+    def _reset(self, dim: int) -> None:
+        self.dim = dim
+        self._rows = 0
+        self._dead = 0
+        self._trained_rows = 0
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._slot_version = np.zeros(0, dtype=np.int64)
+        self._slot_chunk = np.zeros(0, dtype=np.int64)
+        self._slot_list = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._versions: Dict[int, Tuple[int, int]] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._rebuild_lists()
+
+    # --- persistence ---
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.root / "vectors.f32"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.root / "meta.npz"
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.stat(self._meta_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._meta_mtime:
+            return
+        with np.load(self._meta_path) as arrays:
+            meta = json.loads(str(arrays["meta"]))
+            self._meta_mtime = mtime
+            if meta.get("model") != self.model:
+                self._reset(0)  # encoded by another model: rebuilt on the next write
+                return
+            self._slot_version = arrays["slot_version"]
+            self._slot_chunk = arrays["slot_chunk"]
+            self._slot_list = arrays["slot_list"]
+            self._alive = arrays["alive"]
+            self._centroids = arrays["centroids"] if arrays["centroids"].size else None
+        self.dim = meta["dim"]
+        self._rows = meta["rows"]
+        self._dead = meta["dead"]
+        self._trained_rows = meta["trained_rows"]
+        self._versions = {int(v): (s, e) for v, (s, e) in meta["versions"].items()}
+        self._map_vectors()
+        self._rebuild_lists()
+
+    def _map_vectors(self) -> None:
+        if self._rows:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+        else:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+    def _write_meta(self) -> None:
+        # One file replaced atomically; its "rows" is the committed length of vectors.f32.
+        meta = {
+            "model": self.model,
+            "dim": self.dim,
+            "rows": self._rows,
+            "dead": self._dead,
+            "trained_rows": self._trained_rows,
+            "versions": {str(v): list(r) for v, r in self._versions.items()},
+        }
+        tmp = self.root / "meta.npz.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps(meta)),
+                slot_version=self._slot_version,
+                slot_chunk=self._slot_chunk,
+                slot_list=self._slot_list,
+                alive=self._alive,
+                centroids=self._centroids if self._centroids is not None else np.zeros((0, self.dim), dtype=np.float32),
+            )
+        os.replace(tmp, self._meta_path)
+        self._meta_mtime = os.stat(self._meta_path).st_mtime_ns
+
+    def _rebuild_lists(self) -> None:
+        """Group slots by list: list ``l`` is ``_order[_bounds[l]:_bounds[l + 1]]``."""
+        n_lists = len(self._centroids) if self._centroids is not None else 1
+        self._order = np.argsort(self._slot_list, kind="stable")
+        self._bounds = np.searchsorted(self._slot_list[self._order], np.arange(n_lists + 1))
+
+    # --- mutation ---
+
+    def missing_versions(self, version_ids: Iterable[int]) -> List[int]:
+        with self._lock:
+            self._refresh()
+            return [vid for vid in version_ids if vid not in self._versions]
+
+    def version_sizes(self) -> Dict[int, int]:
+        """Row count of every indexed version."""
+        with self._lock:
+            self._refresh()
+            return {vid: end - start for vid, (start, end) in self._versions.items()}
+
+    def chunk_count(self) -> int:
+        """Live rows, what ``version_sizes`` sums to."""
+        with self._lock:
+            self._refresh()
+            return self._rows - self._dead
+
+    def version_vectors(self, version_id: int) -> Optional[np.ndarray]:
+        """A copy of the rows of ``version_id`` (chunk order), None if it is not indexed."""
+        with self._lock:
+            self._refresh()
+            rng = self._versions.get(version_id)
+            if rng is None:
+                return None
+            return np.array(self._vectors[rng[0]:rng[1]])
+
+    def add_version(self, version_id: int, embeddings: np.ndarray) -> None:
+        self.add_versions({version_id: embeddings})
+
+    def add_versions(self, batch: Dict[int, np.ndarray]) -> None:
+        """Insert the embeddings of each version (row i = chunk_index i)."""
+        with self._lock, file_lock(self.root / ".lock"):
+            self._refresh()
+            mats = {vid: np.asarray(m, dtype=np.float32).reshape(len(m), -1) for vid, m in batch.items()}
+            dim = next((m.shape[1] for m in mats.values() if len(m)), 0)
+            if dim and self.dim and dim != self.dim:
+                raise ValueError(f"Embedding dim {dim} does not match ANN index dim {self.dim}")
+            if self._meta_mtime is None or not self.dim:
+                self._reset(dim)
+            for vid in mats:
+                self._tombstone(vid)
+            new_rows = [m for m in mats.values() if len(m)]
+            new = _normalize(np.concatenate(new_rows)) if new_rows else np.zeros((0, self.dim), dtype=np.float32)
+            with open(self._vectors_path, "a+b") as f:
+                # drop rows a crashed writer appended without committing meta.npz
+                f.truncate(self._rows * self.dim * 4)
+                f.seek(0, os.SEEK_END)
+                f.write(new.tobytes())
+            start = self._rows
+            versions, chunks = [], []
+            for vid, m in mats.items():
+                self._versions[vid] = (start, start + len(m))
+                versions.append(np.full(len(m), vid, dtype=np.int64))
+                chunks.append(np.arange(len(m), dtype=np.int64))
+                start += len(m)
+            assign = _nearest(new, self._centroids) if self._centroids is not None else np.zeros(len(new), dtype=np.int32)
+            self._slot_version = np.concatenate([self._slot_version, *versions])
+            self._slot_chunk = np.concatenate([self._slot_chunk, *chunks])
+            self._slot_list = np.concatenate([self._slot_list, assign])
+            self._alive = np.concatenate([self._alive, np.ones(len(new), dtype=bool)])
+            self._rows += len(new)
+            self._map_vectors()
+            alive_rows = self._rows - self._dead
+            if alive_rows >= _TRAIN_MIN_ROWS and (self._centroids is None or alive_rows >= _RETRAIN_GROWTH * self._trained_rows):
+                self._train()
+            self._write_meta()
+            self._rebuild_lists()
+
+    def remove_versions(self, version_ids: Iterable[int]) -> int:
+        with self._lock, file_lock(self.root / ".lock"):
+            self._refresh()
+            removed = sum(self._tombstone(vid) for vid in version_ids)
+            if removed:
+                if self._dead > _COMPACT_RATIO * max(1, self._rows):
+                    self._compact()
+                self._write_meta()
+                self._rebuild_lists()
+            return removed
+
+    def _tombstone(self, version_id: int) -> bool:
+        rng = self._versions.pop(version_id, None)
+        if rng is None:
+            return False
+        start, end = rng
+        self._alive[start:end] = False
+        self._dead += end - start
+        return True
+
+    def _train(self) -> None:
+        alive = np.flatnonzero(self._alive)
+        nlist = self.nlist or int(min(65536, max(16, 4 * np.sqrt(len(alive)))))
+        nlist = min(nlist, len(alive))
+        rng = np.random.default_rng(0)
+        sample_size = min(len(alive), max(16_384, 32 * nlist), _KMEANS_MAX_SAMPLE)
+        sample = np.asarray(self._vectors[np.sort(rng.choice(alive, size=sample_size, replace=False))])
+        self._centroids = kmeans(sample, nlist)
+        self._slot_list = _nearest(self._vectors, self._centroids)
+        self._trained_rows = len(alive)
+
+    def _compact(self) -> None:
+        """Rewrite vectors.f32 without tombstoned rows and renumber slots."""
+        keep = np.flatnonzero(self._alive)
+        remap = np.cumsum(self._alive) - 1
+        tmp = self.root / "vectors.f32.tmp"
+        with open(tmp, "wb") as f:
+            for start in range(0, len(keep), _BLOCK_ROWS):
+                f.write(np.asarray(self._vectors[keep[start:start + _BLOCK_ROWS]]).tobytes())
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32)  # release the old mapping
+        os.replace(tmp, self._vectors_path)
+        self._versions = {vid: (int(remap[s]), int(remap[s]) + (e - s)) if e > s else (0, 0) for vid, (s, e) in self._versions.items()}
+        self._slot_version = self._slot_version[keep]
+        self._slot_chunk = self._slot_chunk[keep]
+        self._slot_list = self._slot_list[keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._rows = len(keep)
+        self._dead = 0
+        self._map_vectors()
+
+    # --- query ---
+
+    def visible_rows(self, version_ids: Sequence[int]) -> int:
+        with self._lock:
+            self._refresh()
+            return sum(e - s for s, e in (self._versions[v] for v in version_ids if v in self._versions))
+
+    def search(self, query_vec: np.ndarray, version_ids: Sequence[int], k: int, nprobe: Optional[int] = None,
+               visible: Optional[int] = None) -> List[Tuple[int, int, float]]:
+        """Top-k (version_id, chunk_index, cosine) among the given versions.
+
+        ``visible`` (rows visible across every shard, see ``visible_rows``)
+        replaces this index's own count when choosing between an exact scan and
+        the IVF probe.
+        """
+        q = _normalize(np.asarray(query_vec, dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            self._refresh()
+            ranges = [self._versions[v] for v in version_ids if v in self._versions]
+            total = sum(e - s for s, e in ranges)
+            if k <= 0 or total == 0 or q.shape[0] != self.dim:
+                return []
+            vectors, slot_version, slot_chunk = self._vectors, self._slot_version, self._slot_chunk
+            if self._centroids is None or (visible if visible is not None else total) <= self.exact_below:
+                cand = np.concatenate([np.arange(s, e) for s, e in ranges if e > s])
+            else:
+                cand = self._probe(q, version_ids, k, nprobe or self.nprobe)
+        if cand.size == 0:
+            return []
+        scores = vectors[cand] @ q
+        if cand.size > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(cand.size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(slot_version[cand[i]]), int(slot_chunk[cand[i]]), float(scores[i])) for i in top]
+
+    def _probe(self, q: np.ndarray, version_ids: Sequence[int], k: int, nprobe: int) -> np.ndarray:
+        n_lists = len(self._centroids)
+        by_distance = np.argsort(-(self._centroids @ q))
+        allowed = np.asarray(list(version_ids), dtype=np.int64)
+        nprobe = min(max(1, nprobe), n_lists)
+        while True:
+            lists = by_distance[:nprobe]
+            cand = np.concatenate([self._order[self._bounds[l]:self._bounds[l + 1]] for l in lists])
+            cand = cand[self._alive[cand] & np.isin(self._slot_version[cand], allowed)]
+            # widen the probe when the caller's documents are sparse in the closest lists
+            if cand.size >= k or nprobe >= n_lists:
+                return np.sort(cand)
+            nprobe = min(n_lists, nprobe * 2)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._refresh()
+            return {
+                "rows": self._rows,
+                "alive": self._rows - self._dead,
+                "lists": len(self._centroids) if self._centroids is not None else 0,
+                "nprobe": self.nprobe,
+                "dim": self.dim,
+            }
+
+
+_index: Optional[IVFIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_ann_index() -> IVFIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from .embedding import MODEL_NAME
+                _index = IVFIndex(INDEX_DIR / "ann", MODEL_NAME)
+    return _index
\ No newline at end of file
@@ -1,16 +1,162 @@
 from __future__ import annotations
 import json
-from typing import Optional, Dict, Any
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy import insert
+
+from ..config import AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_SECONDS, AUDIT_OVERFLOW, AUDIT_BLOCK_SECONDS
 from ..db import get_session
 from ..models import AuditLog
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """Bounded queue of audit rows written by a background thread.
+
+    Rows are inserted in multi-row batches once ``batch_size`` are pending or
+    ``flush_seconds`` after the oldest one, so request threads never wait on
+    an audit commit. When the queue is full, ``overflow="block"`` waits up to
+    ``block_seconds`` for room and ``"drop"`` does not wait; either way a row
+    that does not fit is dropped and counted. ``max_queue=0`` writes each row
+    synchronously (the previous behaviour).
+    """
+
+    def __init__(self, max_queue: int = AUDIT_QUEUE_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_seconds: float = AUDIT_FLUSH_SECONDS, overflow: str = AUDIT_OVERFLOW,
+                 block_seconds: float = AUDIT_BLOCK_SECONDS):
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max(1, max_queue))
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """Queue one AuditLog row; returns False when it was dropped."""
+        if self.max_queue <= 0:
+            self._write([row])
+            return True
+        self._ensure_started()
+        try:
+            if self.overflow == "drop":
+                self._queue.put_nowait(row)
+            else:
+                self._queue.put(row, timeout=self.block_seconds)
+        except queue.Full:
+            self._count(dropped=1)
+            return False
+        self._count(enqueued=1)
+        return True
+
+    def _count(self, **deltas: int) -> None:
+        with self._counters_lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def start(self) -> None:
+        if self.max_queue > 0:
+            self._ensure_started()
+
+    def stop(self) -> None:
+        """Stop the writer thread and write everything still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def flush(self) -> None:
+        """Write every queued row now, from the calling thread."""
+        while True:
+            batch = self._take(self.batch_size, deadline=None)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _take(self, n: int, deadline: Optional[float]) -> List[Dict[str, Any]]:
+        # deadline None: only what is already queued; otherwise wait for more until then
+        batch: List[Dict[str, Any]] = []
+        while len(batch) < n:
+            try:
+                if deadline is None:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            batch = [first] + self._take(self.batch_size - 1, deadline=time.monotonic() + self.flush_seconds)
+            self._write(batch)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        with self._write_lock, stage("audit_write"):
+            session = next(get_session())
+            try:
+                session.execute(insert(AuditLog.__table__), rows)
+                session.commit()
+                self._count(written=len(rows), batches=1)
+            except Exception:
+                # an audit failure must not take requests down with it
+                self._count(failed=len(rows))
+                logger.exception("failed to write %d audit rows", len(rows))
+            finally:
+                session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "overflow": self.overflow,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+audit_writer = AuditWriter()
 
 
 def log(user_id: Optional[int], action: str, resource: str, ref_id: Optional[int] = None, meta: Optional[Dict[str, Any]] = None) -> None:
-    session_gen = get_session()
-    session = next(session_gen)
-    try:
-        entry = AuditLog(user_id=user_id, action=action, resource=resource, ref_id=ref_id, meta=(json.dumps(meta) if meta else None))
-        session.add(entry)
-        session.commit()
-    finally:
-        session.close() 
\ No newline at end of file
+    audit_writer.submit({
+        "user_id": user_id,
+        "action": action,
+        "resource": resource,
+        "ref_id": ref_id,
+        "meta": json.dumps(meta) if meta else None,
+        "created_at": datetime.now(timezone.utc),
+    })
\ No newline at end of file
@@ -0,0 +1,97 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event
+
+from ..config import AUTH_USER_TTL_SECONDS, AUTH_CACHE_MAX_ENTRIES
+from ..models import User
+
+
+class TTLCache:
+    """Small thread-safe LRU whose entries expire at a per-entry deadline (epoch seconds)."""
+
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, expires_at: float) -> None:
+        if self.max_entries <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
+
+
+# token -> decoded claims, kept until the token's own "exp"
+token_cache = TTLCache()
+# user id -> detached User, kept AUTH_USER_TTL_SECONDS (the bound on staleness across processes)
+user_cache = TTLCache()
+
+
+def cached_claims(token: str) -> Optional[Dict[str, Any]]:
+    return token_cache.get(token)
+
+
+def remember_claims(token: str, claims: Dict[str, Any]) -> None:
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        token_cache.put(token, claims, float(exp))
+
+
+def cached_user(user_id: int) -> Optional[User]:
+    return user_cache.get(user_id)
+
+
+def remember_user(user: User) -> None:
+    if AUTH_USER_TTL_SECONDS > 0:
+        # a copy that is not attached to the request's session
+        user_cache.put(user.id, User(**user.model_dump()), time.time() + AUTH_USER_TTL_SECONDS)
+
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.invalidate(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target: User) -> None:
+    # role, email or password changes made through the ORM in this process apply immediately
+    invalidate_user(target.id)
\ No newline at end of file
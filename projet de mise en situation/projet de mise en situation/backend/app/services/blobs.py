@@ -0,0 +1,58 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+
+from ..config import STORAGE_DIR
+from ..models import Blob
+from .locks import file_lock
+
+BLOB_DIR = STORAGE_DIR / "blobs"
+BLOB_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def blob_path(digest: str) -> Path:
+    return BLOB_DIR / digest[:2] / digest
+
+
+def is_blob(path: str) -> bool:
+    return Path(path).resolve().is_relative_to(BLOB_DIR)
+
+
+def store_blob(session, tmp: Path, digest: str, size: int) -> Path:
+    """Move ``tmp`` into the blob store (or drop it if the digest is already stored) and take a reference.
+
+    The reference count and the file are updated under a lock shared with
+    ``release_blob``, so a concurrent delete cannot unlink a blob that an
+    upload just referenced.
+    """
+    dest = blob_path(digest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with file_lock(BLOB_DIR / ".lock"):
+        blob = session.get(Blob, digest)
+        if blob is None:
+            blob = Blob(sha256=digest, path=str(dest), size=size)
+        if dest.exists():
+            tmp.unlink(missing_ok=True)
+        else:
+            os.replace(tmp, dest)
+        blob.refcount += 1
+        session.add(blob)
+        session.commit()
+    return dest
+
+
+def release_blob(session, digest: str) -> bool:
+    """Drop one reference; returns True when that was the last one and the file was removed."""
+    with file_lock(BLOB_DIR / ".lock"):
+        blob = session.get(Blob, digest)
+        if blob is None:
+            return False
+        blob.refcount -= 1
+        if blob.refcount > 0:
+            session.add(blob)
+            session.commit()
+            return False
+        session.delete(blob)
+        session.commit()
+        Path(blob.path).unlink(missing_ok=True)
+        return True
\ No newline at end of file
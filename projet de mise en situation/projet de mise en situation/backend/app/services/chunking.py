@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List
 
 
 def chunk_text(text: str, max_chars: int = 800, overlap: int = 80) -> List[Dict]:
@@ -18,11 +18,14 @@ def chunk_text(text: str, max_chars: int = 800, overlap: int = 80) -> List[Dict]
     return chunks
 
 
-def chunk_pages(pages: List[str], max_chars: int = 800, overlap: int = 80) -> List[Dict]:
-    out: List[Dict] = []
+def iter_chunks(pages: Iterable[str], max_chars: int = 800, overlap: int = 80) -> Iterator[Dict]:
+    """Chunks of each page in turn; only the current page is held."""
     for i, page_text in enumerate(pages):
         page_num = i + 1
         for c in chunk_text(page_text, max_chars=max_chars, overlap=overlap):
             c["page"] = page_num
-            out.append(c)
-    return out 
\ No newline at end of file
+            yield c
+
+
+def chunk_pages(pages: List[str], max_chars: int = 800, overlap: int = 80) -> List[Dict]:
+    return list(iter_chunks(pages, max_chars=max_chars, overlap=overlap)) 
\ No newline at end of file
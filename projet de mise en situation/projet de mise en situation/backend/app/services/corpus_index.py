@@ -0,0 +1,407 @@
+from __future__ import annotations
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import INDEX_DIR, BM25_K1, BM25_B
+from .locks import file_lock
+
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+# A posting packs (slot, tf) into one int64: slot << _TF_BITS | tf.
+_TF_BITS = 16
+_TF_MASK = (1 << _TF_BITS) - 1
+
+# Compact once tombstoned slots exceed this share of the index.
+_COMPACT_RATIO = 0.25
+# Rewrite the snapshot once the delta log outgrows this share of it (and _LOG_MIN_BYTES).
+_LOG_RATIO = 0.5
+_LOG_MIN_BYTES = 1 << 20
+
+
+def tokenize(text: str) -> List[str]:
+    # Same token pattern as sklearn's TfidfVectorizer default.
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class _View:
+    """Read-only copy of an index's slot columns, scored without holding its lock.
+
+    Built on the first query after a mutation; the live postings of each
+    queried term are copied in (under the index lock) the first time they
+    are needed, so writers never touch what a query is reading.
+    """
+
+    def __init__(self, index: "CorpusIndex"):
+        self.n_alive = len(index._slot_version) - index._dead
+        self.total_len = index._total_len
+        self.lens = np.array(index._slot_len, dtype=np.int64)
+        self.slot_version = np.array(index._slot_version, dtype=np.int64)
+        self.slot_chunk = np.array(index._slot_chunk, dtype=np.int64)
+        self.alive = np.frombuffer(bytes(index._alive), dtype=np.uint8)
+        self.postings: Dict[str, Optional[np.ndarray]] = {}
+
+    def term_stats(self, terms: Iterable[str]) -> Tuple[int, int, Dict[str, int]]:
+        dfs = {t: int(self.postings[t].size) for t in terms if self.postings.get(t) is not None}
+        return self.n_alive, self.total_len, dfs
+
+
+class CorpusIndex:
+    """Corpus-wide BM25 inverted index over the chunks of every ingested version.
+
+    Each chunk gets a slot; a version's chunks are appended as a contiguous run
+    of slots and tombstoned on delete (re-adding a version replaces it). Term
+    statistics are global and count live slots only, so a query scores every
+    visible chunk in one pass over the posting lists of its terms.
+
+    On disk: a pickled snapshot plus an append-only log of the adds and
+    removes made since, replayed on load up to the last complete record (a
+    record torn by a crash is truncated away); the snapshot is rewritten when
+    the log grows past ``_LOG_RATIO`` of it or on compaction. Writers from any
+    process serialise on a lock file.
+
+    Queries score a ``_View`` taken under the lock and released before the
+    scoring pass, so a slow query does not hold up writers or other queries.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._log_path = path.with_name(path.name + ".log")
+        self._lock_path = path.with_name(path.name + ".lock")
+        self._lock = threading.RLock()
+        self._snapshot: Optional[Tuple[int, int]] = None  # (mtime_ns, size) of the loaded snapshot
+        self._base: Optional[str] = None  # id of the snapshot, written at the head of its log
+        self._log_offset = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._view: Optional[_View] = None
+        self._postings: Dict[str, array] = {}
+        self._slot_version = array("q")
+        self._slot_chunk = array("q")
+        self._slot_len = array("q")
+        self._alive = bytearray()
+        self._versions: Dict[int, Tuple[int, int]] = {}  # version_id -> [start, end)
+        self._total_len = 0
+        self._dead = 0
+
+    # --- persistence ---
+
+    def _stat(self) -> Tuple[Optional[Tuple[int, int]], int]:
+        try:
+            st = os.stat(self.path)
+            snapshot = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            snapshot = None
+        try:
+            log_size = os.path.getsize(self._log_path)
+        except OSError:
+            log_size = 0
+        return snapshot, log_size
+
+    def _refresh(self, locked: bool = False) -> None:
+        """Catch up with the snapshot and log written by other processes."""
+        if self._stat() == (self._snapshot, self._log_offset):
+            return
+        if locked:
+            self._load()
+        else:
+            with file_lock(self._lock_path):
+                self._load()
+
+    def _load(self) -> None:
+        # Caller holds the file lock: the snapshot and its log are consistent.
+        snapshot, log_size = self._stat()
+        if snapshot != self._snapshot:
+            self._reset()
+            self._base = None
+            if snapshot is not None:
+                with open(self.path, "rb") as f:
+                    data = pickle.load(f)
+                self._postings = data["postings"]
+                self._slot_version = data["slot_version"]
+                self._slot_chunk = data["slot_chunk"]
+                self._slot_len = data["slot_len"]
+                self._alive = data["alive"]
+                self._versions = data["versions"]
+                self._total_len = data["total_len"]
+                self._dead = data["dead"]
+                self._base = data.get("base")
+            self._snapshot = snapshot
+            self._log_offset = 0
+        if log_size <= self._log_offset:
+            return
+        with open(self._log_path, "rb") as f:
+            f.seek(self._log_offset)
+            complete = self._log_offset  # end of the last complete record
+            try:
+                if complete == 0:
+                    head = pickle.load(f)
+                    if self._base is None or head != ("base", self._base):
+                        # log of a snapshot that was replaced before the log was (interrupted save)
+                        self._log_offset = log_size
+                        return
+                    complete = f.tell()
+                while complete < log_size:
+                    op, arg = pickle.load(f)
+                    complete = f.tell()
+                    if op == "add":
+                        self._add(arg)
+                    else:
+                        self._remove(arg)
+                torn = False
+            except (EOFError, pickle.UnpicklingError):
+                torn = True
+        if torn:
+            # a writer died mid-record: cut it off so later appends stay readable
+            os.truncate(self._log_path, complete)
+        self._log_offset = complete
+
+    def _save(self) -> None:
+        """Write a full snapshot and start an empty log."""
+        self._base = os.urandom(8).hex()
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump({
+                "postings": self._postings,
+                "slot_version": self._slot_version,
+                "slot_chunk": self._slot_chunk,
+                "slot_len": self._slot_len,
+                "alive": self._alive,
+                "versions": self._versions,
+                "total_len": self._total_len,
+                "dead": self._dead,
+                "base": self._base,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        try:
+            os.remove(self._log_path)
+        except FileNotFoundError:
+            pass
+        self._snapshot, self._log_offset = self._stat()
+
+    def _commit(self, op: str, arg) -> None:
+        """Persist one mutation already applied in memory. Call under the file lock."""
+        if self._dead > _COMPACT_RATIO * max(1, len(self._alive)):
+            self._compact()
+            self._save()
+            return
+        if self._snapshot is None:
+            self._save()
+            return
+        with open(self._log_path, "ab") as f:
+            if f.tell() == 0:
+                pickle.dump(("base", self._base), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump((op, arg), f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._snapshot, self._log_offset = self._stat()
+        if self._log_offset > max(_LOG_MIN_BYTES, _LOG_RATIO * self._snapshot[1]):
+            self._save()
+
+    # --- mutation ---
+
+    def missing_versions(self, version_ids: Iterable[int]) -> List[int]:
+        with self._lock:
+            self._refresh()
+            return [vid for vid in version_ids if vid not in self._versions]
+
+    def version_sizes(self) -> Dict[int, int]:
+        """Chunk count of every indexed version."""
+        with self._lock:
+            self._refresh()
+            return {vid: end - start for vid, (start, end) in self._versions.items()}
+
+    def chunk_count(self) -> int:
+        """Live chunks, what ``version_sizes`` sums to."""
+        with self._lock:
+            self._refresh()
+            return len(self._slot_version) - self._dead
+
+    def add_version(self, version_id: int, texts: Sequence[str]) -> None:
+        """Append the chunks of a version (chunk_index = position in ``texts``)."""
+        self.add_versions({version_id: texts})
+
+    def add_versions(self, batch: Dict[int, Sequence[str]]) -> None:
+        """Index each version of ``batch``, replacing it if it is already indexed."""
+        batch = {vid: list(texts) for vid, texts in batch.items()}
+        with self._lock, file_lock(self._lock_path):
+            self._refresh(locked=True)
+            self._add(batch)
+            self._commit("add", batch)
+
+    def _add(self, batch: Dict[int, List[str]]) -> None:
+        self._view = None
+        for version_id, texts in batch.items():
+            if version_id in self._versions:
+                self._tombstone(version_id)
+                del self._versions[version_id]
+            start = len(self._slot_version)
+            for idx, text in enumerate(texts):
+                slot = start + idx
+                counts: Dict[str, int] = {}
+                for tok in tokenize(text):
+                    counts[tok] = counts.get(tok, 0) + 1
+                for tok, tf in counts.items():
+                    posting = self._postings.get(tok)
+                    if posting is None:
+                        posting = self._postings[tok] = array("q")
+                    posting.append((slot << _TF_BITS) | min(tf, _TF_MASK))
+                length = sum(counts.values())
+                self._slot_version.append(version_id)
+                self._slot_chunk.append(idx)
+                self._slot_len.append(length)
+                self._alive.append(1)
+                self._total_len += length
+            self._versions[version_id] = (start, len(self._slot_version))
+
+    def remove_versions(self, version_ids: Iterable[int]) -> int:
+        """Tombstone the slots of the given versions; returns the number removed."""
+        version_ids = list(version_ids)
+        with self._lock, file_lock(self._lock_path):
+            self._refresh(locked=True)
+            removed = self._remove(version_ids)
+            if removed:
+                self._commit("remove", version_ids)
+            return removed
+
+    def _remove(self, version_ids: List[int]) -> int:
+        removed = 0
+        for vid in version_ids:
+            if vid in self._versions:
+                self._tombstone(vid)
+                del self._versions[vid]
+                removed += 1
+        return removed
+
+    def _tombstone(self, version_id: int) -> None:
+        self._view = None
+        start, end = self._versions[version_id]
+        for slot in range(start, end):
+            if self._alive[slot]:
+                self._alive[slot] = 0
+                self._total_len -= self._slot_len[slot]
+                self._dead += 1
+
+    def _compact(self) -> None:
+        """Drop dead slots from every posting list and renumber the survivors."""
+        self._view = None
+        alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        postings: Dict[str, array] = {}
+        for tok, posting in self._postings.items():
+            packed = np.frombuffer(posting, dtype=np.int64)
+            slots = packed >> _TF_BITS
+            keep = alive[slots]
+            if not keep.any():
+                continue
+            repacked = (remap[slots[keep]] << _TF_BITS) | (packed[keep] & _TF_MASK)
+            postings[tok] = array("q", repacked.tobytes())
+        self._postings = postings
+        self._slot_version = array("q", np.frombuffer(self._slot_version, dtype=np.int64)[alive].tobytes())
+        self._slot_chunk = array("q", np.frombuffer(self._slot_chunk, dtype=np.int64)[alive].tobytes())
+        self._slot_len = array("q", np.frombuffer(self._slot_len, dtype=np.int64)[alive].tobytes())
+        self._alive = bytearray(b"\x01" * len(self._slot_version))
+        self._versions = {
+            vid: ((int(remap[s]), int(remap[s]) + (e - s)) if e > s else (0, 0))
+            for vid, (s, e) in self._versions.items()
+        }
+        self._dead = 0
+
+    # --- query ---
+
+    def _live_postings(self, tok: str) -> Optional[np.ndarray]:
+        """A copy of the packed postings of ``tok`` on live slots, None if there are none."""
+        posting = self._postings.get(tok)
+        if not posting:
+            return None
+        packed = np.array(posting, dtype=np.int64)
+        if self._dead:
+            alive = np.frombuffer(self._alive, dtype=np.uint8)
+            packed = packed[alive[packed >> _TF_BITS] == 1]
+        return packed if packed.size else None
+
+    def _view_of(self, terms: Iterable[str]) -> _View:
+        """The current view, with the postings of ``terms`` filled in. Call under ``self._lock``."""
+        view = self._view
+        if view is None:
+            view = self._view = _View(self)
+        for t in terms:
+            if t not in view.postings:
+                view.postings[t] = self._live_postings(t)
+        return view
+
+    def term_stats(self, terms: Iterable[str]) -> Tuple[int, int, Dict[str, int]]:
+        """(live chunks, their total length, document frequency of each term).
+
+        What BM25 needs besides the postings; a sharded index sums them over its
+        shards so every shard scores with the statistics of the whole corpus.
+        """
+        terms = list(terms)
+        with self._lock:
+            self._refresh()
+            view = self._view_of(terms)
+        return view.term_stats(terms)
+
+    def search(self, query: str, version_ids: Sequence[int], k: int,
+               stats: Optional[Tuple[int, int, Dict[str, int]]] = None) -> List[Tuple[int, int, float]]:
+        """Top-k (version_id, chunk_index, score) among the given versions.
+
+        Scores are BM25 divided by the query's maximum attainable BM25 score so
+        they stay in [0, 1], like the cosine scores of the per-version retrievers.
+        ``stats`` (see ``term_stats``) replaces this index's own corpus statistics.
+        """
+        terms = set(tokenize(query))
+        if not terms or not version_ids or k <= 0:
+            return []
+        with self._lock:
+            self._refresh()
+            if not any(v in self._versions for v in version_ids):
+                return []
+            view = self._view_of(terms)
+        if stats is None:
+            stats = view.term_stats(terms)
+        n_alive, total_len, dfs = stats
+        if n_alive <= 0:
+            return []
+        avgdl = total_len / n_alive or 1.0
+        scores = np.zeros(view.lens.size, dtype=np.float64)
+        upper = 0.0
+        for tok, df in dfs.items():
+            idf = math.log(1.0 + (n_alive - df + 0.5) / (df + 0.5))
+            upper += idf * (BM25_K1 + 1.0)
+            packed = view.postings.get(tok)
+            if packed is None:
+                continue
+            slots = packed >> _TF_BITS
+            tfs = (packed & _TF_MASK).astype(np.float64)
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * view.lens[slots] / avgdl)
+            scores[slots] += idf * tfs * (BM25_K1 + 1.0) / (tfs + norm)
+        cand = np.flatnonzero(scores)
+        if cand.size == 0 or upper <= 0:
+            return []
+        cand = cand[(view.alive[cand] == 1) & np.isin(view.slot_version[cand], np.asarray(list(version_ids), dtype=np.int64))]
+        if cand.size == 0:
+            return []
+        if cand.size > k:
+            cand = cand[np.argpartition(-scores[cand], k - 1)[:k]]
+        cand = cand[np.argsort(-scores[cand], kind="stable")]
+        return [(int(view.slot_version[s]), int(view.slot_chunk[s]), float(scores[s] / upper)) for s in cand]
+
+
+_index: Optional[CorpusIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_corpus_index() -> CorpusIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CorpusIndex(INDEX_DIR / "corpus.idx")
+    return _index
\ No newline at end of file
@@ -0,0 +1,364 @@
+"""Shared embedding server: one model per host, micro-batched encodes.
+
+Without it every uvicorn worker and ingest process loads its own copy of the
+SentenceTransformer and encodes queries one at a time. Run once per host:
+
+    python -m app.services.embed_server --socket /run/docuhelp/embed.sock
+
+and set ``EMBED_SERVER_SOCKET`` to the same path for the API; its processes
+then get an ``EmbeddingClient`` as their "sentence model". Requests arriving
+within ``EMBED_BATCH_WINDOW_MS`` of each other are encoded in one forward
+pass (up to ``EMBED_BATCH_MAX`` texts).
+
+Wire format, both directions over a Unix stream socket:
+
+  request   u32 length + JSON {"op": "encode", "texts": [...]} | {"op": "stats"}
+  response  1-byte kind + u32 length + payload
+            V  u32 rows, u32 dim, rows*dim float32 (little-endian)
+            J  JSON
+            E  error message (utf-8)
+
+Embeddings are always L2-normalised, which is what every caller asks for.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import EMBED_SERVER_SOCKET, EMBED_BATCH_WINDOW_MS, EMBED_BATCH_MAX, EMBED_SERVER_TIMEOUT_SECONDS, EMBEDDINGS_MODEL
+
+logger = logging.getLogger(__name__)
+
+_LEN = struct.Struct("!I")
+_KIND_LEN = struct.Struct("!cI")
+_SHAPE = struct.Struct("<II")
+
+
+class EmbeddingServerError(RuntimeError):
+    pass
+
+
+class EmbeddingServerUnavailable(EmbeddingServerError):
+    """Nothing answered on the socket; the request was not sent."""
+
+
+class EmbeddingServer:
+    """Coalesces concurrent encode requests into batches for one model.
+
+    Connections put ``(texts, future)`` on a queue; a single batcher task takes
+    the first request, keeps collecting until the window closes or the batch is
+    full, encodes the lot on one executor thread and hands each request its
+    rows. Requests arriving during an encode form the next batch.
+    """
+
+    def __init__(self, model, model_name: str, window_ms: float = EMBED_BATCH_WINDOW_MS, max_batch: int = EMBED_BATCH_MAX):
+        self.model = model
+        self.model_name = model_name
+        self.window = max(0.0, window_ms / 1000)
+        self.max_batch = max(1, max_batch)
+        self._queue: Optional[asyncio.Queue] = None
+        # one thread: batches run one after another, the event loop keeps accepting meanwhile
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.encode_seconds = 0.0
+        self.dim: Optional[int] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "dim": self.dim,
+            "pid": os.getpid(),
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "mean_batch_texts": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+        }
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        t = time.perf_counter()
+        vecs = np.asarray(self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True), dtype=np.float32)
+        self.encode_seconds += time.perf_counter() - t
+        return vecs.reshape(len(texts), -1)
+
+    async def _next_batch(self) -> List[Tuple[List[str], asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        n = len(batch[0][0])
+        deadline = loop.time() + self.window
+        while n < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(item)
+            n += len(item[0])
+        return batch
+
+    async def _batcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            texts = [t for item_texts, _ in batch for t in item_texts]
+            try:
+                vecs = await loop.run_in_executor(self._executor, self._encode, texts)
+            except Exception as e:
+                logger.exception("encode failed (%d texts)", len(texts))
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            self.dim = int(vecs.shape[1])
+            start = 0
+            for item_texts, fut in batch:
+                if not fut.done():  # the client may have gone away
+                    fut.set_result(vecs[start:start + len(item_texts)])
+                start += len(item_texts)
+
+    async def _reply(self, writer: asyncio.StreamWriter, kind: bytes, payload: bytes) -> None:
+        writer.write(_KIND_LEN.pack(kind, len(payload)) + payload)
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    (size,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+                    request = json.loads(await reader.readexactly(size))
+                except asyncio.IncompleteReadError:
+                    return
+                op = request.get("op")
+                if op == "stats":
+                    await self._reply(writer, b"J", json.dumps(self.stats()).encode())
+                    continue
+                if op != "encode" or not isinstance(request.get("texts"), list):
+                    await self._reply(writer, b"E", f"bad request {op!r}".encode())
+                    continue
+                texts = [str(t) for t in request["texts"]]
+                self.requests += 1
+                if not texts:
+                    await self._reply(writer, b"V", _SHAPE.pack(0, self.dim or 0))
+                    continue
+                fut = asyncio.get_running_loop().create_future()
+                self._queue.put_nowait((texts, fut))
+                try:
+                    vecs = await fut
+                except Exception as e:
+                    await self._reply(writer, b"E", f"{type(e).__name__}: {e}".encode())
+                    continue
+                await self._reply(writer, b"V", _SHAPE.pack(*vecs.shape) + vecs.astype("<f4", copy=False).tobytes())
+        except (ConnectionError, ValueError) as e:
+            logger.warning("dropping client: %s", e)
+        finally:
+            writer.close()
+
+    async def serve(self, path: str) -> None:
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        self._queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batcher())
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        os.chmod(path, 0o660)
+        logger.info("embedding server for %s on %s (window %.1f ms, max batch %d)",
+                    self.model_name, path, self.window * 1000, self.max_batch)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self._executor.shutdown(wait=False)
+
+
+class EmbeddingClient:
+    """Thin client with the ``encode`` signature of a SentenceTransformer.
+
+    One connection per thread (requests on a connection are sequential); a
+    connection the server has closed is replaced before sending. Texts go out
+    in requests of at most ``max_batch``, so each one is encoded within the
+    timeout. A request is never resent once written: the server may already
+    be encoding it.
+
+    When the server is gone (the connection is refused twice), ``encode``
+    uses the model returned by ``fallback``, loaded on first need, and tries
+    the server again on the next call.
+    """
+
+    def __init__(self, path: str = EMBED_SERVER_SOCKET, timeout: float = EMBED_SERVER_TIMEOUT_SECONDS,
+                 max_batch: int = EMBED_BATCH_MAX, fallback: Optional[Callable[[], Any]] = None):
+        self.path = path
+        self.timeout = timeout
+        self.max_batch = max(1, max_batch)
+        self.fallback = fallback
+        self._fallback_model = None
+        self._fallback_lock = threading.Lock()
+        self._local = threading.local()
+
+    @staticmethod
+    def _closed_by_peer(sock: socket.socket) -> bool:
+        # an idle connection has nothing to read; EOF (or a reset) means the server dropped it
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None and self._closed_by_peer(sock):
+            self._close()
+            sock = None
+        if sock is None:
+            for attempt in (1, 2):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                try:
+                    sock.connect(self.path)
+                    break
+                except OSError as e:
+                    sock.close()
+                    if attempt == 2:
+                        raise EmbeddingServerUnavailable(f"no embedding server on {self.path}: {e}") from e
+                    time.sleep(0.05)  # a restarting server may be about to listen
+            self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    @staticmethod
+    def _recv(sock: socket.socket, size: int) -> bytes:
+        buf = bytearray(size)
+        view = memoryview(buf)
+        got = 0
+        while got < size:
+            n = sock.recv_into(view[got:])
+            if n == 0:
+                raise ConnectionError("embedding server closed the connection")
+            got += n
+        return bytes(buf)
+
+    def _call(self, request: Dict[str, Any]) -> Tuple[bytes, bytes]:
+        body = json.dumps(request).encode()
+        frame = _LEN.pack(len(body)) + body
+        sock = self._socket()
+        try:
+            sock.sendall(frame)
+        except OSError as e:
+            # the server never gets an incomplete frame's request
+            self._close()
+            raise EmbeddingServerUnavailable(f"embedding server on {self.path} went away: {e}") from e
+        try:
+            kind, size = _KIND_LEN.unpack(self._recv(sock, _KIND_LEN.size))
+            return kind, self._recv(sock, size)
+        except (OSError, ConnectionError):
+            self._close()  # the reply may still be on its way: the connection is out of sync
+            raise
+
+    def encode(self, sentences: Sequence[str], convert_to_numpy: bool = True, normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        if not normalize_embeddings:
+            raise ValueError("the embedding server only returns normalised embeddings")
+        sentences = list(sentences)
+        if len(sentences) <= self.max_batch:
+            return self._encode(sentences)
+        return np.concatenate([self._encode(sentences[start:start + self.max_batch])
+                               for start in range(0, len(sentences), self.max_batch)])
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        try:
+            kind, payload = self._call({"op": "encode", "texts": texts})
+        except EmbeddingServerUnavailable:
+            if self.fallback is None:
+                raise
+            return np.asarray(self._local_model().encode(texts, convert_to_numpy=True, normalize_embeddings=True),
+                              dtype=np.float32).reshape(len(texts), -1)
+        if kind == b"E":
+            raise EmbeddingServerError(payload.decode("utf-8", "replace"))
+        rows, dim = _SHAPE.unpack_from(payload)
+        return np.frombuffer(payload, dtype="<f4", offset=_SHAPE.size).reshape(rows, dim)
+
+    def _local_model(self):
+        with self._fallback_lock:
+            if self._fallback_model is None:
+                logger.warning("embedding server on %s is unavailable, loading the model in this process", self.path)
+                self._fallback_model = self.fallback()
+            return self._fallback_model
+
+    @property
+    def fallback_loaded(self) -> bool:
+        return self._fallback_model is not None
+
+    def stats(self) -> Dict[str, Any]:
+        kind, payload = self._call({"op": "stats"})
+        if kind != b"J":
+            raise EmbeddingServerError(payload.decode("utf-8", "replace"))
+        return json.loads(payload)
+
+    def ping(self) -> Optional[Dict[str, Any]]:
+        """Server stats, or None when nothing answers on the socket."""
+        try:
+            return self.stats()
+        except (OSError, ConnectionError, EmbeddingServerError, ValueError):
+            return None
+
+
+def connect(path: str = EMBED_SERVER_SOCKET, model_name: str = EMBEDDINGS_MODEL,
+            fallback: Optional[Callable[[], Any]] = None) -> Optional[EmbeddingClient]:
+    """A client for the server on ``path`` if it is up and serves ``model_name``, else None.
+
+    ``fallback`` loads a local model, used by the client if the server goes away later.
+    """
+    if not path or not hasattr(socket, "AF_UNIX"):
+        return None
+    client = EmbeddingClient(path, fallback=fallback)
+    stats = client.ping()
+    if stats is None:
+        logger.warning("no embedding server on %s, loading the model in this process", path)
+        return None
+    if stats.get("model") != model_name:
+        logger.warning("embedding server on %s serves %r, expected %r; loading the model in this process",
+                       path, stats.get("model"), model_name)
+        return None
+    return client
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="DocuHelp shared embedding server")
+    ap.add_argument("--socket", default=EMBED_SERVER_SOCKET, required=not EMBED_SERVER_SOCKET)
+    ap.add_argument("--window-ms", type=float, default=EMBED_BATCH_WINDOW_MS)
+    ap.add_argument("--max-batch", type=int, default=EMBED_BATCH_MAX)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    from sentence_transformers import SentenceTransformer  # type: ignore
+    model = SentenceTransformer(EMBEDDINGS_MODEL)
+    server = EmbeddingServer(model, EMBEDDINGS_MODEL, args.window_ms, args.max_batch)
+    asyncio.run(server.serve(args.socket))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
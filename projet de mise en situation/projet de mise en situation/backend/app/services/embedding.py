@@ -1,91 +1,225 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import json
 import os
+import threading
 import numpy as np
 
+from ..config import EMBED_CACHE, EMBED_SERVER_SOCKET
+from .embedding_cache import get_embedding_cache
+from .metrics import stage
+
 USE_SEMANTIC = os.getenv("USE_SEMANTIC", "auto")
 MODEL_NAME = os.getenv("EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDINGS_DTYPE = os.getenv("EMBEDDINGS_DTYPE", "float32")  # float32 | float16 on disk
 
+# The SentenceTransformer is the only state shared between retrievers; it is
+# loaded once under a lock and is read-only afterwards (encode is thread-safe).
+# With EMBED_SERVER_SOCKET it is an EmbeddingClient to the shared server instead.
 _sentence_model = None
-_nn = None
-_vectorizer = None
-_matrix = None
+_sentence_model_failed = False
+_sentence_model_lock = threading.Lock()
+
+
+def _load_local_model():
+    from sentence_transformers import SentenceTransformer  # type: ignore
+    return SentenceTransformer(MODEL_NAME)
 
 
 def _try_load_sentence_model():
-    global _sentence_model
+    global _sentence_model, _sentence_model_failed
     if _sentence_model is not None:
         return _sentence_model
-    if USE_SEMANTIC.lower() == "off":
+    if USE_SEMANTIC.lower() == "off" or _sentence_model_failed:
         return None
-    try:
-        from sentence_transformers import SentenceTransformer  # type: ignore
-        _sentence_model = SentenceTransformer(MODEL_NAME)
+    with _sentence_model_lock:
+        if _sentence_model is None and not _sentence_model_failed:
+            try:
+                if EMBED_SERVER_SOCKET:
+                    from .embed_server import connect
+                    _sentence_model = connect(EMBED_SERVER_SOCKET, MODEL_NAME, fallback=_load_local_model)
+                if _sentence_model is None:
+                    _sentence_model = _load_local_model()
+            except Exception:
+                # don't retry the import on every call
+                _sentence_model_failed = True
         return _sentence_model
-    except Exception:
+
+
+def semantic_enabled() -> bool:
+    return USE_SEMANTIC.lower() in ("auto", "on") and _try_load_sentence_model() is not None
+
+
+def embed_server_stats() -> Optional[Dict[str, Any]]:
+    """Stats of the shared embedding server when this process encodes through one, else None."""
+    from .embed_server import EmbeddingClient
+    model = _sentence_model
+    if not isinstance(model, EmbeddingClient):
         return None
+    stats = model.ping()
+    if stats is not None:
+        stats["local_fallback_loaded"] = model.fallback_loaded
+    return stats
+
+
+def encode_query(query: str) -> np.ndarray:
+    model = _try_load_sentence_model()
+    with stage("embed_query"):
+        return model.encode([query], convert_to_numpy=True, normalize_embeddings=True)[0]
 
 
-@dataclass
+@dataclass(frozen=True)
 class Retriever:
+    """Fitted retrieval state for one set of texts.
+
+    Instances are immutable once built by ``fit`` or ``load``; ``search`` only
+    reads them, so one retriever can serve concurrent requests. In semantic
+    mode ``matrix`` holds L2-normalised embeddings (a read-only memmap once
+    loaded from disk).
+    """
     mode: str  # "semantic"|"tfidf"
+    matrix: Any = field(default=None, repr=False)
+    vectorizer: Any = field(default=None, repr=False)
+    model: str = ""
+
+    @classmethod
+    def fit(cls, texts: List[str], stats: Optional[Dict[str, int]] = None) -> "Retriever":
+        """Build a retriever over ``texts``.
 
-    def fit(self, texts: List[str]) -> None:
-        global _nn, _vectorizer, _matrix
+        In semantic mode only texts missing from the embedding cache are
+        encoded; ``stats``, when given, receives the cache hit and miss counts.
+        """
+        with stage("fit"):
+            return cls._fit(texts, stats)
+
+    @classmethod
+    def _fit(cls, texts: List[str], stats: Optional[Dict[str, int]]) -> "Retriever":
         model = _try_load_sentence_model()
         if model and USE_SEMANTIC.lower() in ("auto", "on"):
             # Semantic mode
-            embeddings = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
-            from sklearn.neighbors import NearestNeighbors  # type: ignore
-            _nn = NearestNeighbors(metric="cosine")
-            _nn.fit(embeddings)
-            self.mode = "semantic"
-            _matrix = embeddings
-            _vectorizer = None
-        else:
-            # TF-IDF fallback
-            from sklearn.feature_extraction.text import TfidfVectorizer  # type: ignore
-            from sklearn.metrics.pairwise import cosine_similarity  # noqa: F401  # type: ignore
-            _vectorizer = TfidfVectorizer(max_df=0.9, min_df=1)
-            _matrix = _vectorizer.fit_transform(texts)
-            _nn = None
-            self.mode = "tfidf"
-
-    def search(self, query: str, texts: List[str], top_k: int = 5) -> List[Tuple[int, float]]:
-        global _nn, _vectorizer, _matrix
-        if self.mode == "semantic" and _nn is not None and _matrix is not None:
-            model = _try_load_sentence_model()
-            q = model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
-            distances, indices = _nn.kneighbors(q, n_neighbors=min(top_k, len(texts)))
-            scores = 1.0 - distances[0]
-            return [(int(i), float(s)) for i, s in zip(indices[0], scores)]
+            def encode(batch: List[str]) -> np.ndarray:
+                return model.encode(batch, convert_to_numpy=True, normalize_embeddings=True)
+            if EMBED_CACHE.lower() == "on":
+                embeddings, hits = get_embedding_cache(MODEL_NAME).encode(texts, encode)
+            else:
+                embeddings, hits = encode(texts), 0
+            if stats is not None:
+                stats["hits"] = stats.get("hits", 0) + hits
+                stats["misses"] = stats.get("misses", 0) + len(texts) - hits
+            return cls(mode="semantic", matrix=np.asarray(embeddings, dtype=np.float32), model=MODEL_NAME)
+        # TF-IDF fallback
+        from sklearn.feature_extraction.text import TfidfVectorizer  # type: ignore
+        # max_df < 1 rejects single-chunk documents ("max_df corresponds to < documents than min_df")
+        vectorizer = TfidfVectorizer(max_df=0.9 if len(texts) > 1 else 1.0, min_df=1)
+        matrix = vectorizer.fit_transform(texts)
+        return cls(mode="tfidf", matrix=matrix, vectorizer=vectorizer)
+
+    def search(self, query: str, texts: Optional[List[str]] = None, top_k: int = 5) -> List[Tuple[int, float]]:
+        n = len(texts) if texts is not None else self.matrix.shape[0]
+        k = min(top_k, n)
+        if k <= 0:
+            return []
+        if self.mode == "semantic":
+            sims = _dot(self.matrix, encode_query(query))
         else:
             # TF-IDF
             from sklearn.metrics.pairwise import linear_kernel  # type: ignore
-            q_vec = _vectorizer.transform([query])
-            sims = linear_kernel(q_vec, _matrix).ravel()
-            top_idx = sims.argsort()[::-1][: min(top_k, len(texts))]
-            return [(int(i), float(sims[i])) for i in top_idx]
+            q_vec = self.vectorizer.transform([query])
+            sims = linear_kernel(q_vec, self.matrix).ravel()
+        top_idx = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+        top_idx = top_idx[np.argsort(-sims[top_idx], kind="stable")]
+        return [(int(i), float(sims[i])) for i in top_idx]
+
+    def nbytes(self) -> int:
+        """Approximate in-memory size, used to budget the retriever cache."""
+        total = 0
+        m = self.matrix
+        if isinstance(m, np.memmap):
+            pass  # backed by the page cache, shared between workers
+        elif m is not None:
+            if hasattr(m, "data") and hasattr(m, "indices"):  # scipy sparse
+                total += m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+            else:
+                total += getattr(m, "nbytes", 0)
+        if self.vectorizer is not None:
+            vocab = getattr(self.vectorizer, "vocabulary_", {}) or {}
+            # dict entry + short str key + int value
+            total += len(vocab) * 120
+            idf = getattr(self.vectorizer, "idf_", None)
+            total += getattr(idf, "nbytes", 0)
+        return total
+
+    def save(self, path: str) -> str:
+        """Persist to ``path`` and return the file ``load`` expects.
 
-    def save(self, path: str) -> None:
+        TF-IDF state is pickled to ``path``. Semantic embeddings are written as
+        a raw ``.npy`` matrix next to it plus a ``.json`` header (model, dim,
+        rows, dtype); the header is written last and is what gets returned.
+        """
+        if self.mode == "semantic":
+            base = os.path.splitext(path)[0]
+            matrix = np.asarray(self.matrix, dtype=EMBEDDINGS_DTYPE)
+            tmp = base + ".npy.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, matrix)
+            os.replace(tmp, base + ".npy")
+            header = {
+                "model": self.model,
+                "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                "rows": int(matrix.shape[0]),
+                "dtype": str(matrix.dtype),
+            }
+            with open(base + ".json.tmp", "w", encoding="utf-8") as f:
+                json.dump(header, f)
+            os.replace(base + ".json.tmp", base + ".json")
+            return base + ".json"
         import pickle
         with open(path, "wb") as f:
             pickle.dump({
                 "mode": self.mode,
-                "matrix": _matrix,
-                "vectorizer": _vectorizer,
+                "matrix": self.matrix,
+                "vectorizer": self.vectorizer,
             }, f)
+        return path
 
     @staticmethod
     def load(path: str) -> "Retriever":
+        with stage("index_load"):
+            return Retriever._load(path)
+
+    @staticmethod
+    def _load(path: str) -> "Retriever":
+        if path.endswith(".json"):
+            with open(path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+            if header.get("model") != MODEL_NAME:
+                raise ValueError(f"Index encoded with {header.get('model')!r}, current model is {MODEL_NAME!r}")
+            matrix = np.load(os.path.splitext(path)[0] + ".npy", mmap_mode="r")
+            if matrix.shape[0] != header.get("rows") or (matrix.ndim == 2 and matrix.shape[1] != header.get("dim")):
+                raise ValueError(f"Embedding file does not match header {path}")
+            return Retriever(mode="semantic", matrix=matrix, model=header["model"])
         import pickle
-        obj = Retriever(mode="tfidf")
         with open(path, "rb") as f:
             data = pickle.load(f)
-        global _matrix, _vectorizer, _nn
-        _matrix = data.get("matrix")
-        _vectorizer = data.get("vectorizer")
-        _nn = None
-        obj.mode = data.get("mode", "tfidf")
-        return obj 
\ No newline at end of file
+        return Retriever(
+            mode=data.get("mode", "tfidf"),
+            matrix=data.get("matrix"),
+            vectorizer=data.get("vectorizer"),
+        )
+
+
+def _dot(matrix: np.ndarray, q: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+    """Cosine scores of normalised rows against ``q``.
+
+    float32 matrices (memmapped or not) go straight to BLAS without copying;
+    float16 ones are upcast one block at a time to bound the temporary.
+    """
+    q = np.asarray(q, dtype=np.float32)
+    if matrix.dtype == np.float32:
+        return matrix @ q
+    out = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], block_rows):
+        block = matrix[start:start + block_rows]
+        out[start:start + len(block)] = block.astype(np.float32) @ q
+    return out
\ No newline at end of file
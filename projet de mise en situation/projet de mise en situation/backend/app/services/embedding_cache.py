@@ -0,0 +1,152 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from ..config import INDEX_DIR
+from .locks import file_lock
+
+
+def text_keys(texts: List[str]) -> np.ndarray:
+    """16-byte blake2b digest of each whitespace-normalised text, as (n, 2) uint64."""
+    digests = b"".join(hashlib.blake2b(" ".join(t.split()).encode("utf-8"), digest_size=16).digest() for t in texts)
+    return np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+
+
+class EmbeddingCache:
+    """Persistent chunk embeddings for one model, keyed by text hash.
+
+    ``keys.bin`` holds one 16-byte digest per row and ``vectors.f32`` the
+    float32 rows in the same order. Both files are append-only and vectors
+    are written before their keys, so the key count is the number of complete
+    rows. Lookups binary-search the first half of the digest and check the
+    second. Writers from any process serialise on a lock file; readers map
+    the files without locking and pick up rows appended elsewhere.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.dim = 0
+        self._rows = 0
+        self._keys = np.zeros((0, 2), dtype="<u8")
+        self._order = np.zeros(0, dtype=np.int64)
+        self._sorted_hi = np.zeros(0, dtype="<u8")
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.root / "keys.bin"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.root / "vectors.f32"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.root / "meta.json"
+
+    def _refresh(self) -> None:
+        try:
+            rows = os.stat(self._keys_path).st_size // 16
+        except OSError:
+            return
+        if rows <= self._rows:
+            return
+        if not self.dim:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        tail = np.fromfile(self._keys_path, dtype="<u8", count=(rows - self._rows) * 2, offset=self._rows * 16).reshape(-1, 2)
+        self._keys = np.concatenate([self._keys, tail])
+        self._order = np.argsort(self._keys[:, 0], kind="stable")
+        self._sorted_hi = self._keys[self._order, 0]
+        self._rows = rows
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def _lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Row of each key, -1 when absent."""
+        if not self._rows or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._sorted_hi, keys[:, 0]), self._rows - 1)
+        rows = self._order[pos]
+        found = (self._keys[rows, 0] == keys[:, 0]) & (self._keys[rows, 1] == keys[:, 1])
+        return np.where(found, rows, -1)
+
+    def _append(self, keys: np.ndarray, vectors: np.ndarray) -> None:
+        with file_lock(self.root / ".lock"):
+            self._refresh()
+            if self.dim and vectors.shape[1] != self.dim:
+                return  # same model name, different output size: don't mix them
+            if not self.dim:
+                self.dim = int(vectors.shape[1])
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            new = self._lookup(keys) < 0  # another process may have added some meanwhile
+            if not new.any():
+                return
+            with open(self._vectors_path, "a+b") as f:
+                # drop rows a crashed writer appended without their keys
+                f.truncate(self._rows * self.dim * 4)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(vectors[new], dtype=np.float32).tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.write(np.ascontiguousarray(keys[new]).tobytes())
+            self._refresh()
+
+    def encode(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> Tuple[np.ndarray, int]:
+        """Embeddings of ``texts``, calling ``encode`` only for texts not cached yet.
+
+        Returns ``(matrix, hits)``; duplicates within ``texts`` are encoded once.
+        """
+        if not texts:
+            return np.asarray(encode(texts), dtype=np.float32), 0
+        keys = text_keys(texts)
+        with self._lock:
+            self._refresh()
+            rows = self._lookup(keys)
+            cached = rows >= 0
+            out = np.empty((len(texts), self.dim or 0), dtype=np.float32)
+            if cached.any():
+                out[cached] = self._vectors[rows[cached]]
+        missing = np.flatnonzero(~cached)
+        if len(missing):
+            _, first, inverse = np.unique(keys[missing], axis=0, return_index=True, return_inverse=True)
+            todo = missing[first]
+            fresh = np.asarray(encode([texts[i] for i in todo]), dtype=np.float32)
+            if out.shape[1] != fresh.shape[1]:
+                if cached.any():
+                    return np.asarray(encode(texts), dtype=np.float32), 0  # cache holds another dimension
+                out = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+            out[missing] = fresh[inverse.ravel()]
+            with self._lock:
+                self._append(keys[todo], fresh)
+        hits = int(cached.sum())
+        with self._lock:
+            self.hits += hits
+            self.misses += len(texts) - hits
+        return out, hits
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"rows": self._rows, "dim": self.dim, "hits": self.hits, "misses": self.misses}
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model: str) -> EmbeddingCache:
+    with _caches_lock:
+        cache = _caches.get(model)
+        if cache is None:
+            cache = _caches[model] = EmbeddingCache(INDEX_DIR / "embcache" / re.sub(r"[^A-Za-z0-9._-]+", "_", model))
+        return cache
\ No newline at end of file
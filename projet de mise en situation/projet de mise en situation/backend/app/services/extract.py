@@ -1,7 +1,13 @@
 from __future__ import annotations
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
-import chardet
+from typing import Iterator, List, Optional
+
+from ..config import INGEST_WORKERS, PDF_WORKERS, PDF_PARALLEL_MIN_PAGES
+from .metrics import stage
 
 
 def _read_bytes(path: Path) -> bytes:
@@ -10,6 +16,7 @@ def _read_bytes(path: Path) -> bytes:
 
 
 def extract_txt(path: Path) -> List[str]:
+    import chardet
     data = _read_bytes(path)
     enc = chardet.detect(data).get("encoding") or "utf-8"
     text = data.decode(enc, errors="replace")
@@ -24,29 +31,89 @@ def extract_docx(path: Path) -> List[str]:
     return [text]
 
 
-def extract_pdf(path: Path) -> List[str]:
+def _extract_pdf_range(path: str, start: int, stop: int, normalized: bool = False) -> List[str]:
+    # Runs in a worker process: each range opens its own document handle.
+    import fitz  # PyMuPDF
+    with fitz.open(path) as pdf:
+        pages = [pdf[i].get_text("text") or "" for i in range(start, stop)]
+    return [normalize(p) for p in pages] if normalized else pages
+
+
+def _pdf_workers(page_count: int, workers: Optional[int]) -> int:
+    if workers is None:
+        workers = PDF_WORKERS
+    if workers <= 0:
+        # each of the INGEST_WORKERS concurrent ingests gets its share of the CPUs
+        workers = max(1, (os.cpu_count() or 1) // max(1, INGEST_WORKERS))
+    if page_count < max(PDF_PARALLEL_MIN_PAGES, 2):
+        return 1
+    return max(1, min(workers, page_count))
+
+
+def iter_pdf(path: Path, workers: Optional[int] = None, normalized: bool = False) -> Iterator[str]:
+    """Yield the text of each page, in order.
+
+    Documents with at least ``PDF_PARALLEL_MIN_PAGES`` pages are split into
+    contiguous page ranges extracted by a pool of ``workers`` processes
+    (default ``PDF_WORKERS``, 0 = the CPUs divided among ``INGEST_WORKERS``). At most two ranges per worker
+    are in flight, so pages extracted ahead of the consumer stay bounded.
+    """
     import fitz  # PyMuPDF
-    pages: List[str] = []
     with fitz.open(str(path)) as pdf:
-        for page in pdf:
-            text = page.get_text("text")
-            pages.append(text or "")
-    return pages
+        page_count = pdf.page_count
+        n = _pdf_workers(page_count, workers)
+        if n <= 1:
+            for page in pdf:
+                text = page.get_text("text") or ""
+                yield normalize(text) if normalized else text
+            return
+
+    # a few ranges per worker so a slow range (scanned pages, big tables) does not hold up the rest,
+    # and no more than PDF_PARALLEL_MIN_PAGES pages each so a range in flight stays small
+    step = max(1, min(-(-page_count // (n * 4)), PDF_PARALLEL_MIN_PAGES))
+    ranges = iter([(s, min(s + step, page_count)) for s in range(0, page_count, step)])
+    with ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for start, stop in ranges:
+            pending.append(pool.submit(_extract_pdf_range, str(path), start, stop, normalized))
+            if len(pending) >= 2 * n:
+                break
+        while pending:
+            part = pending.popleft().result()
+            nxt = next(ranges, None)
+            if nxt is not None:
+                pending.append(pool.submit(_extract_pdf_range, str(path), nxt[0], nxt[1], normalized))
+            yield from part
+
+
+def extract_pdf(path: Path, workers: Optional[int] = None) -> List[str]:
+    """Return the text of each page, in order (see ``iter_pdf``)."""
+    return list(iter_pdf(path, workers))
 
 
 def normalize(text: str) -> str:
     return " ".join(text.replace("\r", "\n").split())
 
 
-def extract_by_mime(path: Path, mime: str) -> List[str]:
+def iter_pages_by_mime(path: Path, mime: str, filename: Optional[str] = None) -> Iterator[str]:
+    """Yield the normalized text of each page, one at a time.
+
+    PDF pages are extracted (and normalized, in the workers) as the consumer
+    asks for them; TXT and DOCX files are a single page.
+    """
     mime = (mime or "").lower()
-    suffix = path.suffix.lower()
+    suffix = Path(filename or path).suffix.lower()  # stored blobs have no extension
     if "pdf" in mime or suffix == ".pdf":
-        pages = extract_pdf(path)
-    elif "word" in mime or suffix == ".docx":
+        yield from iter_pdf(path, normalized=True)
+        return
+    if "word" in mime or suffix == ".docx":
         pages = extract_docx(path)
-    elif "text" in mime or suffix == ".txt":
-        pages = extract_txt(path)
     else:
         pages = extract_txt(path)
-    return [normalize(p) for p in pages] 
\ No newline at end of file
+    for page in pages:
+        yield normalize(page)
+
+
+def extract_by_mime(path: Path, mime: str, filename: Optional[str] = None) -> List[str]:
+    with stage("extract"):
+        return list(iter_pages_by_mime(path, mime, filename)) 
\ No newline at end of file
@@ -1,35 +1,99 @@
 from __future__ import annotations
-from typing import List, Tuple
-from sqlmodel import select
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import or_, update
+from sqlmodel import select, func
 from ..db import get_session
-from ..models import Chunk
-from .embedding import Retriever
-from ..config import INDEX_DIR, TOP_K
+from ..models import Chunk, Document, DocumentVersion
+from .embedding import Retriever, semantic_enabled, encode_query
+from .shards import get_corpus_shards, get_ann_shards, drop_empty_leftovers
+from .retriever_cache import retriever_cache
+from .metrics import stage
+from ..config import INDEX_DIR, TOP_K, SHARD_BY, SHARD_REBALANCE_RATIO
 
-import os
+# Bound on bound parameters per IN (...) query.
+_IN_BATCH = 900
+# (version, chunk) pairs hydrated per statement
+_HYDRATE_BATCH = 200
 
 
 def _index_path_for_version(version_id: int) -> str:
     return str(INDEX_DIR / f"{version_id}.pkl")
 
 
-def build_index_for_version(version_id: int, session=None) -> str:
+def index_paths_for_version(version_id: int) -> List[str]:
+    """Every artifact a version's index may have written (semantic header first)."""
+    return [str(INDEX_DIR / f"{version_id}{ext}") for ext in (".json", ".npy", ".pkl")]
+
+
+def _load_artifact(version_id: int) -> Optional[Retriever]:
+    """The stored index of ``version_id``, if it was built in the current mode and model."""
+    path = index_paths_for_version(version_id)[0] if semantic_enabled() else _index_path_for_version(version_id)
+    try:
+        retriever = Retriever.load(path)
+    except (OSError, ValueError):
+        return None
+    return retriever if (retriever.mode == "semantic") == semantic_enabled() else None
+
+
+def _placement_keys(session, version_ids: Optional[List[int]] = None) -> Dict[int, Any]:
+    """Shard placement key of each version (all versions when ``version_ids`` is None)."""
+    if SHARD_BY.lower() == "version":
+        if version_ids is None:
+            version_ids = list(session.exec(select(DocumentVersion.id)).all())
+        return {vid: vid for vid in version_ids}
+    q = select(DocumentVersion.id, Document.owner_id).join(Document, Document.id == DocumentVersion.document_id)
+    if version_ids is None:
+        return {vid: owner for vid, owner in session.exec(q).all()}
+    keys: Dict[int, Any] = {}
+    for start in range(0, len(version_ids), _IN_BATCH):
+        keys.update(session.exec(q.where(DocumentVersion.id.in_(version_ids[start:start + _IN_BATCH]))).all())
+    return keys
+
+
+def _chunk_texts(session, version_ids: List[int]) -> Dict[int, List[str]]:
+    by_version: Dict[int, List[str]] = {vid: [] for vid in version_ids}
+    for start in range(0, len(version_ids), _IN_BATCH):
+        rows = session.exec(
+            select(Chunk.doc_version_id, Chunk.content)
+            .where(Chunk.doc_version_id.in_(version_ids[start:start + _IN_BATCH]))
+            .order_by(Chunk.doc_version_id, Chunk.chunk_index)
+        ).all()
+        for vid, content in rows:
+            by_version[vid].append(content)
+    return by_version
+
+
+def build_index_for_version(version_id: int, session=None, source_version_id: Optional[int] = None,
+                            stats: Optional[Dict[str, int]] = None) -> Optional[str]:
+    """Index the chunks of ``version_id``; returns the path of its semantic index, if any.
+
+    Without semantic mode search reads only the corpus BM25 index, so no
+    per-version artifact is fitted or written. With ``source_version_id``
+    (a version with identical chunks), its stored index is copied instead
+    of re-encoding the texts, when it is compatible. ``stats`` receives the
+    embedding cache hits/misses of the fit.
+    """
     own_session = False
     if session is None:
         own_session = True
         session_gen = get_session()
         session = next(session_gen)
     try:
-        chunks = session.exec(select(Chunk).where(Chunk.doc_version_id == version_id).order_by(Chunk.chunk_index)).all()
-        texts = [c.content for c in chunks]
-        retriever = Retriever(mode="tfidf")
-        retriever.fit(texts)
-        path = _index_path_for_version(version_id)
-        retriever.save(path)
-        # Persist vector path on chunks (optional meta)
-        for c in chunks:
-            c.vector_path = path
-            session.add(c)
+        # the one step of an ingest that holds a whole version's texts (see the README's streaming note)
+        texts = list(session.exec(select(Chunk.content).where(Chunk.doc_version_id == version_id).order_by(Chunk.chunk_index)).all())
+        keys = _placement_keys(session, [version_id])
+        path = None
+        if semantic_enabled():
+            retriever = _load_artifact(source_version_id) if source_version_id is not None else None
+            if retriever is None or retriever.matrix.shape[0] != len(texts):
+                retriever = Retriever.fit(texts, stats=stats)
+            path = retriever.save(_index_path_for_version(version_id))
+            get_ann_shards().add_versions({version_id: retriever.matrix}, keys)
+        retriever_cache.invalidate([version_id])
+        get_corpus_shards().add_versions({version_id: texts}, keys)
+        # Persist vector path on chunks (optional meta), one statement for the whole version
+        session.execute(update(Chunk).where(Chunk.doc_version_id == version_id).values(vector_path=path))
         session.commit()
         return path
     finally:
@@ -37,6 +101,43 @@ def build_index_for_version(version_id: int, session=None) -> str:
             session.close()
 
 
+def forget_versions(version_ids: Iterable[int]) -> None:
+    """Drop versions from the corpus-wide indexes and the retriever cache."""
+    version_ids = list(version_ids)
+    get_corpus_shards().remove_versions(version_ids)
+    get_ann_shards().remove_versions(version_ids)
+    retriever_cache.invalidate(version_ids)
+
+
+def _chunk_count(session, version_id: int) -> int:
+    return session.exec(select(func.count()).select_from(Chunk).where(Chunk.doc_version_id == version_id)).one()
+
+
+def _backfill_corpus_index(index, version_ids: List[int], session) -> None:
+    # Versions ingested before the corpus index existed (or by a worker whose
+    # snapshot was overwritten) are indexed from their stored chunks on first use.
+    missing = index.missing_versions(version_ids)
+    if not missing:
+        return
+    index.add_versions(_chunk_texts(session, missing), _placement_keys(session, missing))
+
+
+def _backfill_ann_index(index, version_ids: List[int], session) -> List[int]:
+    """Insert versions that have a semantic index on disk; returns those still missing."""
+    missing = index.missing_versions(version_ids)
+    batch = {}
+    for vid in missing:
+        path = index_paths_for_version(vid)[0]
+        try:
+            retriever = Retriever.load(path)
+        except (OSError, ValueError):
+            continue  # no semantic artifact, or encoded with another model
+        batch[vid] = retriever.matrix
+    if batch:
+        index.add_versions(batch, _placement_keys(session, list(batch)))
+    return [vid for vid in missing if vid not in batch]
+
+
 def search_versions(query: str, version_ids: List[int], k: int = TOP_K, session=None) -> List[Tuple[int, int, float]]:
     own_session = False
     if session is None:
@@ -44,19 +145,39 @@ def search_versions(query: str, version_ids: List[int], k: int = TOP_K, session=
         session_gen = get_session()
         session = next(session_gen)
     try:
-        results: List[Tuple[int, int, float]] = []  # (version_id, chunk_index_in_version, score)
-        for vid in version_ids:
-            chunks = session.exec(select(Chunk).where(Chunk.doc_version_id == vid).order_by(Chunk.chunk_index)).all()
-            if not chunks:
-                continue
-            texts = [c.content for c in chunks]
-            path = _index_path_for_version(vid)
-            from .embedding import Retriever
-            retriever = Retriever.load(path) if os.path.exists(path) else None
-            if retriever is None:
-                retriever = Retriever(mode="tfidf")
-                retriever.fit(texts)
-            hits = retriever.search(query, texts, top_k=k)
+        if not semantic_enabled():
+            index = get_corpus_shards()
+            _backfill_corpus_index(index, version_ids, session)
+            with stage("bm25_search"):
+                return index.search(query, version_ids, k)
+        ann = get_ann_shards()
+        legacy = _backfill_ann_index(ann, version_ids, session)
+        query_vec = encode_query(query)
+        with stage("ann_search"):
+            results: List[Tuple[int, int, float]] = ann.search(query_vec, version_ids, k)  # (version_id, chunk_index_in_version, score)
+        # versions without a semantic artifact are scored one by one
+        for vid in legacy:
+            entry = None
+            for path in (index_paths_for_version(vid)[0], _index_path_for_version(vid)):
+                try:
+                    entry = retriever_cache.get_or_load(vid, path, lambda vid=vid, path=path: (Retriever.load(path), _chunk_count(session, vid)))
+                except ValueError:
+                    entry = None  # encoded with another model: re-fit below
+                    break
+                if entry is not None:
+                    break
+            if entry is not None:
+                if not entry.chunk_count:
+                    continue
+                with stage("retriever_search"):
+                    hits = entry.retriever.search(query, top_k=k)
+            else:
+                chunks = session.exec(select(Chunk).where(Chunk.doc_version_id == vid).order_by(Chunk.chunk_index)).all()
+                if not chunks:
+                    continue
+                texts = [c.content for c in chunks]
+                retriever = Retriever.fit(texts)
+                hits = retriever.search(query, texts, top_k=k)
             for idx, score in hits:
                 results.append((vid, idx, score))
         # sort by score desc and trim
@@ -64,4 +185,152 @@ def search_versions(query: str, version_ids: List[int], k: int = TOP_K, session=
         return results[:k]
     finally:
         if own_session:
-            session.close() 
\ No newline at end of file
+            session.close()
+
+
+def _plan_rebalance(located: Dict[int, Tuple[int, int]], keys: Dict[int, Any], placement, n_shards: int,
+                    ratio: float) -> Dict[Any, int]:
+    """Target shard of every placement key: keys on leftover shards or never placed go to the least
+    loaded shard, then the largest key that fits is moved off the heaviest shard until no shard holds
+    more than ``ratio`` x the mean."""
+    key_vids: Dict[Any, List[int]] = {}
+    for vid in located:
+        key_vids.setdefault(keys.get(vid, vid), []).append(vid)
+    key_load = {key: sum(located[v][1] for v in vids) for key, vids in key_vids.items()}
+    target: Dict[Any, int] = {}
+    loads = [0] * n_shards
+    unplaced = []
+    for key in key_vids:
+        shard = placement.get(key)
+        if shard is None or shard >= n_shards:
+            unplaced.append(key)
+        else:
+            target[key] = shard
+            loads[shard] += key_load[key]
+    for key in sorted(unplaced, key=lambda k: -key_load[k]):
+        shard = target[key] = loads.index(min(loads))
+        loads[shard] += key_load[key]
+    mean = sum(loads) / n_shards
+    while max(loads) > ratio * mean:
+        heavy, light = loads.index(max(loads)), loads.index(min(loads))
+        # moving a key smaller than the gap strictly lowers the spread, so this terminates
+        fits = [k for k, s in target.items() if s == heavy and 0 < key_load[k] < loads[heavy] - loads[light]]
+        if not fits:
+            break
+        key = max(fits, key=lambda k: key_load[k])
+        target[key] = light
+        loads[heavy] -= key_load[key]
+        loads[light] += key_load[key]
+    return target
+
+
+def rebalance_due(session, version_id: int, ratio: float = SHARD_REBALANCE_RATIO) -> bool:
+    """Whether ``rebalance_shards`` has work after ``version_id`` was indexed.
+
+    Only reads the chunk count of each shard: true when shards are left over
+    from a larger ``INDEX_SHARDS`` or the shard of the version holds more than
+    ``ratio`` x the mean.
+    """
+    corpus = get_corpus_shards()
+    if corpus.shard_ids() != list(range(corpus.n_shards)):
+        return True
+    if corpus.n_shards == 1:
+        return False
+    shard = corpus.placement.get(_placement_keys(session, [version_id]).get(version_id, version_id))
+    if shard is None:
+        return True
+    loads = corpus.loads()
+    return loads[shard] > ratio * sum(loads) / len(loads)
+
+
+def rebalance_shards(session=None, ratio: float = SHARD_REBALANCE_RATIO) -> int:
+    """Move versions so each lives on its placement key's shard and shards stay balanced.
+
+    Empties shards left over from a larger ``INDEX_SHARDS`` and moves keys off
+    any shard holding more than ``ratio`` x the mean chunk count. Returns the
+    number of versions moved, counted once per index they were moved in.
+    """
+    corpus, ann = get_corpus_shards(), get_ann_shards()
+    if corpus.shard_ids() == [0]:
+        return 0
+    own_session = False
+    if session is None:
+        own_session = True
+        session_gen = get_session()
+        session = next(session_gen)
+    try:
+        moved = 0
+        with corpus.placement.lock():
+            located = corpus.locate()
+            keys = _placement_keys(session)
+            target = _plan_rebalance(located, keys, corpus.placement, corpus.n_shards, ratio)
+            for key, shard in target.items():
+                if corpus.placement.get(key) != shard:
+                    corpus.placement.move(key, shard)
+            loaders: List[Tuple[Any, Dict[int, Tuple[int, int]], Callable]] = [
+                (corpus, located, lambda vids, src: _chunk_texts(session, vids)),
+                (ann, ann.locate(), lambda vids, src: {v: m for v in vids if (m := ann.shard(src).version_vectors(v)) is not None}),
+            ]
+            for index, where, load in loaders:
+                pairs: Dict[Tuple[int, int], List[int]] = {}
+                for vid, (src, _) in where.items():
+                    dst = target.get(keys.get(vid, vid))
+                    if dst is not None and dst != src:
+                        pairs.setdefault((src, dst), []).append(vid)
+                for (src, dst), vids in pairs.items():
+                    index.move_versions(vids, src, dst, lambda vids, src=src, load=load: load(vids, src))
+                    moved += len(vids)
+            drop_empty_leftovers(corpus.n_shards)
+        return moved
+    finally:
+        if own_session:
+            session.close()
+
+
+@dataclass
+class HydratedHit:
+    doc_id: int
+    title: str
+    version: int
+    page: int
+    content: str
+    score: float
+
+
+def hydrate_hits(session, hits: List[Tuple[int, int, float]]) -> List[HydratedHit]:
+    """Resolve ``(version_id, chunk_index, score)`` hits with joined queries of ``_HYDRATE_BATCH`` pairs.
+
+    Keeps the ranked order; hits whose chunk, version or document is gone are dropped.
+    """
+    if not hits:
+        return []
+    with stage("hydrate"):
+        return _hydrate(session, hits)
+
+
+def _hydrate(session, hits: List[Tuple[int, int, float]]) -> List[HydratedHit]:
+    q = (
+        select(Chunk.doc_version_id, Chunk.chunk_index, Chunk.content, Chunk.page, DocumentVersion.version, Document.id, Document.name)
+        .join(DocumentVersion, DocumentVersion.id == Chunk.doc_version_id)
+        .join(Document, Document.id == DocumentVersion.document_id)
+    )
+    keys = sorted({(v, i) for v, i, _ in hits})
+    rows = []
+    # SQLite caps expression depth at 1000: a few hundred pairs per statement
+    for start in range(0, len(keys), _HYDRATE_BATCH):
+        by_version: Dict[int, List[int]] = {}
+        for vid, idx in keys[start:start + _HYDRATE_BATCH]:
+            by_version.setdefault(vid, []).append(idx)
+        # one term per version, each a seek on ix_chunk_version_chunk
+        # (SQLite plans a row-value IN as a full scan)
+        rows.extend(session.exec(q.where(or_(*[
+            (Chunk.doc_version_id == vid) & Chunk.chunk_index.in_(idxs) for vid, idxs in by_version.items()
+        ]))).all())
+    by_key = {(r[0], r[1]): r for r in rows}
+    out: List[HydratedHit] = []
+    for vid, idx, score in hits:
+        r = by_key.get((vid, idx))
+        if r is None:
+            continue
+        out.append(HydratedHit(doc_id=r[5], title=r[6], version=r[4], page=r[3] or 1, content=r[2], score=float(score)))
+    return out
\ No newline at end of file
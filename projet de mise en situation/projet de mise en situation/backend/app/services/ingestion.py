@@ -0,0 +1,416 @@
+from __future__ import annotations
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, func, insert, literal, update
+from sqlmodel import select
+
+from ..config import INGEST_WORKERS, INGEST_MAX_ATTEMPTS, INGEST_LEASE_SECONDS, INGEST_POLL_SECONDS
+from ..db import get_session
+from ..models import Document, DocumentVersion, Chunk, IngestJob
+from .extract import iter_pages_by_mime
+from .chunking import iter_chunks
+from .indexing import build_index_for_version, forget_versions, index_paths_for_version, rebalance_due, rebalance_shards
+from .audit import log as audit_log, audit_writer
+from .result_cache import bump_generation
+from .metrics import stage, record_stages, observe_stages, add_stage_time
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany when persisting chunks.
+_INSERT_BATCH = 1000
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _update_job(job_id: Optional[int], **values: Any) -> None:
+    if job_id is None:
+        return
+    session = next(get_session())
+    try:
+        session.execute(update(IngestJob).where(IngestJob.id == job_id).values(updated_at=_now(), **values))
+        session.commit()
+    finally:
+        session.close()
+
+
+def insert_chunks(session, version_id: int, chunks: List[Dict[str, Any]], batch_size: int = _INSERT_BATCH,
+                  first_index: int = 0) -> None:
+    """Insert ``chunks`` (chunk_pages dicts, in order, the first one numbered ``first_index``)
+    as executemany batches; the caller commits."""
+    table = Chunk.__table__
+    for start in range(0, len(chunks), batch_size):
+        session.execute(insert(table), [
+            {
+                "doc_version_id": version_id,
+                "chunk_index": first_index + start + i,
+                "content": c["content"],
+                "page": c.get("page"),
+                "start_char": c.get("start_char"),
+                "end_char": c.get("end_char"),
+                "vector_path": None,
+            }
+            for i, c in enumerate(chunks[start:start + batch_size])
+        ])
+
+
+def _copy_chunks(session, version_id: int, source_id: int) -> None:
+    """Copy the chunks of ``source_id`` to ``version_id`` in one INSERT ... SELECT; the caller commits."""
+    cols = ["doc_version_id", "chunk_index", "content", "page", "start_char", "end_char"]
+    session.execute(insert(Chunk.__table__).from_select(cols, select(
+        literal(version_id), Chunk.chunk_index, Chunk.content, Chunk.page, Chunk.start_char, Chunk.end_char,
+    ).where(Chunk.doc_version_id == source_id)))
+
+
+def _stream_chunks(session, version_id: int, pages: Iterable[str], job_id: Optional[int],
+                   batch_size: int = _INSERT_BATCH) -> Tuple[int, int, int]:
+    """Chunk ``pages`` as they are extracted and insert the chunks ``batch_size`` at a time.
+
+    Only the page being chunked and one batch of chunks are held, whatever
+    the document length; each batch is committed and reported on the job.
+    Returns (pages, text length, chunks).
+    """
+    n_pages = text_len = written = 0
+    extract_s = persist_s = 0.0
+
+    def timed_pages() -> Iterator[str]:
+        nonlocal n_pages, text_len, extract_s
+        it = iter(pages)
+        while True:
+            t = time.perf_counter()
+            page = next(it, None)
+            extract_s += time.perf_counter() - t
+            if page is None:
+                return
+            n_pages += 1
+            text_len += len(page)
+            yield page
+
+    def flush(batch: List[Dict[str, Any]]) -> None:
+        nonlocal written, persist_s
+        t = time.perf_counter()
+        insert_chunks(session, version_id, batch, batch_size, first_index=written)
+        session.commit()
+        persist_s += time.perf_counter() - t
+        written += len(batch)
+        _update_job(job_id, pages_done=n_pages, chunks_written=written)
+
+    t0 = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+    for chunk in iter_chunks(timed_pages(), max_chars=800, overlap=80):
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    add_stage_time("extract", extract_s)
+    add_stage_time("persist_chunks", persist_s)
+    add_stage_time("chunk", time.perf_counter() - t0 - extract_s - persist_s)
+    return n_pages, text_len, written
+
+
+def _reusable_version(session, doc: Document) -> Optional[DocumentVersion]:
+    """A processed, still current version of any document with the same sha256."""
+    if not doc.sha256:
+        return None
+    return session.exec(
+        select(DocumentVersion)
+        .join(Document, Document.current_version_id == DocumentVersion.id)
+        .where((DocumentVersion.doc_sha256 == doc.sha256) & (DocumentVersion.chunk_count > 0) & (Document.status == "processed"))
+        .order_by(DocumentVersion.id.desc())
+    ).first()
+
+
+def ingest_document(doc_id: int, user_id: Optional[int] = None, job_id: Optional[int] = None) -> Dict[str, Any]:
+    """Extract, chunk and index a document as a new version.
+
+    Progress is written to the job row when ``job_id`` is given. Returns the
+    ingest summary stored as the job result.
+    """
+    session = next(get_session())
+    try:
+        doc = session.get(Document, doc_id)
+        if not doc:
+            raise LookupError(f"Document {doc_id} not found")
+        path = Path(doc.path)
+        if not path.exists():
+            raise FileNotFoundError(f"Stored file not found: {path}")
+
+        source = _reusable_version(session, doc)
+
+        last_version_num = 1
+        if doc.current_version_id:
+            current_ver = session.get(DocumentVersion, doc.current_version_id)
+            if current_ver:
+                last_version_num = (current_ver.version or 1)
+        new_version_num = last_version_num + 1 if doc.status == "processed" else 1
+
+        # counts are filled in once the chunks are written; until then the
+        # version is not current and, with chunk_count 0, never reused
+        ver = DocumentVersion(
+            document_id=doc.id,
+            version=new_version_num,
+            text_len=0,
+            chunk_count=0,
+            embedding_model="",
+            doc_sha256=doc.sha256,
+        )
+        session.add(ver)
+        session.commit()
+        session.refresh(ver)
+        version_id = ver.id
+        _update_job(job_id, version_id=version_id)
+
+        cache_stats: Dict[str, int] = {}
+        try:
+            if source is not None:
+                # same content already ingested: copy its chunks, skip extraction
+                with stage("persist_chunks"):
+                    _copy_chunks(session, ver.id, source.id)
+                    session.commit()
+                chunk_count = source.chunk_count
+                pages_processed = session.exec(select(func.max(Chunk.page)).where(Chunk.doc_version_id == ver.id)).one() or 0
+                text_len = source.text_len
+                _update_job(job_id, pages_done=pages_processed, chunks_written=chunk_count)
+            else:
+                pages_processed, text_len, chunk_count = _stream_chunks(
+                    session, ver.id, iter_pages_by_mime(path, doc.mime, doc.filename), job_id)
+            ver.text_len = text_len
+            ver.chunk_count = chunk_count
+            session.add(ver)
+            session.commit()
+
+            # indexed before it becomes current: a search never sees (and backfills) a half-ingested version
+            with stage("index_build"):
+                build_index_for_version(ver.id, session=session, source_version_id=source.id if source else None, stats=cache_stats)
+        except BaseException:
+            # drop the partial version; a retry starts a new one
+            session.rollback()
+            forget_versions([version_id])
+            for artifact in map(Path, index_paths_for_version(version_id)):
+                artifact.unlink(missing_ok=True)
+            session.execute(delete(Chunk).where(Chunk.doc_version_id == version_id))
+            session.execute(delete(DocumentVersion).where(DocumentVersion.id == version_id))
+            session.commit()
+            raise
+
+        previous_version_id = doc.current_version_id
+        doc.status = "processed"
+        doc.current_version_id = ver.id
+        session.add(doc)
+        session.commit()
+        session.refresh(doc)
+
+        encoded = cache_stats.get("hits", 0) + cache_stats.get("misses", 0)
+        if previous_version_id and previous_version_id != ver.id:
+            # the superseded version is no longer visible to search
+            forget_versions([previous_version_id])
+        if rebalance_due(session, ver.id):  # its shard outgrew the others (or INDEX_SHARDS changed)
+            rebalance_shards(session)
+        bump_generation()  # the new version is indexed: cached results are stale
+
+        audit_log(user_id, "ingest", "document", doc.id, {"version": ver.version, "chunks": chunk_count, "reused_version": source.id if source else None})
+
+        return {
+            "document_id": doc.id,
+            "version": ver.version,
+            "pages_processed": pages_processed,
+            "chunk_count": chunk_count,
+            "text_len": ver.text_len,
+            "status": doc.status,
+            "reused_version_id": source.id if source else None,
+            "embedding_cache": {
+                "hits": cache_stats.get("hits", 0),
+                "misses": cache_stats.get("misses", 0),
+                "hit_ratio": round(cache_stats.get("hits", 0) / encoded, 4) if encoded else None,
+            },
+        }
+    finally:
+        session.close()
+
+
+def run_job(job_id: int) -> Dict[str, float]:
+    """Worker-process entry point: run one claimed job and record its result.
+
+    Returns the job's stage durations, for the dispatcher process's metrics.
+    """
+    session = next(get_session())
+    try:
+        job = session.get(IngestJob, job_id)
+        doc_id, user_id = job.document_id, job.user_id
+    finally:
+        session.close()
+    try:
+        with record_stages() as timings:
+            result = ingest_document(doc_id, user_id, job_id)
+    finally:
+        audit_writer.flush()  # pool processes exit without running the writer's shutdown
+    _update_job(job_id, status="done", error=None, result=json.dumps(result))
+    return timings
+
+
+class IngestQueue:
+    """SQLite-backed ingestion queue feeding a process pool.
+
+    Jobs are rows in ``IngestJob``, so they survive restarts. A dispatcher
+    thread claims queued jobs up to the pool size and keeps a lease on the ones
+    it runs; a job whose lease expired (its process died, or the API was
+    restarted mid-ingest) is requeued by any dispatcher until it has used
+    ``max_attempts``.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, max_attempts: int = INGEST_MAX_ATTEMPTS,
+                 lease_seconds: int = INGEST_LEASE_SECONDS, poll_seconds: float = INGEST_POLL_SECONDS):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._running: Set[int] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_heartbeat = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="ingest-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._pool is not None:
+            # unfinished jobs keep status "running" and are requeued when their lease expires
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"workers": self.workers, "running": len(self._running)}
+
+    def enqueue(self, session, doc_id: int, user_id: Optional[int]) -> IngestJob:
+        """Queue an ingest of ``doc_id``, reusing a job already pending for it."""
+        job = session.exec(
+            select(IngestJob).where((IngestJob.document_id == doc_id) & (IngestJob.status.in_(["queued", "running"])))
+        ).first()
+        if job is None:
+            job = IngestJob(document_id=doc_id, user_id=user_id)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+        self._wake.set()
+        return job
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._tick()
+            except Exception:
+                logger.exception("ingest dispatcher tick failed")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _tick(self) -> None:
+        session = next(get_session())
+        try:
+            now = _now()
+            with self._lock:
+                running = list(self._running)
+            if running and time.monotonic() - self._last_heartbeat > self.lease_seconds / 4:
+                session.execute(update(IngestJob).where(IngestJob.id.in_(running)).values(updated_at=now))
+                self._last_heartbeat = time.monotonic()
+            stale = (IngestJob.status == "running") & (IngestJob.updated_at < now - timedelta(seconds=self.lease_seconds))
+            if running:
+                stale = stale & IngestJob.id.not_in(running)
+            session.execute(update(IngestJob).where(stale).values(
+                status=case((IngestJob.attempts >= self.max_attempts, "failed"), else_="queued"),
+                error="worker lost (crash or restart)",
+                updated_at=now,
+            ))
+            session.commit()
+
+            free = max(1, self.workers) - len(running)
+            if free <= 0:
+                return
+            queued = session.exec(
+                select(IngestJob.id).where(IngestJob.status == "queued").order_by(IngestJob.id).limit(free)
+            ).all()
+            for job_id in queued:
+                claimed = session.execute(
+                    update(IngestJob)
+                    .where((IngestJob.id == job_id) & (IngestJob.status == "queued"))
+                    .values(status="running", attempts=IngestJob.attempts + 1, updated_at=_now())
+                ).rowcount
+                session.commit()
+                if claimed:
+                    self._submit(job_id)
+        finally:
+            session.close()
+
+    def _submit(self, job_id: int) -> None:
+        with self._lock:
+            self._running.add(job_id)
+        if self.workers <= 0:
+            fut: Future = Future()
+            try:
+                run_job(job_id)
+                fut.set_result(None)
+            except BaseException as e:
+                fut.set_exception(e)
+            self._finished(job_id, fut)
+            return
+        try:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            fut = self._pool.submit(run_job, job_id)
+        except Exception as e:
+            self._pool = None
+            fut = Future()
+            fut.set_exception(e)
+            self._finished(job_id, fut)
+            return
+        fut.add_done_callback(lambda f, job_id=job_id: self._finished(job_id, f))
+
+    def _finished(self, job_id: int, fut: Future) -> None:
+        with self._lock:
+            self._running.discard(job_id)
+        exc = None if fut.cancelled() else fut.exception()
+        if exc is None and not fut.cancelled() and isinstance(fut.result(), dict):
+            observe_stages(fut.result())  # measured in a pool process
+        if exc is not None:
+            if isinstance(exc, BrokenProcessPool):
+                self._pool = None  # recreated on the next submit
+            logger.warning("ingest job %s failed: %r", job_id, exc)
+            session = next(get_session())
+            try:
+                job = session.get(IngestJob, job_id)
+                if job is not None:
+                    job.status = "failed" if job.attempts >= self.max_attempts else "queued"
+                    job.error = f"{type(exc).__name__}: {exc}"
+                    job.updated_at = _now()
+                    session.add(job)
+                    session.commit()
+            finally:
+                session.close()
+        self._wake.set()
+
+
+ingest_queue = IngestQueue()
\ No newline at end of file
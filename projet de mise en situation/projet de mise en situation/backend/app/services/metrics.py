@@ -0,0 +1,249 @@
+from __future__ import annotations
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond cache hits up to long PDF ingests.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, *labels: str) -> None:
+        self.inc(-amount, *labels)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; ``observe`` is one bisect and three additions under a lock."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        lines = self._header()
+        for labels, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = 'le="%s"' % _num(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Metrics of this process plus collectors called at scrape time (for values other objects already track)."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], List[_Metric]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[_Metric]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        for collector in collectors:
+            for metric in collector():
+                lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "docuhelp_stage_duration_seconds", "Time spent in one pipeline stage.", ["stage"]))
+HTTP_SECONDS = registry.register(Histogram(
+    "docuhelp_http_request_duration_seconds", "HTTP request latency by route template.", ["method", "route"]))
+HTTP_REQUESTS = registry.register(Counter(
+    "docuhelp_http_requests_total", "HTTP requests by route template and status.", ["method", "route", "status"]))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "docuhelp_http_requests_in_flight", "HTTP requests being served."))
+
+# stage -> seconds of the stages run under record_stages() in this context
+_recording: ContextVar[Optional[Dict[str, float]]] = ContextVar("docuhelp_stage_recording", default=None)
+
+
+class stage:
+    """``with stage("hydrate"):`` times the block into the stage histogram
+    (and the active ``record_stages`` dict, if any).
+
+    A plain class rather than a generator context manager: it sits on every
+    search and costs about half as much.
+    """
+
+    __slots__ = ("name", "_t")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        self._t = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self._t
+        STAGE_SECONDS.observe(elapsed, self.name)
+        timings = _recording.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed
+
+
+@contextmanager
+def record_stages() -> Iterator[Dict[str, float]]:
+    """Collect the stage durations of the enclosed code (same thread/task) into the yielded dict."""
+    timings: Dict[str, float] = {}
+    token = _recording.set(timings)
+    try:
+        yield timings
+    finally:
+        _recording.reset(token)
+
+
+def add_stage_time(name: str, seconds: float) -> None:
+    """Record a stage timed piecewise, e.g. one of several interleaved in a streaming pipeline."""
+    STAGE_SECONDS.observe(seconds, name)
+    timings = _recording.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def recording() -> Optional[Dict[str, float]]:
+    """The dict of the enclosing ``record_stages``, or None when nothing is recording."""
+    return _recording.get()
+
+
+def observe_stages(timings: Dict[str, float]) -> None:
+    """Add durations measured in another process (ingest workers) to this process's histograms."""
+    for name, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, name)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per route template.
+
+    Requests that match no route are labelled ``unmatched`` so scanners cannot
+    blow up the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        t = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - t
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.observe(elapsed, scope["method"], route)
+            HTTP_REQUESTS.inc(1.0, scope["method"], route, str(status[0]))
\ No newline at end of file
@@ -0,0 +1,246 @@
+from __future__ import annotations
+import functools
+import inspect
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from urllib.parse import parse_qs
+
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+
+from ..config import PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_KEEP
+from .metrics import record_stages, recording
+
+_PROFILE_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame) -> str:
+    """Root-first ``a;b;c`` stack of ``frame``, the collapsed format flame graph tools read."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class RequestProfile:
+    """Samples the stacks of the threads currently running one request.
+
+    Request code registers its thread with ``running()`` while it works (see
+    ``profiled``); a daemon thread records their stacks every ``interval``
+    seconds. Other requests served meanwhile are not sampled.
+    """
+
+    def __init__(self, interval: float):
+        self.id = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._threads: Set[int] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def running(self) -> Iterator[None]:
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads.add(ident)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads.discard(ident)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._sample, name=f"profiler-{self.id}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = list(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[collapse(frame)] += 1
+                    self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+_active: ContextVar[Optional[RequestProfile]] = ContextVar("docuhelp_request_profile", default=None)
+
+
+def profiled(call: Callable) -> Callable:
+    """Wrap a sync endpoint or dependency so a profiled request samples the thread running it."""
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return call(*args, **kwargs)
+        with profile.running():
+            return call(*args, **kwargs)
+    return wrapper
+
+
+def instrument_routes(routes) -> None:
+    """Wrap the sync endpoints and plain-function dependencies of ``routes``.
+
+    FastAPI runs each of them on a threadpool thread, which a sampler on the
+    event loop thread would never see. Generator dependencies (sessions) and
+    coroutines are left alone.
+    """
+    def wrap(dependant) -> None:
+        call = dependant.call
+        if inspect.isfunction(call) and not inspect.iscoroutinefunction(call) and not inspect.isgeneratorfunction(call) \
+                and not hasattr(call, "__wrapped__"):
+            dependant.call = profiled(call)
+        for sub in dependant.dependencies:
+            wrap(sub)
+
+    for route in routes:
+        dependant = getattr(route, "dependant", None)
+        if dependant is not None:
+            wrap(dependant)
+
+
+def instrument_engine(engine) -> None:
+    """Add the time spent in SQL statements to the recorded stages, as "sql"."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        if recording() is not None:
+            context._docuhelp_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, "_docuhelp_started", None)
+        timings = recording()
+        if started is not None and timings is not None:
+            timings["sql"] = timings.get("sql", 0.0) + time.perf_counter() - started
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in sorted(timings.items(), key=lambda kv: -kv[1])]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def save_profile(profile: RequestProfile, meta: Dict[str, Any], root: Path = PROFILE_DIR) -> None:
+    """Write ``<id>.collapsed`` and ``<id>.json``; keep the newest PROFILE_KEEP profiles."""
+    root.mkdir(parents=True, exist_ok=True)
+    (root / f"{profile.id}.collapsed").write_text(profile.collapsed(), encoding="utf-8")
+    (root / f"{profile.id}.json").write_text(json.dumps({"id": profile.id, **meta}), encoding="utf-8")
+    metas = sorted(root.glob("*.json"))
+    for old in metas[:max(0, len(metas) - PROFILE_KEEP)]:
+        for path in (old, old.with_suffix(".collapsed")):
+            path.unlink(missing_ok=True)
+
+
+def list_profiles(root: Path = PROFILE_DIR) -> List[Dict[str, Any]]:
+    out = []
+    for path in sorted(root.glob("*.json"), reverse=True):
+        try:
+            out.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def profile_path(profile_id: str, root: Path = PROFILE_DIR) -> Optional[Path]:
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    path = root / f"{profile_id}.collapsed"
+    return path if path.exists() else None
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.strip().lower() in (b"1", b"true", b"yes")
+    qs = scope.get("query_string", b"")
+    if b"profile" in qs:
+        return parse_qs(qs.decode("latin-1")).get("profile", [""])[-1].lower() in ("1", "true", "yes")
+    return False
+
+
+class ProfilingMiddleware:
+    """Profile one request when it asks for it (``X-Profile: 1`` or ``?profile=1``) and ``authorize`` allows it.
+
+    ``authorize(headers)`` runs on the threadpool and returns a truthy value
+    for callers allowed to profile. A profiled response carries a
+    ``Server-Timing`` header with the durations of the stages it ran and an
+    ``X-Profile-Id`` naming the stored profile. Requests that do not ask are
+    passed straight through.
+    """
+
+    def __init__(self, app, authorize: Callable[[Dict[str, str]], Any], interval_ms: float = PROFILE_INTERVAL_MS):
+        self.app = app
+        self.authorize = authorize
+        self.interval = max(0.001, interval_ms / 1000)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        if not await run_in_threadpool(self.authorize, headers):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(self.interval)
+        status = [500]
+        t = time.perf_counter()
+        with record_stages() as timings:
+
+            async def send_timing(message):
+                if message["type"] == "http.response.start":
+                    status[0] = message["status"]
+                    out = MutableHeaders(scope=message)
+                    out.append("Server-Timing", server_timing(dict(timings), time.perf_counter() - t))
+                    out.append("X-Profile-Id", profile.id)
+                await send(message)
+
+            token = _active.set(profile)
+            profile.start()
+            try:
+                await self.app(scope, receive, send_timing)
+            finally:
+                profile.stop()
+                _active.reset(token)
+        meta = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(scope.get("route"), "path", None),
+            "status": status[0],
+            "duration_ms": round((time.perf_counter() - t) * 1000, 3),
+            "samples": profile.samples,
+            "interval_ms": self.interval * 1000,
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in timings.items()},
+        }
+        await run_in_threadpool(save_profile, profile, meta)
\ No newline at end of file
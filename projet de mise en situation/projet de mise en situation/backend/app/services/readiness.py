@@ -0,0 +1,130 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlmodel import select
+
+from ..db import get_session
+from ..models import Document
+from ..config import TOP_K
+
+logger = logging.getLogger(__name__)
+
+
+def process_start_time() -> Optional[float]:
+    """Epoch seconds at which this process started (Linux /proc), None elsewhere."""
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            # field 22 (starttime, in clock ticks since boot) counted after the ")" closing the command name
+            start_ticks = int(f.read().rsplit(b")", 1)[1].split()[19])
+        with open("/proc/stat", "rb") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith(b"btime "))
+        return boot + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+def _import_sklearn() -> None:
+    # the per-version fallback of semantic search may load TF-IDF indexes; ~1-2 s cold
+    from sklearn.feature_extraction.text import TfidfVectorizer  # noqa: F401
+    from sklearn.metrics.pairwise import linear_kernel  # noqa: F401
+
+
+class Readiness:
+    """Startup milestones and the state of the background warm-up.
+
+    ``/health`` answers as soon as the server listens; ``ready`` only turns
+    true once the model is loaded, one encode has run and the indexes are in
+    memory, i.e. once a search costs what it will cost from then on.
+    """
+
+    def __init__(self):
+        # process start from /proc; otherwise the import of this module, which misses interpreter start-up
+        self.process_started = process_start_time() or time.time()
+        self.milestones: Dict[str, float] = {}
+        self.steps: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def mark(self, milestone: str) -> float:
+        """Record ``milestone`` now; returns seconds since the process started."""
+        elapsed = time.time() - self.process_started
+        self.milestones[milestone] = round(elapsed, 3)
+        return elapsed
+
+    def start(self, warm: bool = True) -> None:
+        """Called at the end of startup, when the server is about to listen."""
+        listening = self.mark("listening")
+        logger.info("started in %.2fs", listening)
+        if not warm:
+            self._done()
+            return
+        self._thread = threading.Thread(target=self._warm_up, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def _step(self, name: str, fn) -> Any:
+        t = time.perf_counter()
+        result = fn()
+        self.steps[name] = round(time.perf_counter() - t, 3)
+        return result
+
+    def _warm_up(self) -> None:
+        from . import embedding
+        from .indexing import rebalance_shards
+        from .shards import get_corpus_shards, get_ann_shards
+        try:
+            self._step("model_load", embedding._try_load_sentence_model)
+            # moves versions if INDEX_SHARDS changed since the last run
+            self._step("shard_rebalance", rebalance_shards)
+            if embedding.semantic_enabled():
+                self._step("warmup_encode", lambda: embedding.encode_query("warm-up"))
+                self._step("ann_index", get_ann_shards().loads)
+                self._step("sklearn", _import_sklearn)
+            else:
+                self._step("corpus_index", get_corpus_shards().loads)
+            self._step("first_search", self._first_search)
+        except Exception as e:
+            # the app still serves, as it did before warm-up existed; the failure is reported
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("warm-up failed")
+        self._done()
+
+    def _first_search(self) -> None:
+        from . import embedding
+        from .indexing import hydrate_hits
+        from .shards import get_corpus_shards, get_ann_shards
+        session = next(get_session())
+        try:
+            version_ids = list(session.exec(select(Document.current_version_id).where(Document.current_version_id.is_not(None))).all())
+            if not version_ids:
+                return
+            # read-only: queries the indexes as they are, without the backfill of
+            # search_versions, which would race the ingest workers starting up
+            if embedding.semantic_enabled():
+                hits = get_ann_shards().search(embedding.encode_query("warm-up"), version_ids, TOP_K)
+            else:
+                hits = get_corpus_shards().search("warm-up", version_ids, TOP_K)
+            hydrate_hits(session, hits)
+        finally:
+            session.close()
+
+    def _done(self) -> None:
+        ready = self.mark("ready")
+        self.ready = True
+        logger.info("ready in %.2fs (%s)", ready, ", ".join(f"{k} {v:.2f}s" for k, v in self.steps.items()) or "no warm-up")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "warming",
+            "ready": self.ready,
+            "since_start_s": dict(self.milestones),
+            "warmup_s": dict(self.steps),
+            "error": self.error,
+        }
+
+
+readiness = Readiness()
\ No newline at end of file
@@ -0,0 +1,159 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from ..config import INDEX_DIR, RESULT_CACHE, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES
+from .auth_cache import TTLCache
+from .locks import file_lock
+
+_GENERATION_PATH = INDEX_DIR / "corpus.generation"
+
+
+def corpus_generation() -> int:
+    """Counter bumped after every change visible to search (ingest, delete, rename)."""
+    try:
+        with open(_GENERATION_PATH, "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_generation() -> int:
+    """Increment the corpus generation, across processes; call it after the change is committed."""
+    with file_lock(INDEX_DIR / ".corpus.generation.lock"):
+        generation = corpus_generation() + 1
+        tmp = _GENERATION_PATH.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(generation))
+        os.replace(tmp, _GENERATION_PATH)
+    return generation
+
+
+def normalize_query(text: str) -> str:
+    return " ".join((text or "").casefold().split())
+
+
+class _SharedTier:
+    """Result cache in a SQLite file, shared by every worker process on the host.
+
+    Entries carry their own deadline; expired rows and the oldest rows past
+    ``max_entries`` are pruned every ``_PRUNE_EVERY`` writes.
+    """
+
+    _PRUNE_EVERY = 100
+
+    def __init__(self, path: Path, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # a lost entry is only a cache miss
+            conn.execute("CREATE TABLE IF NOT EXISTS result_cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_result_cache_expires ON result_cache (expires_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[tuple]:
+        try:
+            row = self._conn().execute(
+                "SELECT expires_at, value FROM result_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, value: Any, expires_at: float) -> None:
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO result_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                         (key, expires_at, json.dumps(value)))
+            self._writes += 1
+            if self._writes % self._PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (time.time(),))
+                conn.execute(
+                    "DELETE FROM result_cache WHERE key IN (SELECT key FROM result_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error:
+            pass  # busy or read-only: the in-process tier still serves the result
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            entries = self._conn().execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+class ResultCache:
+    """/search and /answers results, keyed by normalised query, k, visible versions and corpus generation.
+
+    The generation is part of the key, so a bump makes every earlier entry
+    unreachable; such entries age out through the TTL and size limits. Mode
+    ``memory`` keeps entries in this process, ``shared`` also stores them in a
+    SQLite file that other workers read, ``off`` disables the cache.
+    """
+
+    def __init__(self, mode: str = RESULT_CACHE, ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+                 max_entries: int = RESULT_CACHE_MAX_ENTRIES, shared_path: Optional[Path] = None):
+        self.mode = (mode or "off").lower()
+        self.ttl_seconds = ttl_seconds
+        self.enabled = self.mode in ("memory", "shared") and ttl_seconds > 0 and max_entries > 0
+        self._memory = TTLCache(max_entries)
+        self._shared = _SharedTier(shared_path or INDEX_DIR / "result_cache.db", max_entries) if self.mode == "shared" else None
+
+    def key(self, kind: str, query: str, k: int, version_ids: Iterable[int], generation: int) -> str:
+        """Read ``generation`` before computing the result it will key, so a concurrent bump is never missed."""
+        versions = ",".join(str(v) for v in sorted(version_ids))
+        raw = f"{kind}\x00{generation}\x00{k}\x00{normalize_query(query)}\x00{versions}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        value = self._memory.get(key)
+        if value is None and self._shared is not None:
+            entry = self._shared.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                self._memory.put(key, value, expires_at)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        self._memory.put(key, value, expires_at)
+        if self._shared is not None:
+            self._shared.put(key, value, expires_at)
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"mode": self.mode if self.enabled else "off", "generation": corpus_generation(),
+                               "memory": self._memory.stats()}
+        if self._shared is not None:
+            out["shared"] = self._shared.stats()
+        return out
+
+
+result_cache = ResultCache()
\ No newline at end of file
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from ..config import RETRIEVER_CACHE_MB
+from .embedding import Retriever
+
+
+@dataclass
+class CachedRetriever:
+    retriever: Retriever
+    chunk_count: int
+    mtime_ns: int
+    nbytes: int
+
+
+class RetrieverCache:
+    """Process-wide LRU of deserialized per-version retrievers.
+
+    Entries are keyed by version id and validated against the index file's
+    mtime, so a rebuilt index is picked up even without explicit invalidation.
+    Total size is bounded by ``budget_bytes``; least recently used entries are
+    evicted first.
+
+    Since the corpus-wide indexes, search only reaches it for semantic
+    versions the ANN index could not backfill (artifacts written before it);
+    BM25 search never does, so the cache stays empty in TF-IDF mode.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[int, CachedRetriever]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, version_id: int, path: str, load: Callable[[], Tuple[Retriever, int]]) -> Optional[CachedRetriever]:
+        """Return the cached retriever for ``path``, calling ``load`` on a miss.
+
+        ``load`` returns ``(retriever, chunk_count)``. Returns None when the
+        index file does not exist.
+        """
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(version_id)
+            if entry is not None and entry.mtime_ns == mtime_ns:
+                self._entries.move_to_end(version_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        retriever, chunk_count = load()
+        entry = CachedRetriever(retriever=retriever, chunk_count=chunk_count, mtime_ns=mtime_ns, nbytes=retriever.nbytes())
+        with self._lock:
+            self._pop(version_id)
+            if entry.nbytes <= self.budget_bytes:
+                self._entries[version_id] = entry
+                self._bytes += entry.nbytes
+                while self._bytes > self.budget_bytes:
+                    _, old = self._entries.popitem(last=False)
+                    self._bytes -= old.nbytes
+                    self.evictions += 1
+        return entry
+
+    def invalidate(self, version_ids: Iterable[int]) -> None:
+        with self._lock:
+            for vid in version_ids:
+                self._pop(vid)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _pop(self, version_id: int) -> None:
+        old = self._entries.pop(version_id, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+retriever_cache = RetrieverCache(RETRIEVER_CACHE_MB * 1024 * 1024)
\ No newline at end of file
@@ -0,0 +1,295 @@
+from __future__ import annotations
+import heapq
+import json
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import INDEX_DIR, INDEX_SHARDS, SHARD_WORKERS
+from .corpus_index import CorpusIndex, get_corpus_index, tokenize
+from .ann_index import IVFIndex, get_ann_index
+from .locks import file_lock
+
+Hit = Tuple[int, int, float]  # (version_id, chunk_index, score)
+
+_SHARDS_DIR = INDEX_DIR / "shards"
+
+
+def merge_top_k(results: Iterable[List[Hit]], k: int) -> List[Hit]:
+    """k-way heap merge of per-shard top-k lists (each sorted by score desc).
+
+    A version being moved between shards can briefly be in both; its chunks
+    are kept once.
+    """
+    out: List[Hit] = []
+    seen = set()
+    for hit in heapq.merge(*results, key=lambda h: -h[2]):
+        key = hit[:2]
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(hit)
+        if len(out) == k:
+            break
+    return out
+
+
+class Placement:
+    """Shard of each placement key (an owner id or a version id).
+
+    Stored in ``shards/placement.json`` and shared by every process; writers
+    hold ``shards/.lock``. New keys go to the shard holding the fewest chunks.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.path = root / "placement.json"
+        self._mtime: Optional[int] = None
+        self._keys: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def lock(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        return file_lock(self.root / ".lock")
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._keys = json.load(f)
+            self._mtime = mtime
+
+    def _save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._keys, f)
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def get(self, key: Any) -> Optional[int]:
+        with self._lock:
+            self._refresh()
+            return self._keys.get(str(key))
+
+    def assign(self, sizes: Dict[Any, int], loads: List[int]) -> Dict[Any, int]:
+        """Shard of each key of ``sizes`` (chunks about to be added under it).
+
+        Keys without a shard go to the least loaded one; ``loads`` is updated
+        as they are placed. Call under ``lock()``.
+        """
+        with self._lock:
+            self._refresh()
+            out: Dict[Any, int] = {}
+            changed = False
+            for key, size in sizes.items():
+                shard = self._keys.get(str(key))
+                if shard is None or shard >= len(loads):
+                    shard = loads.index(min(loads))
+                    self._keys[str(key)] = shard
+                    changed = True
+                loads[shard] += size
+                out[key] = shard
+            if changed:
+                self._save()
+            return out
+
+    def move(self, key: Any, shard: int) -> None:
+        """Record that ``key`` now lives on ``shard``. Call under ``lock()``."""
+        with self._lock:
+            self._refresh()
+            self._keys[str(key)] = shard
+            self._save()
+
+
+class _ShardedIndex(ABC):
+    """``n`` indexes of one kind searched in parallel, results merged with a heap.
+
+    Shard 0 is the unsharded index (``get_corpus_index``/``get_ann_index``), so
+    ``INDEX_SHARDS=1`` is the previous layout; shard ``i > 0`` lives under
+    ``INDEX_DIR/shards/<i>/``. Each version sits whole on one shard, chosen by
+    its placement key. Shards left over from a larger ``INDEX_SHARDS`` stay
+    searchable until ``indexing.rebalance_shards`` has moved their versions.
+    """
+
+    def __init__(self, n_shards: int, placement: Placement, workers: int = SHARD_WORKERS):
+        self.n_shards = max(1, n_shards)
+        self.placement = placement
+        self._shards: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix="shard") \
+            if self.n_shards > 1 else None
+
+    @abstractmethod
+    def _open(self, i: int):
+        """The index of shard ``i``."""
+
+    def shard(self, i: int):
+        shard = self._shards.get(i)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.get(i)
+                if shard is None:
+                    shard = self._shards[i] = self._open(i)
+        return shard
+
+    def shard_ids(self) -> List[int]:
+        """Configured shards plus leftovers on disk beyond ``n_shards``."""
+        ids = set(range(self.n_shards))
+        if _SHARDS_DIR.is_dir():
+            ids.update(int(p.name) for p in _SHARDS_DIR.iterdir() if p.is_dir() and p.name.isdigit())
+        return sorted(ids)
+
+    def _map(self, fn: Callable[[Any], Any]) -> List[Any]:
+        shards = [self.shard(i) for i in self.shard_ids()]
+        if self._pool is None or len(shards) == 1:
+            return [fn(s) for s in shards]
+        return list(self._pool.map(fn, shards))
+
+    def loads(self) -> List[int]:
+        """Chunks held by each configured shard."""
+        return [self.shard(i).chunk_count() for i in range(self.n_shards)]
+
+    def locate(self) -> Dict[int, Tuple[int, int]]:
+        """version_id -> (shard, chunk count) for every indexed version."""
+        out: Dict[int, Tuple[int, int]] = {}
+        for i in self.shard_ids():
+            for vid, size in self.shard(i).version_sizes().items():
+                out[vid] = (i, size)
+        return out
+
+    def missing_versions(self, version_ids: Iterable[int]) -> List[int]:
+        missing = list(version_ids)
+        for i in self.shard_ids():
+            if not missing:
+                break
+            missing = self.shard(i).missing_versions(missing)
+        return missing
+
+    def add_versions(self, batch: Dict[int, Any], keys: Dict[int, Any]) -> None:
+        """Add each version of ``batch`` (chunk texts or embeddings) to the shard of its placement key."""
+        if self.n_shards == 1:
+            self.shard(0).add_versions(batch)
+            return
+        sizes: Dict[Any, int] = {}
+        for vid, data in batch.items():
+            key = keys.get(vid, vid)
+            sizes[key] = sizes.get(key, 0) + len(data)
+        with self.placement.lock():
+            shard_of = self.placement.assign(sizes, self.loads())
+        by_shard: Dict[int, Dict[int, Any]] = {}
+        for vid, data in batch.items():
+            by_shard.setdefault(shard_of[keys.get(vid, vid)], {})[vid] = data
+        for i, part in by_shard.items():
+            self.shard(i).add_versions(part)
+
+    def remove_versions(self, version_ids: Iterable[int]) -> int:
+        version_ids = list(version_ids)
+        return sum(self._map(lambda s: s.remove_versions(version_ids)))
+
+    def move_versions(self, version_ids: List[int], src: int, dst: int, load: Callable[[List[int]], Dict[int, Any]]) -> None:
+        """Copy versions to ``dst`` (``load`` gives their data), then drop them from ``src``."""
+        batch = load(version_ids)
+        if batch:
+            self.shard(dst).add_versions(batch)
+        self.shard(src).remove_versions(version_ids)
+
+
+class ShardedCorpusIndex(_ShardedIndex):
+    def _open(self, i: int) -> CorpusIndex:
+        if i == 0:
+            return get_corpus_index()
+        root = _SHARDS_DIR / str(i)
+        root.mkdir(parents=True, exist_ok=True)
+        return CorpusIndex(root / "corpus.idx")
+
+    def search(self, query: str, version_ids: Sequence[int], k: int) -> List[Hit]:
+        if self.n_shards == 1 and len(self.shard_ids()) == 1:
+            return self.shard(0).search(query, version_ids, k)
+        # corpus-wide statistics, so shard scores are the scores of the unsharded index
+        terms = set(tokenize(query))
+        n_alive, total_len, dfs = 0, 0, {}
+        for st in self._map(lambda s: s.term_stats(terms)):
+            n_alive += st[0]
+            total_len += st[1]
+            for t, df in st[2].items():
+                dfs[t] = dfs.get(t, 0) + df
+        stats = (n_alive, total_len, dfs)
+        return merge_top_k(self._map(lambda s: s.search(query, version_ids, k, stats=stats)), k)
+
+    def stats(self) -> List[Dict[str, int]]:
+        return [{"shard": i, "versions": len(sizes), "chunks": sum(sizes.values())}
+                for i, sizes in ((i, self.shard(i).version_sizes()) for i in self.shard_ids())]
+
+
+class ShardedAnnIndex(_ShardedIndex):
+    def _open(self, i: int) -> IVFIndex:
+        if i == 0:
+            return get_ann_index()
+        from .embedding import MODEL_NAME
+        return IVFIndex(_SHARDS_DIR / str(i) / "ann", MODEL_NAME)
+
+    def search(self, query_vec: np.ndarray, version_ids: Sequence[int], k: int) -> List[Hit]:
+        if self.n_shards == 1 and len(self.shard_ids()) == 1:
+            return self.shard(0).search(query_vec, version_ids, k)
+        # exact scan or IVF probe is decided on the whole visible set, as the unsharded index does
+        visible = sum(self._map(lambda s: s.visible_rows(version_ids)))
+        return merge_top_k(self._map(lambda s: s.search(query_vec, version_ids, k, visible=visible)), k)
+
+    def stats(self) -> Dict[str, Any]:
+        per_shard = [self.shard(i).stats() for i in self.shard_ids()]
+        return {
+            "rows": sum(s["rows"] for s in per_shard),
+            "alive": sum(s["alive"] for s in per_shard),
+            "lists": sum(s["lists"] for s in per_shard),
+            "nprobe": per_shard[0]["nprobe"],
+            "dim": max(s["dim"] for s in per_shard),
+            "shards": len(per_shard),
+        }
+
+
+def drop_empty_leftovers(n_shards: int = INDEX_SHARDS) -> None:
+    """Delete shard directories beyond ``n_shards`` once both their indexes are empty."""
+    if not _SHARDS_DIR.is_dir():
+        return
+    corpus, ann = get_corpus_shards(), get_ann_shards()
+    for p in _SHARDS_DIR.iterdir():
+        if p.is_dir() and p.name.isdigit() and int(p.name) >= n_shards:
+            i = int(p.name)
+            if not corpus.shard(i).version_sizes() and not ann.shard(i).version_sizes():
+                for sharded in (corpus, ann):
+                    sharded._shards.pop(i, None)
+                shutil.rmtree(p, ignore_errors=True)
+
+
+_placement = Placement(_SHARDS_DIR)
+_corpus: Optional[ShardedCorpusIndex] = None
+_ann: Optional[ShardedAnnIndex] = None
+_lock = threading.Lock()
+
+
+def get_corpus_shards() -> ShardedCorpusIndex:
+    global _corpus
+    if _corpus is None:
+        with _lock:
+            if _corpus is None:
+                _corpus = ShardedCorpusIndex(INDEX_SHARDS, _placement)
+    return _corpus
+
+
+def get_ann_shards() -> ShardedAnnIndex:
+    global _ann
+    if _ann is None:
+        with _lock:
+            if _ann is None:
+                _ann = ShardedAnnIndex(INDEX_SHARDS, _placement)
+    return _ann
\ No newline at end of file
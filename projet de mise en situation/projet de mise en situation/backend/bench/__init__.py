@@ -0,0 +1 @@
+# Benchmarks and stress scripts for DocuHelp backend
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Recall@k and latency of the IVF index against exact search.
+
+Builds an index over clustered synthetic embeddings (inserted in batches, the
+way ingest does), then for each nprobe reports recall@k against a brute-force
+scan and the p50/p99 query latency.
+
+    python -m bench.ann_recall --rows 1000000 --dim 384 --nprobe 4 8 16 32
+"""
+from __future__ import annotations
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.ann_index import IVFIndex
+
+
+def synthetic(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    out = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, 65536):
+        n = min(65536, rows - start)
+        out[start:start + n] = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--per-version", type=int, default=500, help="chunks per inserted version")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nlist", type=int, default=0)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    ap.add_argument("--out", type=str, default="")
+    args = ap.parse_args()
+
+    data = synthetic(args.rows, args.dim, clusters=max(16, args.rows // 2000))
+    index = IVFIndex(Path(tempfile.mkdtemp()), model="bench", nlist=args.nlist, exact_below=0)
+    t0 = time.perf_counter()
+    batch = {}
+    for vid, start in enumerate(range(0, args.rows, args.per_version)):
+        batch[vid] = data[start:start + args.per_version]
+        if len(batch) == 200:
+            index.add_versions(batch)
+            batch = {}
+    if batch:
+        index.add_versions(batch)
+    build_s = time.perf_counter() - t0
+    versions = list(range(vid + 1))
+
+    rng = np.random.default_rng(1)
+    queries = synthetic(args.queries, args.dim, clusters=max(16, args.rows // 2000), seed=0)[rng.permutation(args.queries)]
+    queries += 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    truth = []
+    for q in queries:
+        scores = data @ (q / np.linalg.norm(q))
+        top = np.argpartition(-scores, args.k)[: args.k]
+        truth.append({(int(i) // args.per_version, int(i) % args.per_version) for i in top})
+
+    report = {"rows": args.rows, "dim": args.dim, "k": args.k, "build_s": round(build_s, 2), **index.stats(), "runs": []}
+    for nprobe in args.nprobe:
+        lat, recall = [], []
+        for q, expected in zip(queries, truth):
+            t = time.perf_counter()
+            hits = index.search(q, versions, args.k, nprobe=nprobe)
+            lat.append((time.perf_counter() - t) * 1000)
+            recall.append(len({(v, c) for v, c, _ in hits} & expected) / args.k)
+        run = {
+            "nprobe": nprobe,
+            f"recall@{args.k}": round(float(np.mean(recall)), 4),
+            "p50_ms": round(float(np.percentile(lat, 50)), 2),
+            "p99_ms": round(float(np.percentile(lat, 99)), 2),
+        }
+        report["runs"].append(run)
+        print(run)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
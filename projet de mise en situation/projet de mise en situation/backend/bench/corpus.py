@@ -0,0 +1,116 @@
+"""Synthetic corpora for the benchmarks.
+
+Text is drawn from a fixed vocabulary with Zipf-distributed word frequencies
+(a few very common words, a long tail of rare ones), so BM25/TF-IDF see term
+statistics close to real documentation. Everything is seeded: the same
+arguments always produce the same corpus.
+
+    python -m bench.corpus --docs 20 --pages 10 --formats txt docx pdf --out-dir /tmp/corpus
+"""
+from __future__ import annotations
+import argparse
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+DOMAIN = ("installation configuration reseau utilisateur serveur licence mise jour sauvegarde erreur journal "
+          "connexion securite mot passe imprimante poste logiciel procedure compte droits acces messagerie "
+          "certificat proxy pare-feu sauvegarde restauration disque partage dossier client support ticket").split()
+FORMATS = {
+    "txt": "text/plain",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+
+def vocabulary(size: int = 20000) -> List[str]:
+    """Domain words first (the frequent ones), then synthetic rare terms."""
+    return DOMAIN + [f"terme{i}" for i in range(size - len(DOMAIN))]
+
+
+def make_pages(pages: int, chars_per_page: int = 2960, seed: int = 0, vocab: Sequence[str] = ()) -> List[str]:
+    """``pages`` page texts of about ``chars_per_page`` characters.
+
+    The default length is four 800-character chunks with 80 characters of
+    overlap, so ``chunk_pages`` yields four chunks per page.
+    """
+    vocab = list(vocab) or vocabulary()
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(vocab) + 1)
+    weights /= weights.sum()
+    words_per_page = chars_per_page // 7 + 1  # average word + space is ~7 chars here
+    ids = rng.choice(len(vocab), size=(pages, words_per_page), p=weights)
+    out = []
+    for row in ids:
+        text = " ".join(vocab[i] for i in row)
+        out.append(text[:chars_per_page])
+    return out
+
+
+def make_queries(n: int, seed: int = 1, vocab: Sequence[str] = ()) -> List[str]:
+    """Two to four words each, mixing frequent and mid-frequency terms."""
+    vocab = list(vocab) or vocabulary()
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(n):
+        words = [vocab[int(rng.integers(0, len(DOMAIN)))]]
+        words += [vocab[int(rng.integers(0, min(len(vocab), 2000)))] for _ in range(int(rng.integers(1, 4)))]
+        out.append(" ".join(words))
+    return out
+
+
+def write_txt(path: Path, pages: Sequence[str]) -> None:
+    path.write_text("\n\n".join(pages), encoding="utf-8")
+
+
+def write_docx(path: Path, pages: Sequence[str]) -> None:
+    from docx import Document
+    doc = Document()
+    for text in pages:
+        doc.add_paragraph(text)
+        doc.add_page_break()
+    doc.save(str(path))
+
+
+def write_pdf(path: Path, pages: Sequence[str]) -> None:
+    import fitz  # PyMuPDF
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, page.rect.width - 36, page.rect.height - 36), text, fontsize=8)
+    doc.save(str(path))
+    doc.close()
+
+
+WRITERS = {"txt": write_txt, "docx": write_docx, "pdf": write_pdf}
+
+
+def make_corpus(root: Path, docs: int, pages: int, formats: Sequence[str] = tuple(FORMATS), seed: int = 0) -> Dict[str, List[Path]]:
+    """Write ``docs`` documents of ``pages`` pages in each format under ``root``; returns the paths per format."""
+    root.mkdir(parents=True, exist_ok=True)
+    out: Dict[str, List[Path]] = {fmt: [] for fmt in formats}
+    for d in range(docs):
+        texts = make_pages(pages, seed=seed + d)
+        for fmt in formats:
+            path = root / f"doc{d:04d}.{fmt}"
+            WRITERS[fmt](path, texts)
+            out[fmt].append(path)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=20)
+    ap.add_argument("--pages", type=int, default=10)
+    ap.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out-dir", type=str, required=True)
+    args = ap.parse_args()
+    paths = make_corpus(Path(args.out_dir), args.docs, args.pages, args.formats, args.seed)
+    for fmt, files in paths.items():
+        print(f"{fmt:4s} {len(files)} files, {sum(p.stat().st_size for p in files) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""Concurrent search + ingest throughput per database engine profile.
+
+Reader threads hydrate random search hits (the joined query /search runs)
+while writer threads insert chunk batches and audit rows (what ingest jobs
+and the audit writer do), for a fixed duration. Profiles:
+
+  sqlite-legacy  create_engine with only check_same_thread (previous setup)
+  sqlite-tuned   make_engine: WAL, synchronous=NORMAL, busy_timeout, cache, mmap
+  postgres       make_engine on --pg-url (skipped when not given)
+
+    python -m bench.db_profiles --readers 8 --writers 2 --seconds 10 [--pg-url postgresql://...]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/unused.db")
+os.environ.setdefault("STORAGE_DIR", f"{_tmp}/docs")
+os.environ.setdefault("INDEX_DIR", f"{_tmp}/index")
+
+import numpy as np  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlmodel import SQLModel, Session, create_engine  # noqa: E402
+
+from app.db import make_engine  # noqa: E402
+from app.models import AuditLog, Document, DocumentVersion, User  # noqa: E402
+from app.services.indexing import hydrate_hits  # noqa: E402
+from app.services.ingestion import insert_chunks  # noqa: E402
+
+CHUNK_TEXT = ("Procédure de réinitialisation du mot de passe et configuration du poste. " * 12)[:800]
+
+
+def chunks(n: int) -> List[Dict]:
+    return [{"content": CHUNK_TEXT, "page": i // 4 + 1, "start_char": 0, "end_char": 800} for i in range(n)]
+
+
+def seed(engine, versions: int, per_version: int) -> tuple:
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as s:
+        user = User(email="bench@example.com", password_hash="-")
+        s.add(user)
+        s.commit()
+        doc = Document(owner_id=user.id, name="bench.pdf", filename="bench.pdf", path="-", mime="application/pdf", size=0, sha256="")
+        s.add(doc)
+        s.commit()
+        vids = []
+        for _ in range(versions):
+            ver = DocumentVersion(document_id=doc.id, chunk_count=per_version)
+            s.add(ver)
+            s.commit()
+            insert_chunks(s, ver.id, chunks(per_version))
+            s.commit()
+            vids.append(ver.id)
+        return doc.id, vids
+
+
+def run(engine, args) -> Dict:
+    doc_id, vids = seed(engine, args.versions, args.per_version)
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+    read_ms: List[float] = []
+
+    def reader(seed_: int) -> None:
+        rng = random.Random(seed_)
+        while not stop.is_set():
+            hits = [(rng.choice(vids), rng.randrange(args.per_version), 1.0) for _ in range(10)]
+            t = time.perf_counter()
+            try:
+                with Session(engine) as s:
+                    hydrate_hits(s, hits)
+                ok = True
+            except OperationalError:
+                ok = False
+            with lock:
+                if ok:
+                    stats["reads"] += 1
+                    read_ms.append((time.perf_counter() - t) * 1000)
+                else:
+                    stats["read_errors"] += 1
+
+    def writer() -> None:
+        batch = chunks(args.write_chunks)
+        while not stop.is_set():
+            try:
+                with Session(engine) as s:
+                    ver = DocumentVersion(document_id=doc_id, chunk_count=len(batch))
+                    s.add(ver)
+                    s.commit()
+                    insert_chunks(s, ver.id, batch)
+                    s.execute(insert(AuditLog.__table__), [{"user_id": None, "action": "ingest", "resource": "document", "ref_id": ver.id, "meta": None}])
+                    s.commit()
+                ok = True
+            except OperationalError:
+                ok = False
+            with lock:
+                stats["writes" if ok else "write_errors"] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    engine.dispose()
+    return {
+        "reads_per_s": round(stats["reads"] / elapsed, 1),
+        "chunk_rows_written_per_s": round(stats["writes"] * args.write_chunks / elapsed, 1),
+        "read_p50_ms": round(float(np.percentile(read_ms, 50)), 2) if read_ms else None,
+        "read_p99_ms": round(float(np.percentile(read_ms, 99)), 2) if read_ms else None,
+        "read_errors": stats["read_errors"],
+        "write_errors": stats["write_errors"],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--writers", type=int, default=2)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--versions", type=int, default=20)
+    ap.add_argument("--per-version", type=int, default=500)
+    ap.add_argument("--write-chunks", type=int, default=200, help="chunks per write transaction")
+    ap.add_argument("--pg-url", type=str, default="", help="PostgreSQL URL for the postgres profile (its tables are dropped)")
+    ap.add_argument("--out", type=str, default="")
+    args = ap.parse_args()
+
+    profiles = {
+        "sqlite-legacy": lambda: create_engine(f"sqlite:///{_tmp}/legacy.db", connect_args={"check_same_thread": False}),
+        "sqlite-tuned": lambda: make_engine(f"sqlite:///{_tmp}/tuned.db"),
+    }
+    if args.pg_url:
+        profiles["postgres"] = lambda: make_engine(args.pg_url)
+    report = {"readers": args.readers, "writers": args.writers, "seconds": args.seconds, "profiles": {}}
+    for name, factory in profiles.items():
+        result = run(factory(), args)
+        report["profiles"][name] = result
+        print(f"{name:14s} {result}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""Query encoding throughput: a model per worker vs the shared embedding server.
+
+``--workers`` processes stand in for uvicorn workers and together run
+``--clients`` threads, each encoding one query at a time for ``--seconds``:
+
+  per-worker  every process loads its own model and encodes each query alone
+              (the path without EMBED_SERVER_SOCKET)
+  server      one server process holds the model, workers use EmbeddingClient;
+              concurrent queries are micro-batched (--window-ms, --max-batch)
+
+Reported: queries/s, latency p50/p95/p99, mean batch size on the server and
+peak RSS summed over all processes (workers + server). ``--model hash`` uses
+bench.hash_embedder (offline; like the real model, most of a single-query
+call is fixed per-call overhead); ``--model st`` loads EMBEDDINGS_MODEL with
+sentence-transformers.
+
+    python -m bench.embed_server --clients 200 --workers 8 --seconds 10
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from .corpus import make_queries
+
+
+def make_model(name: str, dim: int):
+    if name == "hash":
+        from .hash_embedder import HashEmbedder
+        return HashEmbedder(dim)
+    from sentence_transformers import SentenceTransformer  # type: ignore
+    from app.config import EMBEDDINGS_MODEL
+    return SentenceTransformer(EMBEDDINGS_MODEL)
+
+
+def serve(args) -> None:
+    from app.config import EMBEDDINGS_MODEL
+    from app.services.embed_server import EmbeddingServer
+    from .hash_embedder import MODEL_NAME
+    name = MODEL_NAME if args.model == "hash" else EMBEDDINGS_MODEL
+    server = EmbeddingServer(make_model(args.model, args.dim), name, args.window_ms, args.max_batch)
+    asyncio.run(server.serve(args.serve))
+
+
+def rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        return 0
+
+
+def worker(profile: str, args, threads: int, barrier, results) -> None:
+    if profile == "server":
+        from app.services.embed_server import EmbeddingClient
+        encoder = EmbeddingClient(args.socket)
+    else:
+        encoder = make_model(args.model, args.dim)
+    queries = make_queries(1000, seed=os.getpid())
+    encoder.encode(queries[:1], convert_to_numpy=True, normalize_embeddings=True)  # connect / warm up
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+
+    def run(i: int, end: float) -> None:
+        out, n = latencies[i], i
+        while time.perf_counter() < end:
+            q = queries[n % len(queries)]
+            t = time.perf_counter()
+            encoder.encode([q], convert_to_numpy=True, normalize_embeddings=True)
+            out.append((time.perf_counter() - t) * 1000)
+            n += threads
+
+    barrier.wait()
+    end = time.perf_counter() + args.seconds
+    pool = [threading.Thread(target=run, args=(i, end)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put({"latencies": [x for lat in latencies for x in lat],
+                 "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss})
+
+
+def run_profile(profile: str, args) -> Dict:
+    ctx = multiprocessing.get_context("spawn")
+    server = None
+    if profile == "server":
+        server = subprocess.Popen([sys.executable, "-m", "bench.embed_server", "--serve", args.socket, "--model", args.model,
+                                   "--dim", str(args.dim), "--window-ms", str(args.window_ms), "--max-batch", str(args.max_batch)],
+                                  cwd=Path(__file__).resolve().parents[1])
+        from app.services.embed_server import EmbeddingClient
+        client = EmbeddingClient(args.socket, timeout=5)
+        for _ in range(600):
+            if client.ping() is not None:
+                break
+            time.sleep(0.1)
+        else:
+            server.kill()
+            raise RuntimeError("embedding server did not start")
+    try:
+        barrier = ctx.Barrier(args.workers + 1)
+        results = ctx.Queue()
+        per_worker = [args.clients // args.workers + (1 if i < args.clients % args.workers else 0) for i in range(args.workers)]
+        procs = [ctx.Process(target=worker, args=(profile, args, n, barrier, results)) for n in per_worker]
+        for p in procs:
+            p.start()
+        barrier.wait()
+        outs = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        lat = [x for o in outs for x in o["latencies"]]
+        report = {
+            "queries_per_s": round(len(lat) / args.seconds, 1),
+            "p50_ms": round(float(np.percentile(lat, 50)), 2),
+            "p95_ms": round(float(np.percentile(lat, 95)), 2),
+            "p99_ms": round(float(np.percentile(lat, 99)), 2),
+            "rss_mb": round(sum(o["maxrss_kb"] for o in outs) / 1024, 1),
+        }
+        if server is not None:
+            stats = client.stats()
+            report["mean_batch"] = stats["mean_batch_texts"]
+            report["rss_mb"] = round(report["rss_mb"] + rss_kb(server.pid) / 1024, 1)
+        return report
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=200, help="concurrent queries in flight")
+    ap.add_argument("--workers", type=int, default=8, help="processes standing in for uvicorn workers")
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--model", choices=["hash", "st"], default="hash")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--window-ms", type=float, default=3)
+    ap.add_argument("--max-batch", type=int, default=64)
+    ap.add_argument("--profiles", nargs="+", default=["per-worker", "server"], choices=["per-worker", "server"])
+    ap.add_argument("--socket", default="")
+    ap.add_argument("--serve", default="", help=argparse.SUPPRESS)
+    ap.add_argument("--out", type=str, default="")
+    args = ap.parse_args()
+    if args.serve:
+        serve(args)
+        return
+    args.socket = args.socket or os.path.join(tempfile.mkdtemp(), "embed.sock")
+    report = {"clients": args.clients, "workers": args.workers, "model": args.model, "cpus": os.cpu_count(), "profiles": {}}
+    for profile in args.profiles:
+        result = report["profiles"][profile] = run_profile(profile, args)
+        print(f"{profile:10s} {json.dumps(result)}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""Deterministic offline stand-in for the SentenceTransformer.
+
+Texts are embedded by hashing their word unigrams and bigrams into ``dim``
+buckets (sklearn's HashingVectorizer) and L2-normalising the result. Same
+text, same vector, on any machine and without downloading a model, so the
+semantic code paths (embedding cache, index files, ANN) can be benchmarked
+offline. Scores mean nothing linguistically; only timings do.
+"""
+from __future__ import annotations
+from typing import List
+
+import numpy as np
+
+MODEL_NAME = "bench/hash-embedder"
+
+
+class HashEmbedder:
+    def __init__(self, dim: int = 384):
+        from sklearn.feature_extraction.text import HashingVectorizer  # type: ignore
+        self.dim = dim
+        self._vectorizer = HashingVectorizer(n_features=dim, ngram_range=(1, 2), alternate_sign=False, norm="l2")
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True, normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        return self._vectorizer.transform(texts).astype(np.float32).toarray()
+
+
+def install(dim: int = 384) -> HashEmbedder:
+    """Make the app use a HashEmbedder as its sentence model.
+
+    Set ``USE_SEMANTIC=on`` and ``EMBEDDINGS_MODEL=bench/hash-embedder`` in the
+    environment before importing ``app`` so index files and caches are tagged
+    with this model rather than the real one.
+    """
+    import app.services.embedding as embedding
+    model = HashEmbedder(dim)
+    embedding._sentence_model = model
+    return model
\ No newline at end of file
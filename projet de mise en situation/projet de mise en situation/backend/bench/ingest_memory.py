@@ -0,0 +1,97 @@
+"""Peak memory of one ingest against document length.
+
+For each ``--pages`` value a synthetic PDF is written (bench.corpus) and
+ingested by ``ingest_document`` in a fresh subprocess with its own database
+and index directory (TF-IDF mode). Reported per size: the ingest time and the
+growth of the process's peak RSS over its RSS just before the ingest, once
+the libraries are imported. PDF pages extracted in worker processes
+(``PDF_WORKERS``) are not counted in the worker's memory, only in what the
+ingesting process receives and holds.
+
+    python -m bench.ingest_memory --pages 100 500 2000
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+
+def _status_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+
+
+def run_case(path: str) -> Dict[str, Any]:
+    from app.db import create_db_and_tables, get_session
+    from app.models import Document, User
+    from app.services.ingestion import ingest_document
+    import fitz  # noqa: F401  # PyMuPDF, imported before the baseline like every library the ingest uses
+    from sklearn.feature_extraction.text import TfidfVectorizer  # noqa: F401
+
+    create_db_and_tables()
+    session = next(get_session())
+    user = User(email="bench@example.com", password_hash="-")
+    session.add(user)
+    session.commit()
+    doc = Document(owner_id=user.id, name="bench.pdf", filename="bench.pdf", path=path, mime="application/pdf",
+                   size=os.path.getsize(path), sha256="")
+    session.add(doc)
+    session.commit()
+    doc_id = doc.id
+    session.close()
+
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # reset the peak RSS (VmHWM) to the current RSS
+    except OSError:
+        pass
+    before = _status_kb("VmRSS")
+    t = time.perf_counter()
+    result = ingest_document(doc_id)
+    elapsed = time.perf_counter() - t
+    return {
+        "pages": result["pages_processed"],
+        "chunks": result["chunk_count"],
+        "text_mb": round(result["text_len"] / 1e6, 2),
+        "ingest_s": round(elapsed, 2),
+        "peak_growth_mb": round((_status_kb("VmHWM") - before) / 1024, 1),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, nargs="+", default=[100, 500, 2000])
+    ap.add_argument("--case", type=str, default="", help=argparse.SUPPRESS)
+    ap.add_argument("--out", type=str, default="")
+    args = ap.parse_args()
+    if args.case:
+        print(json.dumps(run_case(args.case)))
+        return
+
+    from .corpus import make_pages, write_pdf
+    report = {"cases": []}
+    for pages in args.pages:
+        tmp = tempfile.mkdtemp()
+        pdf = Path(tmp) / "bench.pdf"
+        write_pdf(pdf, make_pages(pages))
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", STORAGE_DIR=f"{tmp}/docs", INDEX_DIR=f"{tmp}/index",
+                   USE_SEMANTIC="off", AUDIT_QUEUE_SIZE="0")
+        proc = subprocess.run([sys.executable, "-m", "bench.ingest_memory", "--case", str(pdf)], env=env,
+                              cwd=Path(__file__).resolve().parents[1], stdout=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{pages} pages failed with status {proc.returncode}")
+        case = json.loads(proc.stdout.strip().splitlines()[-1])
+        report["cases"].append(case)
+        print(json.dumps(case))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""Chunk persistence throughput: per-row ORM writes vs the bulk path.
+
+Both variants write ``--chunks`` rows for a fresh version and then record the
+index path on them, as ingest + build_index_for_version do. "orm" is the
+previous code path (one ``session.add`` per chunk, then every row reloaded,
+updated and flushed again); "bulk" is ``insert_chunks`` plus one UPDATE.
+
+    python -m bench.ingest_rows --chunks 5000 --repeat 3
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+os.environ.setdefault("STORAGE_DIR", f"{_tmp}/docs")
+os.environ.setdefault("INDEX_DIR", f"{_tmp}/index")
+
+from sqlalchemy import update  # noqa: E402
+from sqlmodel import select  # noqa: E402
+
+from app.db import create_db_and_tables, get_session  # noqa: E402
+from app.models import Chunk, Document, DocumentVersion, User  # noqa: E402
+from app.services.ingestion import insert_chunks  # noqa: E402
+
+
+def make_chunks(n: int):
+    text = ("Procédure de réinitialisation du mot de passe et configuration du poste. " * 12)[:800]
+    return [{"content": f"{i} {text}", "page": i // 4 + 1, "start_char": (i % 4) * 720, "end_char": (i % 4) * 720 + 800} for i in range(n)]
+
+
+def new_version(session, doc_id: int) -> int:
+    ver = DocumentVersion(document_id=doc_id, version=1)
+    session.add(ver)
+    session.commit()
+    session.refresh(ver)
+    return ver.id
+
+
+def write_orm(session, version_id: int, chunks) -> None:
+    for idx, c in enumerate(chunks):
+        session.add(Chunk(doc_version_id=version_id, chunk_index=idx, content=c["content"], page=c.get("page"),
+                          start_char=c.get("start_char"), end_char=c.get("end_char"), vector_path=None))
+    session.commit()
+    rows = session.exec(select(Chunk).where(Chunk.doc_version_id == version_id).order_by(Chunk.chunk_index)).all()
+    for c in rows:
+        c.vector_path = "index.pkl"
+        session.add(c)
+    session.commit()
+
+
+def write_bulk(session, version_id: int, chunks) -> None:
+    insert_chunks(session, version_id, chunks)
+    session.commit()
+    session.execute(update(Chunk).where(Chunk.doc_version_id == version_id).values(vector_path="index.pkl"))
+    session.commit()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    ap.add_argument("--out", type=str, default="")
+    args = ap.parse_args()
+
+    create_db_and_tables()
+    session = next(get_session())
+    user = User(email="bench@example.com", password_hash="-")
+    session.add(user)
+    session.commit()
+    doc = Document(owner_id=user.id, name="bench.pdf", filename="bench.pdf", path="-", mime="application/pdf", size=0, sha256="")
+    session.add(doc)
+    session.commit()
+    doc_id = doc.id
+    chunks = make_chunks(args.chunks)
+
+    report = {"chunks": args.chunks, "database": os.environ["DATABASE_URL"].split(":")[0], "runs": {}}
+    for name, write in (("orm", write_orm), ("bulk", write_bulk)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            vid = new_version(session, doc_id)
+            session.expunge_all()
+            t = time.perf_counter()
+            write(session, vid, chunks)
+            best = min(best, time.perf_counter() - t)
+        report["runs"][name] = {"seconds": round(best, 3), "rows_per_s": round(args.chunks / best)}
+        print(f"{name:5s}: {best:7.3f} s  {args.chunks / best:10.0f} rows/s")
+    print(f"speedup: x{report['runs']['orm']['seconds'] / report['runs']['bulk']['seconds']:.1f}")
+    session.close()
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""/search latency while a login storm is running.
+
+Starts the API with uvicorn on a scratch database, ingests a small document,
+then measures /search latency alone and again while ``--storm`` threads log
+in as fast as they can. Each profile is a separate server:
+
+  pooled  bcrypt in the PASSWORD_WORKERS process pool, 429 past the queue limit
+  inline  bcrypt on the request threadpool with no limit (previous behaviour)
+
+    python -m bench.login_storm --storm 64 --seconds 10
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+PROFILES = {
+    "pooled": {},
+    "inline": {"PASSWORD_WORKERS": "0", "PASSWORD_QUEUE_MAX": "100000"},
+}
+
+
+def start_server(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=Path(__file__).resolve().parents[1],
+    )
+    for _ in range(300):
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def prepare(base: str) -> Dict[str, str]:
+    with httpx.Client(base_url=base, timeout=60) as c:
+        c.post("/auth/register", json={"email": "bench@example.com", "password": "bench-password"})
+        token = c.post("/auth/login", json={"email": "bench@example.com", "password": "bench-password"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        text = " ".join(f"procedure installation poste {i} reseau imprimante" for i in range(2000))
+        doc = c.post("/documents", headers=headers, files={"file": ("guide.txt", text.encode(), "text/plain")}).json()
+        job = c.post(f"/documents/{doc['id']}/ingest", headers=headers).json()
+        while job["status"] not in ("done", "failed"):
+            time.sleep(0.2)
+            job = c.get(f"/jobs/{job['id']}", headers=headers).json()
+    return headers
+
+
+def search_latencies(base: str, headers: Dict[str, str], seconds: float) -> List[float]:
+    out = []
+    with httpx.Client(base_url=base, timeout=60) as c:
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            t = time.perf_counter()
+            c.get("/search", params={"q": "installation reseau", "k": 5}, headers=headers)
+            out.append((time.perf_counter() - t) * 1000)
+    return out
+
+
+def storm(base: str, stop: threading.Event, codes: Counter, lock: threading.Lock) -> None:
+    with httpx.Client(base_url=base, timeout=120) as c:
+        while not stop.is_set():
+            code = c.post("/auth/login", json={"email": "bench@example.com", "password": "bench-password"}).status_code
+            with lock:
+                codes[code] += 1
+
+
+def summary(lat: List[float]) -> Dict[str, float]:
+    return {"n": len(lat), "p50_ms": round(float(np.percentile(lat, 50)), 1), "p99_ms": round(float(np.percentile(lat, 99)), 1)}
+
+
+def run_profile(name: str, port: int, args) -> Dict:
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", STORAGE_DIR=f"{tmp}/docs", INDEX_DIR=f"{tmp}/index",
+               USE_SEMANTIC="off", **PROFILES[name])
+    proc = start_server(port, env)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        headers = prepare(base)
+        quiet = search_latencies(base, headers, args.seconds)
+        stop, codes, lock = threading.Event(), Counter(), threading.Lock()
+        threads = [threading.Thread(target=storm, args=(base, stop, codes, lock), daemon=True) for _ in range(args.storm)]
+        for t in threads:
+            t.start()
+        time.sleep(1)  # let the storm build up
+        loaded = search_latencies(base, headers, args.seconds)
+        stop.set()
+        for t in threads:
+            t.join(timeout=120)
+        result = {"quiet": summary(quiet), "storm": summary(loaded), "logins": dict(codes)}
+        print(f"{name:7s} quiet {result['quiet']}  storm {result['storm']}  logins {dict(codes)}")
+        return result
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--storm", type=int, default=64, help="concurrent login clients")
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--profiles", nargs="+", default=["pooled", "inline"], choices=sorted(PROFILES))
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--out", type=str, default="")
+    args = ap.parse_args()
+    report = {"storm_clients": args.storm, "seconds": args.seconds, "profiles": {}}
+    for i, name in enumerate(args.profiles):
+        report["profiles"][name] = run_profile(name, args.port + i, args)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
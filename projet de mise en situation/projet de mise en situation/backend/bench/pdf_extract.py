@@ -0,0 +1,72 @@
+"""Serial vs page-parallel PDF extraction.
+
+Generates a text-heavy PDF (``--pages`` pages) with PyMuPDF, then times
+``extract_pdf`` with one process and with each ``--workers`` count, checking
+that every run returns the same pages as the serial one.
+
+    python -m bench.pdf_extract --pages 500 --workers 2 4 8
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from app.services.extract import extract_pdf
+
+WORDS = ("installation configuration reseau utilisateur serveur licence mise a jour "
+         "sauvegarde erreur journal connexion securite mot de passe imprimante").split()
+
+
+def make_pdf(path: Path, pages: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        text = "\n".join(" ".join(rng.choice(WORDS) for _ in range(14)) for _ in range(60))
+        page.insert_textbox(fitz.Rect(36, 36, page.rect.width - 36, page.rect.height - 36), f"Page {p + 1}\n{text}", fontsize=8)
+    doc.save(str(path))
+    doc.close()
+
+
+def timed(path: Path, workers: int, repeat: int):
+    best, pages = float("inf"), None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        pages = extract_pdf(path, workers=workers)
+        best = min(best, time.perf_counter() - t)
+    return best, pages
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=500)
+    ap.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    ap.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    ap.add_argument("--out", type=str, default="")
+    args = ap.parse_args()
+
+    path = Path(tempfile.mkdtemp()) / "manual.pdf"
+    make_pdf(path, args.pages)
+    serial_s, expected = timed(path, 1, args.repeat)
+    report = {"pages": args.pages, "serial_s": round(serial_s, 3), "runs": []}
+    print(f"serial     : {serial_s:7.3f} s")
+    mismatches = 0
+    for workers in args.workers:
+        seconds, pages = timed(path, workers, args.repeat)
+        same = pages == expected
+        mismatches += int(not same)
+        report["runs"].append({"workers": workers, "seconds": round(seconds, 3), "speedup": round(serial_s / seconds, 2), "identical": same})
+        print(f"{workers:2d} workers : {seconds:7.3f} s  x{serial_s / seconds:5.2f}  identical={same}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
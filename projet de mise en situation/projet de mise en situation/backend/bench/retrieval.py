@@ -0,0 +1,262 @@
+"""Throughput and latency of the retrieval pipeline on synthetic corpora.
+
+Cases, each run in a fresh subprocess with its own database and index
+directory (the corpus and ANN indexes are process-wide singletons):
+
+  extract          extract_by_mime on generated TXT, DOCX and PDF files
+  <mode>:<chunks>  chunk_pages, Retriever.fit, build_index_for_version (one
+                   call per version of --per-version chunks) and
+                   search_versions over every version, for mode "tfidf"
+                   (USE_SEMANTIC=off) or "semantic" (bench.hash_embedder
+                   standing in for the sentence model, so no download)
+
+Latencies are reported as p50/p95/p99 in ms, throughputs as items per
+second. The JSON written by --out can be given back as --baseline on a later
+commit: metrics that got worse by more than --tolerance are listed and the
+exit status is 1.
+
+    python -m bench.retrieval --sizes 10 1000 100000 --out bench-retrieval.json
+    python -m bench.retrieval --baseline bench-retrieval.json --out new.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+def summary(lat_ms: List[float]) -> Dict[str, float]:
+    return {
+        "n": len(lat_ms),
+        "mean_ms": round(float(np.mean(lat_ms)), 3),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 3),
+    }
+
+
+def timed(fn: Callable[[], Any], min_seconds: float = 0.2, max_runs: int = 50) -> Tuple[float, Any]:
+    """Seconds per call of ``fn`` (repeated until ``min_seconds`` for fast calls) and its last result."""
+    runs, total, result = 0, 0.0, None
+    while runs < max_runs and (runs == 0 or total < min_seconds):
+        t = time.perf_counter()
+        result = fn()
+        total += time.perf_counter() - t
+        runs += 1
+    return total / runs, result
+
+
+def log(msg: str) -> None:
+    print(msg, file=sys.stderr, flush=True)
+
+
+def run_extract(args) -> Dict[str, Any]:
+    from app.services.extract import extract_by_mime
+    from bench.corpus import FORMATS, make_corpus
+
+    corpus = make_corpus(Path(tempfile.mkdtemp()) / "corpus", args.docs, args.pages)
+    out: Dict[str, Any] = {"docs": args.docs, "pages_per_doc": args.pages}
+    for fmt, paths in corpus.items():
+        lat, pages = [], 0
+        for path in paths:
+            t = time.perf_counter()
+            pages += len(extract_by_mime(path, FORMATS[fmt], path.name))
+            lat.append((time.perf_counter() - t) * 1000)
+        total_s = sum(lat) / 1000
+        out[fmt] = {**summary(lat), "docs_per_s": round(len(paths) / total_s, 2),
+                    "pages_per_s": round(args.pages * len(paths) / total_s, 1), "pages_returned": pages,
+                    "mb": round(sum(p.stat().st_size for p in paths) / 1e6, 2)}
+        log(f"extract {fmt:4s} {out[fmt]}")
+    return out
+
+
+def run_size(args, mode: str, size: int) -> Dict[str, Any]:
+    from app.db import create_db_and_tables, get_session
+    from app.models import Document, DocumentVersion, User
+    from app.services.chunking import chunk_pages
+    from app.services.embedding import Retriever, semantic_enabled
+    from app.services.indexing import build_index_for_version, search_versions
+    from app.services.ingestion import insert_chunks
+    from bench.corpus import make_pages, make_queries
+
+    if mode == "semantic":
+        from bench.hash_embedder import install
+        install(args.dim)
+    assert semantic_enabled() == (mode == "semantic")
+
+    pages = make_pages(-(-size // 4), seed=size)
+    chunk_s, chunks = timed(lambda: chunk_pages(pages, max_chars=800, overlap=80))
+    chunks = chunks[:size]
+    texts = [c["content"] for c in chunks]
+    out: Dict[str, Any] = {"chunks": len(texts), "chunk_pages": {"seconds": round(chunk_s, 6), "chunks_per_s": round(len(chunks) / chunk_s, 1)}}
+    log(f"{mode}:{size} chunk_pages {out['chunk_pages']}")
+
+    Retriever.fit(texts[:2])  # first call imports sklearn / touches the model
+    fit_s, _ = timed(lambda: Retriever.fit(texts), max_runs=5)
+    out["fit"] = {"seconds": round(fit_s, 6), "chunks_per_s": round(len(texts) / fit_s, 1)}
+    log(f"{mode}:{size} fit {out['fit']}")
+
+    create_db_and_tables()
+    session = next(get_session())
+    user = User(email="bench@example.com", password_hash="-")
+    session.add(user)
+    session.commit()
+    version_ids = []
+    for start in range(0, len(texts), args.per_version):
+        doc = Document(owner_id=user.id, name=f"doc{start}.txt", filename=f"doc{start}.txt", path="-", mime="text/plain", size=0, sha256="", status="processed")
+        session.add(doc)
+        session.commit()
+        ver = DocumentVersion(document_id=doc.id, version=1, chunk_count=min(args.per_version, len(texts) - start))
+        session.add(ver)
+        session.commit()
+        insert_chunks(session, ver.id, chunks[start:start + args.per_version])
+        session.commit()
+        version_ids.append(ver.id)
+
+    lat = []
+    for vid in version_ids:
+        t = time.perf_counter()
+        build_index_for_version(vid, session=session)
+        lat.append((time.perf_counter() - t) * 1000)
+    out["build_index"] = {**summary(lat), "versions": len(version_ids), "seconds": round(sum(lat) / 1000, 3),
+                          "chunks_per_s": round(len(texts) / (sum(lat) / 1000), 1)}
+    log(f"{mode}:{size} build_index {out['build_index']}")
+
+    queries = make_queries(args.queries)
+    t = time.perf_counter()
+    search_versions(queries[0], version_ids, k=args.k, session=session)  # loads/backfills the indexes
+    first_ms = (time.perf_counter() - t) * 1000
+    lat = []
+    for q in queries:
+        t = time.perf_counter()
+        search_versions(q, version_ids, k=args.k, session=session)
+        lat.append((time.perf_counter() - t) * 1000)
+    out["search"] = {**summary(lat), "first_ms": round(first_ms, 3), "queries_per_s": round(len(lat) / (sum(lat) / 1000), 1)}
+    log(f"{mode}:{size} search {out['search']}")
+    session.close()
+    return out
+
+
+def run_case(case: str, args) -> Dict[str, Any]:
+    """Subprocess entry point: the environment was prepared by ``spawn_case``."""
+    if case == "extract":
+        result = run_extract(args)
+    else:
+        mode, size = case.split(":")
+        result = run_size(args, mode, int(size))
+    result["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def spawn_case(case: str, args) -> Dict[str, Any]:
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", STORAGE_DIR=f"{tmp}/docs", INDEX_DIR=f"{tmp}/index",
+               EMBED_CACHE="off", RESULT_CACHE="off", AUDIT_QUEUE_SIZE="0", PDF_WORKERS=str(args.pdf_workers))
+    if case.startswith("semantic:"):
+        env.update(USE_SEMANTIC="on", EMBEDDINGS_MODEL="bench/hash-embedder")
+    else:
+        env["USE_SEMANTIC"] = "off"
+    cmd = [sys.executable, "-m", "bench.retrieval", "--case", case, "--docs", str(args.docs), "--pages", str(args.pages),
+           "--per-version", str(args.per_version), "--queries", str(args.queries), "--k", str(args.k), "--dim", str(args.dim)]
+    proc = subprocess.run(cmd, env=env, cwd=Path(__file__).resolve().parents[1], stdout=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"case {case} failed with status {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and (key.endswith("_ms") or key.endswith("_per_s") or key == "seconds"):
+            out[name] = float(value)
+    return out
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_ms: float = 1.0) -> List[str]:
+    """Metrics of ``current`` worse than ``baseline`` by more than ``tolerance`` (0.2 = 20 %).
+
+    Latencies below ``min_ms`` in both runs are timer noise and are skipped.
+    """
+    now, before = flatten(current["results"]), flatten(baseline.get("results", {}))
+    regressions = []
+    for name, value in sorted(now.items()):
+        old = before.get(name)
+        if not old or not value:
+            continue
+        if name.endswith("_ms") and max(old, value) < min_ms:
+            continue
+        # throughputs should not drop, durations should not grow
+        ratio = value / old if name.endswith("_per_s") else old / value
+        if ratio < 1 - tolerance:
+            regressions.append(f"{name}: {old:g} -> {value:g} ({(1 / ratio - 1) * 100:+.0f}% worse)")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                              cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000], help="chunk counts")
+    ap.add_argument("--modes", nargs="+", default=["tfidf", "semantic"], choices=["tfidf", "semantic"])
+    ap.add_argument("--skip-extract", action="store_true")
+    ap.add_argument("--docs", type=int, default=10, help="extract: documents per format")
+    ap.add_argument("--pages", type=int, default=20, help="extract: pages per document")
+    ap.add_argument("--pdf-workers", type=int, default=1, help="PDF_WORKERS for the extract case")
+    ap.add_argument("--per-version", type=int, default=500, help="chunks per document version")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--dim", type=int, default=384, help="hash embedder dimension")
+    ap.add_argument("--out", type=str, default="")
+    ap.add_argument("--baseline", type=str, default="", help="earlier --out file to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    ap.add_argument("--min-ms", type=float, default=1.0, help="ignore latencies under this in both runs")
+    ap.add_argument("--case", type=str, default="", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args)))
+        return 0
+
+    cases = ([] if args.skip_extract else ["extract"]) + [f"{m}:{s}" for m in args.modes for s in args.sizes]
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "case", "tolerance", "min_ms")},
+        "results": {},
+    }
+    for case in cases:
+        report["results"][case] = spawn_case(case, args)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance, args.min_ms)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            return 1
+        print(f"no regression beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
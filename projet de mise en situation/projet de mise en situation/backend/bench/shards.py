@@ -0,0 +1,106 @@
+"""Admin-wide search latency against the number of index shards.
+
+Each shard count runs in a fresh subprocess (INDEX_SHARDS and INDEX_DIR are
+read at import). The subprocess fills the sharded indexes directly, with no
+database: ``--versions`` versions of ``--chunks`` synthetic chunks, placed by
+owner (``--owners`` owners). It then times searches over every version, as a
+support or admin user would run them.
+
+  tfidf     ShardedCorpusIndex (BM25 with corpus-wide statistics)
+  semantic  ShardedAnnIndex over random unit vectors (exact scan below
+            ANN_EXACT_BELOW visible rows, IVF above)
+
+The speed-up is relative to one shard. It can only approach the shard count
+on a machine with at least that many free cores.
+
+    python -m bench.shards --shards 1 2 4 8 --versions 2000 --chunks 50
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+from .corpus import make_pages, make_queries
+
+
+def run_case(args) -> Dict[str, Any]:
+    from app.services.shards import get_ann_shards, get_corpus_shards
+    version_ids = list(range(1, args.versions + 1))
+    keys = {vid: vid % args.owners for vid in version_ids}
+    t = time.perf_counter()
+    if args.mode == "tfidf":
+        index = get_corpus_shards()
+        pages = make_pages(args.versions * args.chunks, chars_per_page=740)
+        for start in range(0, args.versions, 200):
+            batch = {vid: pages[(vid - 1) * args.chunks:vid * args.chunks] for vid in version_ids[start:start + 200]}
+            index.add_versions(batch, keys)
+        queries = make_queries(args.queries)
+    else:
+        index = get_ann_shards()
+        rng = np.random.default_rng(0)
+        for start in range(0, args.versions, 200):
+            batch = {vid: rng.standard_normal((args.chunks, args.dim), dtype=np.float32) for vid in version_ids[start:start + 200]}
+            index.add_versions(batch, keys)
+        queries = list(rng.standard_normal((args.queries, args.dim), dtype=np.float32))
+    build_s = time.perf_counter() - t
+    index.search(queries[0], version_ids, args.k)  # load every shard
+    lat = []
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q, version_ids, args.k)
+        lat.append((time.perf_counter() - t) * 1000)
+    return {
+        "shards": index.n_shards,
+        "build_s": round(build_s, 2),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+        "loads": index.loads(),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--mode", choices=["tfidf", "semantic"], default="tfidf")
+    ap.add_argument("--versions", type=int, default=2000)
+    ap.add_argument("--chunks", type=int, default=50, help="chunks per version")
+    ap.add_argument("--owners", type=int, default=64)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--case", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--out", type=str, default="")
+    args = ap.parse_args()
+    if args.case:
+        print(json.dumps(run_case(args)))
+        return
+
+    report = {"mode": args.mode, "versions": args.versions, "chunks": args.chunks, "cpus": os.cpu_count(), "cases": []}
+    for n in args.shards:
+        tmp = tempfile.mkdtemp()
+        env = dict(os.environ, INDEX_SHARDS=str(n), INDEX_DIR=f"{tmp}/index", DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+                   STORAGE_DIR=f"{tmp}/docs", USE_SEMANTIC="off" if args.mode == "tfidf" else "on")
+        cmd = [sys.executable, "-m", "bench.shards", "--case", "--mode", args.mode, "--versions", str(args.versions),
+               "--chunks", str(args.chunks), "--owners", str(args.owners), "--queries", str(args.queries),
+               "--k", str(args.k), "--dim", str(args.dim)]
+        proc = subprocess.run(cmd, env=env, cwd=Path(__file__).resolve().parents[1], stdout=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{n} shards failed with status {proc.returncode}")
+        case = json.loads(proc.stdout.strip().splitlines()[-1])
+        case["speedup"] = round(report["cases"][0]["p50_ms"] / case["p50_ms"], 2) if report["cases"] else 1.0
+        report["cases"].append(case)
+        print(json.dumps(case))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
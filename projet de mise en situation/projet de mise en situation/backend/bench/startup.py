@@ -0,0 +1,142 @@
+"""Cold start: time to listen, time to ready and the first /search after it.
+
+Seeds a scratch database with one ingested document, then restarts the API
+``--runs`` times per profile and measures, from ``Popen``:
+
+  listen  first 200 from /health
+  ready   first 200 from /ready (the background warm-up is done)
+  first   latency of the first /search once ready, then of the second one
+
+Profiles:
+
+  warm    WARMUP=on, the model, indexes and sklearn load in the background
+  cold    WARMUP=off, /ready is immediate and the first search pays for them
+
+The milestones reported by /ready (seconds since process start, from /proc)
+are printed along with the client-side numbers.
+
+    python -m bench.startup --runs 5
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+PROFILES = {
+    "warm": {"WARMUP": "on"},
+    "cold": {"WARMUP": "off"},
+}
+
+
+def start(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=Path(__file__).resolve().parents[1],
+    )
+
+
+def wait_for(url: str, proc: subprocess.Popen, timeout: float = 120) -> httpx.Response:
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            r = httpx.get(url, timeout=5)
+            if r.status_code == 200:
+                return r
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def stop(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    proc.wait(timeout=30)
+
+
+def seed(port: int, env: Dict[str, str]) -> Dict[str, str]:
+    proc = start(port, env)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_for(f"{base}/ready", proc)
+        with httpx.Client(base_url=base, timeout=120) as c:
+            c.post("/auth/register", json={"email": "bench@example.com", "password": "bench-password"})
+            token = c.post("/auth/login", json={"email": "bench@example.com", "password": "bench-password"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            text = " ".join(f"procedure installation poste {i} reseau imprimante" for i in range(2000))
+            doc = c.post("/documents", headers=headers, files={"file": ("guide.txt", text.encode(), "text/plain")}).json()
+            job = c.post(f"/documents/{doc['id']}/ingest", headers=headers).json()
+            while job["status"] not in ("done", "failed"):
+                time.sleep(0.2)
+                job = c.get(f"/jobs/{job['id']}", headers=headers).json()
+        return headers
+    finally:
+        stop(proc)
+
+
+def run_once(port: int, env: Dict[str, str], headers: Dict[str, str]) -> Dict:
+    t = time.perf_counter()
+    proc = start(port, env)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_for(f"{base}/health", proc)
+        listen = time.perf_counter() - t
+        status = wait_for(f"{base}/ready", proc).json()
+        ready = time.perf_counter() - t
+        searches = []
+        with httpx.Client(base_url=base, timeout=120) as c:
+            for q in ("installation reseau", "imprimante poste"):
+                s = time.perf_counter()
+                c.get("/search", params={"q": q, "k": 5}, headers=headers).raise_for_status()
+                searches.append(time.perf_counter() - s)
+        return {"listen_s": listen, "ready_s": ready, "first_search_ms": searches[0] * 1000,
+                "second_search_ms": searches[1] * 1000, "server": status}
+    finally:
+        stop(proc)
+
+
+def summary(runs: List[Dict]) -> Dict[str, float]:
+    out = {}
+    for key in ("listen_s", "ready_s", "first_search_ms", "second_search_ms"):
+        out[key] = round(float(np.median([r[key] for r in runs])), 3)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--profiles", nargs="+", default=["warm", "cold"], choices=sorted(PROFILES))
+    ap.add_argument("--semantic", default="off", help="USE_SEMANTIC for the server (auto needs the model locally)")
+    ap.add_argument("--port", type=int, default=8775)
+    ap.add_argument("--out", type=str, default="")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", STORAGE_DIR=f"{tmp}/docs", INDEX_DIR=f"{tmp}/index",
+               USE_SEMANTIC=args.semantic, RESULT_CACHE="off")
+    headers = seed(args.port, env)
+
+    report = {"runs": args.runs, "semantic": args.semantic, "profiles": {}}
+    for name in args.profiles:
+        runs = [run_once(args.port, dict(env, **PROFILES[name]), headers) for _ in range(args.runs)]
+        report["profiles"][name] = {"median": summary(runs), "last_server": runs[-1]["server"]}
+        med = report["profiles"][name]["median"]
+        print(f"{name:5s} listen {med['listen_s']:.2f}s  ready {med['ready_s']:.2f}s  "
+              f"first search {med['first_search_ms']:.1f} ms  second {med['second_search_ms']:.1f} ms")
+        print(f"      server: {json.dumps(runs[-1]['server']['since_start_s'])}  warm-up: {json.dumps(runs[-1]['server']['warmup_s'])}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
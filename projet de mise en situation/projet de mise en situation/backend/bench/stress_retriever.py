@@ -0,0 +1,90 @@
+"""Concurrency stress test for Retriever and the corpus index.
+
+Fits one retriever per synthetic document, records the serial answer to every
+query, then replays the queries from N threads while other threads keep
+fitting new retrievers and appending to a corpus index (what concurrent
+/search and /ingest calls do). Any result that differs from the serial run is
+reported and the script exits with status 1.
+
+    python -m bench.stress_retriever --threads 8 --rounds 2000
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+from app.services.embedding import Retriever
+from app.services.corpus_index import CorpusIndex
+
+VOCAB = [f"w{i}" for i in range(3000)]
+
+
+def make_doc(rng: random.Random, n_chunks: int) -> List[str]:
+    return [" ".join(rng.choice(VOCAB) for _ in range(120)) for _ in range(n_chunks)]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=16)
+    ap.add_argument("--chunks", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=64)
+    ap.add_argument("--threads", type=int, default=os.cpu_count() or 4)
+    ap.add_argument("--rounds", type=int, default=2000)
+    args = ap.parse_args()
+
+    rng = random.Random(42)
+    docs = [make_doc(rng, args.chunks) for _ in range(args.docs)]
+    queries = [" ".join(rng.choice(VOCAB) for _ in range(3)) for _ in range(args.queries)]
+
+    retrievers = [Retriever.fit(texts) for texts in docs]
+    expected = {(d, q): retrievers[d].search(queries[q], top_k=5) for d in range(args.docs) for q in range(args.queries)}
+
+    index = CorpusIndex(Path(tempfile.mkdtemp()) / "corpus.idx")
+    for vid, texts in enumerate(docs):
+        index.add_version(vid, texts)
+    all_versions = list(range(args.docs))
+    expected_corpus = {q: index.search(queries[q], all_versions, 10) for q in range(args.queries)}
+    # Appends go to a second index: they change global term statistics, so
+    # scores on the checked index would legitimately move.
+    scratch = CorpusIndex(Path(tempfile.mkdtemp()) / "corpus.idx")
+
+    def search_task(seed: int) -> int:
+        r = random.Random(seed)
+        d, q = r.randrange(args.docs), r.randrange(args.queries)
+        errors = int(retrievers[d].search(queries[q], top_k=5) != expected[(d, q)])
+        errors += int(index.search(queries[q], all_versions, 10) != expected_corpus[q])
+        return errors
+
+    def ingest_task(seed: int) -> int:
+        # Fitting and indexing unrelated versions must not disturb readers.
+        texts = make_doc(random.Random(seed), 20)
+        Retriever.fit(texts)
+        scratch.add_version(seed, texts)
+        scratch.search(texts[0], [seed], 5)
+        return 0
+
+    t0 = time.perf_counter()
+    serial_errors = sum(search_task(i) for i in range(args.rounds))
+    serial = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = [pool.submit(search_task, i) for i in range(args.rounds)]
+        futures += [pool.submit(ingest_task, i) for i in range(args.rounds // 50)]
+        errors = sum(f.result() for f in futures)
+    concurrent = time.perf_counter() - t0
+
+    print(f"serial     : {args.rounds / serial:8.1f} searches/s")
+    print(f"{args.threads:2d} threads : {args.rounds / concurrent:8.1f} searches/s (with {args.rounds // 50} concurrent ingests)")
+    print(f"mismatches : {serial_errors + errors}")
+    return 1 if serial_errors or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -18,6 +18,10 @@ $DOC_ID = $upload.id
 
 Write-Host "Ingest..."
 $ing = Invoke-RestMethod -Uri "$Base/documents/$DOC_ID/ingest" -Method POST -Headers @{ Authorization = "Bearer $TOKEN" }
+do {
+  Start-Sleep -Seconds 1
+  $ing = Invoke-RestMethod -Uri "$Base/jobs/$($ing.id)" -Method GET -Headers @{ Authorization = "Bearer $TOKEN" }
+} while ($ing.status -in @("queued", "running"))
 
 Write-Host "Search..."
 $search = Invoke-RestMethod -Uri "$Base/search?q=installation&k=3" -Method GET -Headers @{ Authorization = "Bearer $TOKEN" }
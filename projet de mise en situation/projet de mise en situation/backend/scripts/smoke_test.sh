@@ -14,7 +14,14 @@ import sys, json; print(json.load(sys.stdin)["id"])
 PY
 <<< "$UP")
 
-curl -sX POST "$BASE/documents/$DOC_ID/ingest" -H "Authorization: Bearer $TOKEN"
+JOB=$(curl -sX POST "$BASE/documents/$DOC_ID/ingest" -H "Authorization: Bearer $TOKEN")
+JOB_ID=$(python -c "import sys,json;print(json.load(sys.stdin)['id'])" <<< "$JOB")
+for _ in $(seq 1 120); do
+  STATUS=$(curl -s "$BASE/jobs/$JOB_ID" -H "Authorization: Bearer $TOKEN" | python -c "import sys,json;print(json.load(sys.stdin)['status'])")
+  if [ "$STATUS" = "done" ] || [ "$STATUS" = "failed" ]; then break; fi
+  sleep 1
+done
+echo "ingest job $JOB_ID: $STATUS"
 
 curl -s "$BASE/search?q=installation&k=3" -H "Authorization: Bearer $TOKEN" | jq '.results[0:3]'
 
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# app.config reads its paths at import: point them at a scratch directory first.
+_tmp = Path(tempfile.mkdtemp(prefix="docuhelp-tests-"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("STORAGE_DIR", str(_tmp / "docs"))
+os.environ.setdefault("INDEX_DIR", str(_tmp / "index"))
+os.environ.setdefault("USE_SEMANTIC", "off")
+os.environ.setdefault("WARMUP", "off")
+os.environ.setdefault("AUDIT_QUEUE_SIZE", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
\ No newline at end of file
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi import Response
+
+from app.db import create_db_and_tables, get_session
+from app.models import AuditLog
+from app.routers.audits import list_audits
+
+
+def _page(session, cursor=None, limit=3, action="paginate"):
+    response = Response()
+    rows = list_audits(response, user=None, doc=None, action=action, resource=None, limit=limit, cursor=cursor,
+                       session=session, current=None)
+    return [r.id for r in rows], response.headers.get("X-Next-Cursor")
+
+
+def test_keyset_pages_cover_every_row_once_newest_first():
+    create_db_and_tables()
+    session = next(get_session())
+    try:
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        # runs of identical timestamps: the id breaks the tie
+        rows = [AuditLog(action="paginate", resource="document", created_at=base + timedelta(seconds=i // 3)) for i in range(10)]
+        session.add_all(rows)
+        session.commit()
+        expected = [r.id for r in sorted(rows, key=lambda r: (r.created_at, r.id), reverse=True)]
+
+        seen, cursor = [], None
+        while True:
+            ids, cursor = _page(session, cursor)
+            seen.extend(ids)
+            if cursor is None:
+                break
+        assert seen == expected
+
+        # rows written after the first page do not shift the later ones
+        first, cursor = _page(session)
+        session.add(AuditLog(action="paginate", resource="document", created_at=base + timedelta(days=1)))
+        session.commit()
+        second, _ = _page(session, cursor)
+        assert first + second == expected[:6]
+    finally:
+        session.close()
\ No newline at end of file
@@ -0,0 +1,34 @@
+import hashlib
+
+from app.db import create_db_and_tables, get_session
+from app.models import Blob
+from app.services.blobs import blob_path, release_blob, store_blob
+
+
+def _upload(tmp_path, name, data):
+    tmp = tmp_path / name
+    tmp.write_bytes(data)
+    return tmp
+
+
+def test_refcount_keeps_the_file_until_the_last_release(tmp_path):
+    create_db_and_tables()
+    data = b"same content uploaded twice"
+    digest = hashlib.sha256(data).hexdigest()
+    session = next(get_session())
+    try:
+        first = store_blob(session, _upload(tmp_path, "a", data), digest, len(data))
+        second_tmp = _upload(tmp_path, "b", data)
+        second = store_blob(session, second_tmp, digest, len(data))
+        assert first == second == blob_path(digest)
+        assert not second_tmp.exists()  # the duplicate upload is dropped
+        assert session.get(Blob, digest).refcount == 2
+
+        assert release_blob(session, digest) is False
+        assert first.read_bytes() == data
+        assert release_blob(session, digest) is True
+        assert not first.exists()
+        assert session.get(Blob, digest) is None
+        assert release_blob(session, digest) is False
+    finally:
+        session.close()
\ No newline at end of file
@@ -0,0 +1,95 @@
+from app.services import corpus_index
+from app.services.corpus_index import CorpusIndex
+
+TEXTS = [
+    "the invoice is due at the end of the month",
+    "refunds are processed within ten days",
+    "the invoice number appears on every page",
+]
+
+
+def test_readding_a_version_replaces_it(tmp_path):
+    index = CorpusIndex(tmp_path / "corpus.idx")
+    index.add_versions({2: TEXTS})
+    index.add_versions({2: TEXTS})
+    hits = index.search("invoice", [2], 5)
+    assert sorted(c for _, c, _ in hits) == [0, 2]
+    assert all(0 < score <= 1 for _, _, score in hits)
+    assert index.version_sizes() == {2: 3}
+
+
+def test_document_frequency_counts_live_chunks_only(tmp_path):
+    index = CorpusIndex(tmp_path / "corpus.idx")
+    index.add_versions({1: TEXTS, 2: TEXTS})
+    index.remove_versions([1])
+    n_alive, _, dfs = index.term_stats(["invoice"])
+    assert n_alive == 3
+    assert dfs == {"invoice": 2}
+    assert [v for v, _, _ in index.search("invoice", [1, 2], 5)] == [2, 2]
+
+
+def test_compaction_keeps_live_versions(tmp_path):
+    index = CorpusIndex(tmp_path / "corpus.idx")
+    index.add_versions({v: TEXTS for v in range(1, 5)})
+    before = index.search("refunds", [4], 5)
+    index.remove_versions([1, 2])  # half the slots dead: compacted
+    assert index._dead == 0
+    assert index.missing_versions([1, 2, 3, 4]) == [1, 2]
+    assert index.search("refunds", [4], 5) == before
+
+
+def test_mutations_are_appended_to_the_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_index, "_COMPACT_RATIO", 1.0)
+    path = tmp_path / "corpus.idx"
+    index = CorpusIndex(path)
+    index.add_versions({1: TEXTS})
+    snapshot = path.stat().st_mtime_ns
+    index.add_versions({2: TEXTS})
+    index.remove_versions([1])
+    assert path.stat().st_mtime_ns == snapshot
+    assert index._log_path.stat().st_size > 0
+
+    other = CorpusIndex(path)  # another process: snapshot + log replay
+    assert other.version_sizes() == {2: 3}
+    assert other.search("invoice", [1, 2], 5) == index.search("invoice", [1, 2], 5)
+
+
+def test_log_is_folded_into_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_index, "_LOG_MIN_BYTES", 0)
+    path = tmp_path / "corpus.idx"
+    index = CorpusIndex(path)
+    index.add_versions({1: TEXTS})
+    for v in range(2, 6):
+        index.add_versions({v: TEXTS})
+    assert not index._log_path.exists() or index._log_path.stat().st_size < path.stat().st_size
+    assert CorpusIndex(path).version_sizes() == {v: 3 for v in range(1, 6)}
+
+def test_torn_log_record_is_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_index, "_COMPACT_RATIO", 1.0)
+    path = tmp_path / "corpus.idx"
+    index = CorpusIndex(path)
+    index.add_versions({1: TEXTS})
+    index.add_versions({2: TEXTS})
+    complete = index._log_path.stat().st_size
+    index.add_versions({3: TEXTS})
+    # a crash in the middle of the last append
+    with open(index._log_path, "r+b") as f:
+        f.truncate(complete + (index._log_path.stat().st_size - complete) // 2)
+
+    other = CorpusIndex(path)
+    assert other.version_sizes() == {1: 3, 2: 3}
+    assert index._log_path.stat().st_size == complete
+    other.add_versions({4: TEXTS})
+    assert CorpusIndex(path).version_sizes() == {1: 3, 2: 3, 4: 3}
+
+def test_writes_do_not_touch_the_view_a_query_scores(tmp_path):
+    index = CorpusIndex(tmp_path / "corpus.idx")
+    index.add_versions({1: TEXTS})
+    before = index.search("invoice", [1], 5)
+    view = index._view
+    index.add_versions({2: TEXTS})
+    index.remove_versions([1])
+    assert view.slot_version.tolist() == [1, 1, 1] and view.alive.all()
+    assert view.postings["invoice"].size == 2
+    assert index.search("invoice", [1], 5) == []
+    assert [(c, s) for _, c, s in index.search("invoice", [2], 5)] == [(c, s) for _, c, s in before]
\ No newline at end of file
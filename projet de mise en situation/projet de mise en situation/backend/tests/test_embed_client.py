@@ -0,0 +1,51 @@
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.embed_server import EmbeddingClient, EmbeddingServerUnavailable
+
+
+class _LocalModel:
+    def encode(self, texts, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_no_server_falls_back_to_the_local_model(tmp_path):
+    loads = []
+    client = EmbeddingClient(str(tmp_path / "none.sock"), fallback=lambda: loads.append(1) or _LocalModel())
+    assert client.encode(["a", "b"]).shape == (2, 4)
+    assert client.encode(["c"]).shape == (1, 4)
+    assert loads == [1]  # loaded once
+    assert client.fallback_loaded
+
+
+def test_no_server_without_fallback_raises(tmp_path):
+    with pytest.raises(EmbeddingServerUnavailable):
+        EmbeddingClient(str(tmp_path / "none.sock")).encode(["a"])
+
+
+def test_written_request_is_not_replayed_locally(tmp_path):
+    path = str(tmp_path / "e.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    received = []
+
+    def accept_then_hang_up():
+        conn, _ = server.accept()
+        received.append(conn.recv(65536))
+        conn.close()
+
+    thread = threading.Thread(target=accept_then_hang_up)
+    thread.start()
+    client = EmbeddingClient(path, timeout=5, fallback=_LocalModel)
+    try:
+        with pytest.raises(ConnectionError):
+            client.encode(["a"])
+    finally:
+        thread.join()
+        server.close()
+    assert received and received[0]
+    assert not client.fallback_loaded
\ No newline at end of file
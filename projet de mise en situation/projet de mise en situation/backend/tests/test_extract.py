@@ -0,0 +1,13 @@
+import pytest
+
+from app.services import extract
+
+
+@pytest.mark.parametrize("cpus, ingest_workers, expected", [(8, 2, 4), (8, 0, 8), (2, 4, 1), (None, 2, 1)])
+def test_default_pdf_pool_shares_the_cpus_among_ingest_workers(monkeypatch, cpus, ingest_workers, expected):
+    monkeypatch.setattr(extract.os, "cpu_count", lambda: cpus)
+    monkeypatch.setattr(extract, "INGEST_WORKERS", ingest_workers)
+    monkeypatch.setattr(extract, "PDF_WORKERS", 0)
+    assert extract._pdf_workers(500, None) == expected
+    assert extract._pdf_workers(500, 3) == 3  # an explicit count is kept
+    assert extract._pdf_workers(10, None) == 1  # short documents stay serial
\ No newline at end of file
@@ -0,0 +1,47 @@
+import pytest
+
+from app.db import create_db_and_tables, get_session
+from app.models import Document, DocumentVersion, User
+from app.services.indexing import hydrate_hits
+from app.services.ingestion import insert_chunks
+
+
+@pytest.fixture(scope="module")
+def versions():
+    """Three versions of 1500 chunks and 400 versions of one chunk."""
+    create_db_and_tables()
+    session = next(get_session())
+    user = User(email="hydrate@example.com", password_hash="-")
+    session.add(user)
+    session.commit()
+    doc = Document(owner_id=user.id, name="big.txt", filename="big.txt", path="-", mime="text/plain", size=0, sha256="")
+    session.add(doc)
+    session.commit()
+    big, small = [], []
+    for n, out in [(1500, big)] * 3 + [(1, small)] * 400:
+        ver = DocumentVersion(document_id=doc.id, version=len(big) + len(small) + 1, text_len=0, chunk_count=n,
+                              embedding_model="", doc_sha256="")
+        session.add(ver)
+        session.commit()
+        insert_chunks(session, ver.id, [{"content": f"chunk {ver.id}/{i}", "page": 1, "start_char": 0, "end_char": 1}
+                                        for i in range(n)])
+        session.commit()
+        out.append(ver.id)
+    yield session, big, small
+    session.close()
+
+
+@pytest.mark.parametrize("k", [50, 999, 1500])
+def test_hydrates_large_top_k_in_rank_order(versions, k):
+    session, big, _ = versions
+    hits = [(big[i % 3], i // 3, 1.0 - i / 10_000) for i in range(k)]
+    out = hydrate_hits(session, hits)
+    assert [h.content for h in out] == [f"chunk {v}/{i}" for v, i, _ in hits]
+    assert [h.score for h in out] == [s for _, _, s in hits]
+
+
+def test_hydrates_one_hit_per_version_across_many_versions(versions):
+    session, _, small = versions
+    hits = [(vid, 0, 0.5) for vid in small] + [(small[0], 7, 0.4)]  # the last one does not exist
+    out = hydrate_hits(session, hits)
+    assert [h.content for h in out] == [f"chunk {vid}/0" for vid in small]
\ No newline at end of file
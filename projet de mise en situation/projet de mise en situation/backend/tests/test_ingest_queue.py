@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete
+
+from app.db import create_db_and_tables, get_session
+from app.models import Document, IngestJob, User
+from app.services.ingestion import IngestQueue
+
+
+@pytest.fixture
+def jobs():
+    create_db_and_tables()
+    session = next(get_session())
+    user = User(email=f"queue{datetime.now().timestamp()}@example.com", password_hash="-")
+    session.add(user)
+    session.commit()
+    doc = Document(owner_id=user.id, name="q.txt", filename="q.txt", path="-", mime="text/plain", size=0, sha256="")
+    session.add(doc)
+    session.commit()
+
+    def make(status, attempts, age_seconds):
+        job = IngestJob(document_id=doc.id, status=status, attempts=attempts,
+                        updated_at=datetime.now(timezone.utc) - timedelta(seconds=age_seconds))
+        session.add(job)
+        session.commit()
+        return job.id
+
+    yield make
+    session.execute(delete(IngestJob))
+    session.commit()
+    session.close()
+
+
+def _status(job_id):
+    session = next(get_session())
+    try:
+        job = session.get(IngestJob, job_id)
+        return job.status, job.attempts
+    finally:
+        session.close()
+
+
+def test_expired_lease_is_requeued_then_failed_after_max_attempts(jobs, monkeypatch):
+    queue = IngestQueue(workers=2, max_attempts=3, lease_seconds=60)
+    submitted = []
+    monkeypatch.setattr(queue, "_submit", submitted.append)
+    live = jobs("running", 1, 10)      # lease still held by another dispatcher
+    lost = jobs("running", 1, 600)     # its worker died: requeued and claimed again
+    spent = jobs("running", 3, 600)    # no attempts left
+    queue._tick()
+    assert _status(live) == ("running", 1)
+    assert _status(lost) == ("running", 2)
+    assert _status(spent)[0] == "failed"
+    assert submitted == [lost]
+
+
+def test_claims_no_more_than_free_workers(jobs, monkeypatch):
+    queue = IngestQueue(workers=2, lease_seconds=60)
+    submitted = []
+    monkeypatch.setattr(queue, "_submit", submitted.append)
+    queued = [jobs("queued", 0, 0) for _ in range(3)]
+    queue._tick()
+    assert submitted == queued[:2]
+    assert [_status(j)[0] for j in queued] == ["running", "running", "queued"]
\ No newline at end of file
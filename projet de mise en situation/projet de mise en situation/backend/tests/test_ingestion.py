@@ -0,0 +1,103 @@
+import hashlib
+
+import pytest
+from sqlmodel import select
+
+from app.db import create_db_and_tables, get_session
+from app.models import Document, DocumentVersion, User
+from app.services import ingestion
+from app.services.indexing import search_versions
+from app.services.shards import get_corpus_shards
+
+BODY = "\n".join(f"Paragraph {i}: the warranty covers parts and labour for two years." for i in range(40))
+
+
+@pytest.fixture(scope="module")
+def owner_id():
+    create_db_and_tables()
+    session = next(get_session())
+    user = User(email="ingest@example.com", password_hash="-")
+    session.add(user)
+    session.commit()
+    yield user.id
+    session.close()
+
+
+def _document(owner_id, tmp_path, body=BODY):
+    path = tmp_path / "doc.txt"
+    path.write_text(body, encoding="utf-8")
+    session = next(get_session())
+    try:
+        doc = Document(owner_id=owner_id, name="doc.txt", filename="doc.txt", path=str(path), mime="text/plain",
+                       size=path.stat().st_size, sha256=hashlib.sha256(path.read_bytes()).hexdigest())
+        session.add(doc)
+        session.commit()
+        return doc.id
+    finally:
+        session.close()
+
+
+def _current_version(doc_id):
+    session = next(get_session())
+    try:
+        return session.get(Document, doc_id).current_version_id
+    finally:
+        session.close()
+
+
+def test_ingested_document_is_searchable(owner_id, tmp_path):
+    doc_id = _document(owner_id, tmp_path)
+    result = ingestion.ingest_document(doc_id)
+    assert result["chunk_count"] > 0
+    vid = _current_version(doc_id)
+    assert search_versions("warranty labour", [vid], 5)
+    # a second ingest of the same document supersedes the first, which leaves the corpus index
+    again = ingestion.ingest_document(doc_id)
+    new_vid = _current_version(doc_id)
+    assert new_vid != vid and again["reused_version_id"] == vid
+    assert get_corpus_shards().missing_versions([vid, new_vid]) == [vid]
+    assert {v for v, _, _ in search_versions("warranty labour", [new_vid], 5)} == {new_vid}
+
+
+def test_version_becomes_current_after_it_is_indexed(owner_id, tmp_path, monkeypatch):
+    doc_id = _document(owner_id, tmp_path, BODY + "\nwarranty extension")
+    seen = []
+    build = ingestion.build_index_for_version
+
+    def spy(version_id, **kwargs):
+        seen.append(_current_version(doc_id))
+        return build(version_id, **kwargs)
+
+    monkeypatch.setattr(ingestion, "build_index_for_version", spy)
+    ingestion.ingest_document(doc_id)
+    assert seen == [None]
+    assert search_versions("warranty", [_current_version(doc_id)], 5)
+
+
+def test_failed_index_build_keeps_the_previous_version(owner_id, tmp_path, monkeypatch):
+    doc_id = _document(owner_id, tmp_path, BODY + "\nrepairs")
+    ingestion.ingest_document(doc_id)
+    vid = _current_version(doc_id)
+
+    def broken(version_id, **kwargs):
+        raise RuntimeError("index build failed")
+
+    monkeypatch.setattr(ingestion, "build_index_for_version", broken)
+    with pytest.raises(RuntimeError):
+        ingestion.ingest_document(doc_id)
+    assert _current_version(doc_id) == vid
+    session = next(get_session())
+    try:
+        assert [v.id for v in session.exec(select(DocumentVersion).where(DocumentVersion.document_id == doc_id))] == [vid]
+    finally:
+        session.close()
+    assert search_versions("repairs", [vid], 5)
+
+@pytest.mark.parametrize("body", ["", "   \n\t  ", "a b c"])
+def test_text_without_vocabulary_is_ingested(owner_id, tmp_path, body):
+    doc_id = _document(owner_id, tmp_path, body)
+    result = ingestion.ingest_document(doc_id)
+    vid = _current_version(doc_id)
+    assert vid is not None
+    assert search_versions("warranty", [vid], 5) == []
+    assert result["chunk_count"] == (1 if body.strip() else 0)
\ No newline at end of file
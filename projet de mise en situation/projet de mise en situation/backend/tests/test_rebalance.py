@@ -0,0 +1,57 @@
+import pytest
+
+from app.services import indexing
+
+
+class _Placement:
+    def __init__(self, shards):
+        self.shards = shards
+
+    def get(self, key):
+        return self.shards.get(key)
+
+
+class _Shards:
+    def __init__(self, loads, placement, leftovers=()):
+        self.n_shards = len(loads)
+        self._loads = loads
+        self.placement = _Placement(placement)
+        self._ids = list(range(len(loads))) + list(leftovers)
+
+    def shard_ids(self):
+        return self._ids
+
+    def loads(self):
+        return list(self._loads)
+
+    def locate(self):
+        raise AssertionError("the check must not walk the corpus")
+
+
+@pytest.fixture
+def shards(monkeypatch):
+    def install(*args, **kwargs):
+        monkeypatch.setattr(indexing, "get_corpus_shards", lambda: _Shards(*args, **kwargs))
+    monkeypatch.setattr(indexing, "_placement_keys", lambda session, vids: {vid: vid for vid in vids})
+    return install
+
+
+@pytest.mark.parametrize("loads, placement, due", [
+    ([100, 100, 100], {7: 0}, False),
+    ([200, 50, 50], {7: 1}, False),  # the ingested shard is not the heavy one
+    ([200, 50, 50], {7: 0}, True),
+    ([100, 100, 100], {}, True),  # never placed
+])
+def test_rebalance_only_when_the_ingested_shard_is_over_the_ratio(shards, loads, placement, due):
+    shards(loads, placement)
+    assert indexing.rebalance_due(None, 7, ratio=1.5) is due
+
+
+def test_leftover_shards_are_always_rebalanced(shards):
+    shards([10, 10], {7: 0}, leftovers=[2])
+    assert indexing.rebalance_due(None, 7) is True
+
+
+def test_single_shard_never_rebalances(shards):
+    shards([10], {})
+    assert indexing.rebalance_due(None, 7) is False
\ No newline at end of file
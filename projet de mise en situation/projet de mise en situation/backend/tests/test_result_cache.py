@@ -0,0 +1,31 @@
+from app.services.result_cache import ResultCache, bump_generation, corpus_generation
+
+
+def test_generation_bump_makes_earlier_entries_unreachable():
+    cache = ResultCache(mode="memory", ttl_seconds=60, max_entries=100)
+    generation = corpus_generation()
+    key = cache.key("search", "Refund  Policy", 5, [3, 1, 2], generation)
+    cache.put(key, ["hit"])
+    # same normalised query and visible set, in any order
+    assert cache.get(cache.key("search", "refund policy", 5, [1, 2, 3], corpus_generation())) == ["hit"]
+    assert cache.get(cache.key("search", "refund policy", 6, [1, 2, 3], corpus_generation())) is None
+    assert cache.get(cache.key("search", "refund policy", 5, [1, 2], corpus_generation())) is None
+
+    assert bump_generation() == generation + 1
+    assert cache.get(cache.key("search", "refund policy", 5, [1, 2, 3], corpus_generation())) is None
+
+
+def test_shared_tier_serves_other_workers(tmp_path):
+    path = tmp_path / "result_cache.db"
+    writer = ResultCache(mode="shared", ttl_seconds=60, max_entries=100, shared_path=path)
+    reader = ResultCache(mode="shared", ttl_seconds=60, max_entries=100, shared_path=path)
+    key = writer.key("answers", "warranty", 5, [7], corpus_generation())
+    writer.put(key, {"answer": "two years"})
+    assert reader.get(key) == {"answer": "two years"}
+
+
+def test_off_mode_stores_nothing():
+    cache = ResultCache(mode="off")
+    key = cache.key("search", "q", 5, [1], 0)
+    cache.put(key, ["hit"])
+    assert cache.get(key) is None
\ No newline at end of file
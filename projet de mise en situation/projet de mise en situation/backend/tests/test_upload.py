@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.auth import create_access_token
+from app.db import create_db_and_tables, get_session
+from app.main import app
+from app.models import Blob, Document, User
+from app.routers import documents
+from app.services.blobs import blob_path
+
+
+@pytest.fixture(scope="module")
+def client():
+    create_db_and_tables()
+    session = next(get_session())
+    user = User(email="upload@example.com", password_hash="-")
+    session.add(user)
+    session.commit()
+    token = create_access_token({"sub": str(user.id)})
+    session.close()
+    c = TestClient(app)  # no lifespan: the ingest queue and warm-up are not started
+    c.headers["Authorization"] = f"Bearer {token}"
+    return c
+
+
+def _leftover_parts():
+    return list(documents.TMP_DIR.glob("*.part")) if documents.TMP_DIR.exists() else []
+
+
+def test_upload_is_stored_once_with_its_sha256(client):
+    data = b"streamed upload " * 5000
+    r = client.post("/documents", files={"file": ("notes.txt", data, "text/plain")}, data={"comment": "ignored"})
+    assert r.status_code == 201, r.text
+    assert r.json()["size"] == len(data)
+    session = next(get_session())
+    try:
+        doc = session.get(Document, r.json()["id"])
+        assert doc.sha256 == hashlib.sha256(data).hexdigest()
+        assert open(doc.path, "rb").read() == data
+    finally:
+        session.close()
+    assert _leftover_parts() == []
+
+
+def test_chunked_oversized_upload_is_cut_off_while_streaming(client, monkeypatch):
+    monkeypatch.setattr(documents, "MAX_SIZE_MB", 1)
+    # driven through ASGI directly: TestClient would buffer the whole body before the app runs
+    head = (b'--bound\r\nContent-Disposition: form-data; name="file"; filename="big.txt"\r\n'
+            b"Content-Type: text/plain\r\n\r\n")
+    messages = [head] + [b"x" * (256 * 1024)] * 64  # 16 MB, no Content-Length
+    pulled = []
+    sent = []
+
+    async def receive():
+        if len(pulled) < len(messages):
+            pulled.append(messages[len(pulled)])
+            return {"type": "http.request", "body": pulled[-1], "more_body": True}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/documents", "raw_path": b"/documents", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"test"), (b"content-type", b"multipart/form-data; boundary=bound"),
+                    (b"transfer-encoding", b"chunked"),
+                    (b"authorization", client.headers["Authorization"].encode())],
+        "client": ("127.0.0.1", 1234), "server": ("test", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    assert sent[0]["status"] == 413
+    assert len(pulled) <= 6  # stopped right after the first MB, not at the end of the body
+    assert _leftover_parts() == []
+
+
+@pytest.mark.parametrize("files, status", [
+    ({"file": ("script.exe", b"MZ", "application/x-msdownload")}, 415),
+    ({"file": ("empty.txt", b"", "text/plain")}, 422),
+    ({"other": ("notes.txt", b"text", "text/plain")}, 422),
+])
+def test_rejected_uploads(client, files, status):
+    assert client.post("/documents", files=files).status_code == status
+    assert _leftover_parts() == []
+
+def test_failed_document_insert_gives_the_blob_back(client, monkeypatch):
+    data = b"upload whose document row is never written"
+    digest = hashlib.sha256(data).hexdigest()
+
+    def broken_version(**kwargs):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(documents, "DocumentVersion", broken_version)
+    with pytest.raises(RuntimeError):
+        client.post("/documents", files={"file": ("lost.txt", data, "text/plain")})
+    session = next(get_session())
+    try:
+        assert session.get(Blob, digest) is None
+        assert session.exec(select(Document).where(Document.sha256 == digest)).first() is None
+    finally:
+        session.close()
+    assert not blob_path(digest).exists()
+    assert _leftover_parts() == []
+
+@pytest.mark.parametrize("method, path, length, passed", [
+    ("POST", "/documents", str(2 * 1024 * 1024), False),
+    ("POST", "/documents/", str(2 * 1024 * 1024), False),
+    ("POST", "/documents", "100", True),
+    ("GET", "/documents", str(2 * 1024 * 1024), True),
+    ("POST", "/search", str(2 * 1024 * 1024), True),
+])
+def test_declared_length_is_checked_on_upload_only(monkeypatch, method, path, length, passed):
+    monkeypatch.setattr(documents, "MAX_SIZE_MB", 1)
+    reached, sent = [], []
+
+    async def inner(scope, receive, send):
+        reached.append(scope["path"])
+
+    async def receive():
+        raise AssertionError("the body must not be read")
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": [(b"content-length", length.encode())]}
+    asyncio.run(documents.UploadSizeLimitMiddleware(inner)(scope, receive, send))
+    assert bool(reached) is passed
+    if not passed:
+        assert sent[0]["status"] == 413
\ No newline at end of file